@@ -1,10 +1,13 @@
+import asyncio
+import os
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
+from app.core.config import DatabaseSettings
 from app.db.database import Base
 from app.models import User, Note  # noqa: F401
 
@@ -13,8 +16,12 @@ from app.models import User, Note  # noqa: F401
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. It is skipped when the application
+# runs the migrations, so its own logging is left alone.
+if (
+    config.config_file_name is not None
+    and config.attributes.get("configure_logger", True)
+):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -28,6 +35,13 @@ target_metadata = Base.metadata
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
+# DOC: DATABASE_URL, when set, overrides sqlalchemy.url of alembic.ini, so
+# the CLI migrates the same database as the application
+if os.getenv("DATABASE_URL"):
+    config.set_main_option(
+        "sqlalchemy.url", DatabaseSettings.from_env().url
+    )
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
@@ -53,26 +67,45 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode.
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection, target_metadata=target_metadata
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
+
+async def run_async_migrations() -> None:
+    """Create an async Engine and run the migrations on one of its
+    connections.
 
     """
-    connectable = engine_from_config(
+    connectable = async_engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
 
-        with context.begin_transaction():
-            context.run_migrations()
+    The database URL is async (asyncpg, aiosqlite), like the one of the
+    application. A connection passed in config.attributes, as
+    app.db.migrations does, is used as it is.
+
+    """
+    connection = config.attributes.get("connection")
+    if connection is None:
+        asyncio.run(run_async_migrations())
+    else:
+        do_run_migrations(connection)
 
 
 if context.is_offline_mode():
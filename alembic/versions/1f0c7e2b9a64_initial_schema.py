@@ -0,0 +1,92 @@
+"""initial schema
+
+Revision ID: 1f0c7e2b9a64
+Revises:
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1f0c7e2b9a64"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# DOC: Tables as create_all built them before the first migration, so
+# databases created that way can be stamped at this revision
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("document", sa.String(12), nullable=False),
+        sa.Column("full_name", sa.String(70), nullable=False),
+        sa.Column("email", sa.String(70), nullable=False),
+        sa.Column("password", sa.String(200), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_document", "users", ["document"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("name", sa.String(20), nullable=False),
+        sa.Column("color", sa.String(20), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_categories_id", "categories", ["id"])
+    op.create_index("ix_categories_name", "categories", ["name"])
+
+    op.create_table(
+        "notes",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("title", sa.String(50), nullable=False),
+        sa.Column("content", sa.String(200), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("category_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notes_id", "notes", ["id"])
+
+    op.create_table(
+        "notes_history",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("title", sa.String(50), nullable=False),
+        sa.Column("content", sa.String(200), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("category_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+        sa.ForeignKeyConstraint(["note_id"], ["notes.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notes_history_id", "notes_history", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_history_id", table_name="notes_history")
+    op.drop_table("notes_history")
+    op.drop_index("ix_notes_id", table_name="notes")
+    op.drop_table("notes")
+    op.drop_index("ix_categories_name", table_name="categories")
+    op.drop_index("ix_categories_id", table_name="categories")
+    op.drop_table("categories")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_document", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,37 @@
+"""flag history rows kept in full by compaction
+
+Revision ID: 4b9d2e7c1a58
+Revises: e3a9c5f17d20
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4b9d2e7c1a58"
+down_revision: Union[str, None] = "e3a9c5f17d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # DOC: A constant default, so Postgres adds the column without a rewrite.
+    # Existing full rows start unchecked and are checked once
+    op.add_column(
+        "notes_history",
+        sa.Column(
+            "kept_full",
+            sa.Boolean(),
+            nullable=False,
+            server_default=sa.false(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("notes_history") as batch:
+        batch.drop_column("kept_full")
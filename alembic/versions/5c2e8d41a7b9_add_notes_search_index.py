@@ -0,0 +1,41 @@
+"""add notes search index
+
+Revision ID: 5c2e8d41a7b9
+Revises: 1f0c7e2b9a64
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2e8d41a7b9"
+down_revision: Union[str, None] = "1f0c7e2b9a64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_notes_search ON notes "
+            "USING gin (to_tsvector('simple', title || ' ' || content))"
+        )
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts "
+            "USING fts5(title, content)"
+        )
+        op.execute(
+            "INSERT INTO notes_fts (rowid, title, content) "
+            "SELECT id, title, content FROM notes"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_notes_search")
+    else:
+        op.execute("DROP TABLE IF EXISTS notes_fts")
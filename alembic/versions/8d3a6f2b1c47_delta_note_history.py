@@ -0,0 +1,123 @@
+"""store note history as reverse deltas
+
+Revision ID: 8d3a6f2b1c47
+Revises: 5c2e8d41a7b9
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+import os
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.core.delta import decode_delta, encode_delta
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d3a6f2b1c47"
+down_revision: Union[str, None] = "5c2e8d41a7b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEYFRAME_INTERVAL = int(os.getenv("HISTORY_KEYFRAME_INTERVAL", "10"))
+
+notes = sa.table(
+    "notes",
+    sa.column("id", sa.Integer),
+    sa.column("title", sa.String),
+    sa.column("content", sa.String),
+)
+history = sa.table(
+    "notes_history",
+    sa.column("id", sa.Integer),
+    sa.column("note_id", sa.Integer),
+    sa.column("version", sa.Integer),
+    sa.column("title", sa.String),
+    sa.column("content", sa.String),
+    sa.column("delta", sa.Text),
+)
+
+
+# DOC: History rows of each note, newest first, along with the note text
+def _notes_with_history(bind):
+    note_ids = bind.execute(
+        sa.select(history.c.note_id).distinct()
+    ).scalars().all()
+    for note_id in note_ids:
+        top = bind.execute(
+            sa.select(notes.c.title, notes.c.content)
+            .where(notes.c.id == note_id)
+        ).one_or_none()
+        rows = bind.execute(
+            sa.select(history).where(history.c.note_id == note_id)
+            .order_by(history.c.id.desc())
+        ).all()
+        yield top, rows
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("notes_history") as batch:
+        batch.add_column(sa.Column("delta", sa.Text(), nullable=True))
+        batch.alter_column("title", existing_type=sa.String(50),
+                           nullable=True)
+        batch.alter_column("content", existing_type=sa.String(200),
+                           nullable=True)
+
+    # DOC: Existing rows are full copies; rewrite them as reverse deltas
+    # against the next revision, keeping the same keyframes as the app
+    bind = op.get_bind()
+    if KEYFRAME_INTERVAL <= 1:
+        return
+    for top, rows in _notes_with_history(bind):
+        newer = tuple(top) if top else None
+        updates = []
+        for row in rows:
+            text = (row.title, row.content)
+            if newer is not None and row.version % KEYFRAME_INTERVAL:
+                delta = encode_delta(newer, text)
+                if len(delta) < len(text[0]) + len(text[1]):
+                    updates.append(
+                        {"history_id": row.id, "new_delta": delta}
+                    )
+            newer = text
+        if updates:
+            bind.execute(
+                history.update()
+                .where(history.c.id == sa.bindparam("history_id"))
+                .values(title=None, content=None,
+                        delta=sa.bindparam("new_delta")),
+                updates,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    for top, rows in _notes_with_history(bind):
+        current = tuple(top) if top else None
+        updates = []
+        for row in rows:
+            if row.delta is None:
+                current = (row.title, row.content)
+            else:
+                current = decode_delta(current, row.delta)
+                updates.append({
+                    "history_id": row.id,
+                    "new_title": current[0],
+                    "new_content": current[1],
+                })
+        if updates:
+            bind.execute(
+                history.update()
+                .where(history.c.id == sa.bindparam("history_id"))
+                .values(title=sa.bindparam("new_title"),
+                        content=sa.bindparam("new_content"), delta=None),
+                updates,
+            )
+
+    with op.batch_alter_table("notes_history") as batch:
+        batch.alter_column("content", existing_type=sa.String(200),
+                           nullable=False)
+        batch.alter_column("title", existing_type=sa.String(50),
+                           nullable=False)
+        batch.drop_column("delta")
@@ -0,0 +1,122 @@
+"""cascade note deletes in the database
+
+Revision ID: b7e41c9d2a05
+Revises: 8d3a6f2b1c47
+Create Date: 2026-10-18 22:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e41c9d2a05"
+down_revision: Union[str, None] = "8d3a6f2b1c47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DOC: Postgres names the foreign keys created by create_all after the table
+# and column; SQLite leaves them unnamed, so its tables are rebuilt whole
+FOREIGN_KEYS = (
+    ("notes_category_id_fkey", "notes", "categories", "category_id",
+     "CASCADE"),
+    ("notes_history_note_id_fkey", "notes_history", "notes", "note_id",
+     "CASCADE"),
+    ("notes_history_category_id_fkey", "notes_history", "categories",
+     "category_id", "SET NULL"),
+)
+
+
+def _notes(cascade: bool) -> sa.Table:
+    return sa.Table(
+        "notes",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(50), nullable=False),
+        sa.Column("content", sa.String(200), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"),
+                  nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column(
+            "category_id",
+            sa.Integer(),
+            sa.ForeignKey(
+                "categories.id", ondelete="CASCADE" if cascade else None
+            ),
+            nullable=False,
+        ),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+
+
+def _history(cascade: bool) -> sa.Table:
+    return sa.Table(
+        "notes_history",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(50), nullable=True),
+        sa.Column("content", sa.String(200), nullable=True),
+        sa.Column("delta", sa.Text(), nullable=True),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column(
+            "category_id",
+            sa.Integer(),
+            sa.ForeignKey(
+                "categories.id", ondelete="SET NULL" if cascade else None
+            ),
+            nullable=cascade,
+        ),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column(
+            "note_id",
+            sa.Integer(),
+            sa.ForeignKey(
+                "notes.id", ondelete="CASCADE" if cascade else None
+            ),
+            nullable=False,
+        ),
+    )
+
+
+def _rebuild_sqlite(cascade: bool) -> None:
+    for table in (_notes(cascade), _history(cascade)):
+        with op.batch_alter_table(
+            table.name, copy_from=table, recreate="always"
+        ) as batch:
+            # DOC: copy_from skips reflection, so indexes are declared again
+            batch.create_index(f"ix_{table.name}_id", ["id"])
+
+
+def _replace_foreign_keys(cascade: bool) -> None:
+    for name, source, referent, column, ondelete in FOREIGN_KEYS:
+        op.drop_constraint(name, source, type_="foreignkey")
+        op.create_foreign_key(
+            name, source, referent, [column], ["id"],
+            ondelete=ondelete if cascade else None,
+        )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        _rebuild_sqlite(cascade=True)
+        return
+    op.alter_column("notes_history", "category_id",
+                    existing_type=sa.Integer(), nullable=True)
+    _replace_foreign_keys(cascade=True)
+
+
+def downgrade() -> None:
+    # DOC: Versions whose category was deleted take the note's category
+    op.execute(
+        "UPDATE notes_history SET category_id = (SELECT category_id "
+        "FROM notes WHERE notes.id = notes_history.note_id) "
+        "WHERE category_id IS NULL"
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        _rebuild_sqlite(cascade=False)
+        return
+    _replace_foreign_keys(cascade=False)
+    op.alter_column("notes_history", "category_id",
+                    existing_type=sa.Integer(), nullable=False)
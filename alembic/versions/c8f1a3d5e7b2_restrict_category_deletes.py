@@ -0,0 +1,76 @@
+"""stop cascading category deletes to notes
+
+Revision ID: c8f1a3d5e7b2
+Revises: 4b9d2e7c1a58
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8f1a3d5e7b2"
+down_revision: Union[str, None] = "4b9d2e7c1a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _notes(ondelete) -> sa.Table:
+    return sa.Table(
+        "notes",
+        sa.MetaData(),
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(50), nullable=False),
+        sa.Column("content", sa.String(200), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"),
+                  nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column(
+            "category_id",
+            sa.Integer(),
+            sa.ForeignKey("categories.id", ondelete=ondelete),
+            nullable=False,
+        ),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+
+
+# DOC: SQLite leaves the foreign key unnamed, so the table is rebuilt whole
+def _rebuild_sqlite(ondelete) -> None:
+    with op.batch_alter_table(
+        "notes", copy_from=_notes(ondelete), recreate="always"
+    ) as batch:
+        # DOC: copy_from skips reflection, so indexes are declared again
+        batch.create_index("ix_notes_id", ["id"])
+        batch.create_index(
+            "ix_notes_user_id_created_id", ["user_id", "created", "id"]
+        )
+        batch.create_index("ix_notes_category_id", ["category_id"])
+
+
+def _replace_foreign_key(ondelete) -> None:
+    op.drop_constraint(
+        "notes_category_id_fkey", "notes", type_="foreignkey"
+    )
+    op.create_foreign_key(
+        "notes_category_id_fkey", "notes", "categories",
+        ["category_id"], ["id"], ondelete=ondelete,
+    )
+
+
+# DOC: A category with notes can no longer be deleted; the API answers 409
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        _rebuild_sqlite(None)
+        return
+    _replace_foreign_key(None)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        _rebuild_sqlite("CASCADE")
+        return
+    _replace_foreign_key("CASCADE")
@@ -0,0 +1,59 @@
+"""composite indexes for the hot queries
+
+Revision ID: e3a9c5f17d20
+Revises: b7e41c9d2a05
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e3a9c5f17d20"
+down_revision: Union[str, None] = "b7e41c9d2a05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DOC: Same indexes as the __table_args__ of the models
+INDEXES = (
+    ("ix_notes_user_id_created_id", "notes", ("user_id", "created", "id")),
+    ("ix_notes_category_id", "notes", ("category_id",)),
+    ("ix_notes_history_note_id_id", "notes_history", ("note_id", "id")),
+    ("ix_notes_history_category_id", "notes_history", ("category_id",)),
+    ("ix_categories_user_id_id", "categories", ("user_id", "id")),
+)
+
+
+def upgrade() -> None:
+    # DOC: On Postgres the indexes are built CONCURRENTLY, outside of the
+    # migration transaction, so writes to the tables are not blocked
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(
+                    name,
+                    table,
+                    list(columns),
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, list(columns), if_not_exists=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(
+                    name,
+                    table_name=table,
+                    postgresql_concurrently=True,
+                    if_exists=True,
+                )
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
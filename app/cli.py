@@ -0,0 +1,56 @@
+"""
+Maintenance commands.
+
+    python -m app.cli compact-history --keep-last 50 --keep-days 365
+"""
+import argparse
+import asyncio
+import json
+from dataclasses import replace
+
+from app.core.config import RetentionSettings
+
+
+async def _compact_history(args) -> dict:
+    from app.db.database import async_session, engine
+    from app.services.retention import apply_retention
+
+    policy = RetentionSettings.from_env()
+    overrides = {
+        name: getattr(args, name)
+        for name in ("keep_last", "keep_days", "batch_size")
+        if getattr(args, name) is not None
+    }
+    policy = replace(policy, **overrides)
+    try:
+        return await apply_retention(
+            async_session, policy, dry_run=args.dry_run
+        )
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact = commands.add_parser(
+        "compact-history",
+        help="apply the history retention policy once",
+    )
+    compact.add_argument("--keep-last", type=int)
+    compact.add_argument("--keep-days", type=int)
+    compact.add_argument("--batch-size", type=int)
+    compact.add_argument(
+        "--dry-run", action="store_true",
+        help="report the rows that would be reclaimed",
+    )
+    compact.set_defaults(handler=_compact_history)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(args.handler(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
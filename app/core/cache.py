@@ -0,0 +1,160 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# DOC: Bounded in-process cache with TTL expiration and LRU eviction
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            # DOC: Expired entries count as a miss and are dropped eagerly
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# DOC: Async byte-value backends for caches shared by route handlers. The
+# in-memory backend is private to each worker process; the Redis backend
+# keeps entries (and therefore invalidations) shared by every worker.
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.enabled
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.cache.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        self.cache.invalidate(key)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    async def close(self) -> None:
+        self.clear()
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: float, prefix: str = ""):
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError(
+                "The redis package is required for a redis:// cache URL"
+            )
+        from redis.exceptions import RedisError
+        self.client = Redis.from_url(url)
+        self.errors = RedisError
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    # DOC: An unreachable server degrades to a miss instead of failing reads
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except self.errors:
+            logger.warning("Cache read failed for %s", key, exc_info=True)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        if not self.enabled:
+            return
+        try:
+            await self.client.set(
+                self.prefix + key, value, px=int(self.ttl * 1000)
+            )
+        except self.errors:
+            logger.warning("Cache write failed for %s", key, exc_info=True)
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(self.prefix + key)
+        except self.errors:
+            logger.error("Cache invalidation failed for %s", key,
+                         exc_info=True)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+# DOC: Build a backend from a URL: memory:// (default) or redis://host/db
+def cache_backend(url: Optional[str], maxsize: int, ttl: float,
+                  prefix: str = ""):
+    if not url or url.startswith("memory://"):
+        return MemoryBackend(maxsize=maxsize, ttl=ttl)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url, ttl=ttl, prefix=prefix)
+    raise ValueError(f"Unknown cache URL: {url}")
@@ -0,0 +1,186 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return default if value is None else int(value)
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return default if value is None else float(value)
+
+
+SCHEMA_MODES = ("check", "migrate", "create")
+
+
+def _async_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    return url.replace("postgresql://", "postgresql+asyncpg://")
+
+
+# DOC: Database engine settings, read from the environment
+@dataclass(frozen=True)
+class DatabaseSettings:
+    url: str
+    echo: bool = False
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30.0
+    pool_pre_ping: bool = True
+    pool_recycle: int = 1800
+    # DOC: Prepared statements cached per connection (asyncpg only)
+    statement_cache_size: int = 500
+    # DOC: What startup does with the schema: check that the database is at
+    # the Alembic head (check), upgrade it (migrate) or run create_all
+    # (create, for throwaway databases)
+    schema_mode: str = "check"
+    # DOC: Read replica for the read-only routes. Reads of a user stay on the
+    # primary for read_your_writes_seconds after each of their writes, and
+    # for replica_retry_seconds after the replica fails to connect
+    replica_url: Optional[str] = None
+    read_your_writes_seconds: float = 5.0
+    replica_retry_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls, url: Optional[str] = None) -> "DatabaseSettings":
+        url = url or os.getenv("DATABASE_URL")
+        if not url:
+            raise RuntimeError("DATABASE_URL is not set")
+        return cls(
+            url=_async_url(url),
+            echo=_env_bool("DB_ECHO", cls.echo),
+            pool_size=_env_int("DB_POOL_SIZE", cls.pool_size),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", cls.max_overflow),
+            pool_timeout=_env_float("DB_POOL_TIMEOUT", cls.pool_timeout),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", cls.pool_pre_ping),
+            pool_recycle=_env_int("DB_POOL_RECYCLE", cls.pool_recycle),
+            statement_cache_size=_env_int(
+                "DB_STATEMENT_CACHE_SIZE", cls.statement_cache_size
+            ),
+            schema_mode=os.getenv("DB_SCHEMA_MODE", cls.schema_mode),
+            replica_url=_async_url(os.getenv("DATABASE_REPLICA_URL")),
+            read_your_writes_seconds=_env_float(
+                "DB_READ_YOUR_WRITES_SECONDS", cls.read_your_writes_seconds
+            ),
+            replica_retry_seconds=_env_float(
+                "DB_REPLICA_RETRY_SECONDS", cls.replica_retry_seconds
+            ),
+        )
+
+    def __post_init__(self):
+        if self.schema_mode not in SCHEMA_MODES:
+            raise ValueError(f"Unsupported DB_SCHEMA_MODE: {self.schema_mode}")
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+    # DOC: Keyword arguments for create_async_engine
+    def engine_kwargs(self) -> dict:
+        kwargs = {"echo": self.echo}
+        if self.is_sqlite:
+            # DOC: SQLite uses a static or null pool, so sizing does not apply
+            return kwargs
+        kwargs.update(
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_pre_ping=self.pool_pre_ping,
+            pool_recycle=self.pool_recycle,
+        )
+        if "+asyncpg" in self.url:
+            kwargs["connect_args"] = {
+                "prepared_statement_cache_size": self.statement_cache_size
+            }
+        return kwargs
+
+
+# DOC: History retention policy: the newest keep_last versions of a note are
+# kept, plus the newest version of each day for older ones. Daily versions
+# older than keep_days are dropped too (0 keeps them forever)
+@dataclass(frozen=True)
+class RetentionSettings:
+    keep_last: int = 50
+    keep_days: int = 365
+    # DOC: Seconds between background runs. 0, the default, disables the
+    # background job: deleting history is opt-in
+    interval_seconds: int = 0
+    # DOC: Rows deleted per transaction
+    batch_size: int = 500
+
+    @classmethod
+    def from_env(cls) -> "RetentionSettings":
+        return cls(
+            keep_last=max(1, _env_int("HISTORY_KEEP_LAST", cls.keep_last)),
+            keep_days=_env_int("HISTORY_KEEP_DAYS", cls.keep_days),
+            interval_seconds=_env_int(
+                "HISTORY_RETENTION_INTERVAL_SECONDS", cls.interval_seconds
+            ),
+            batch_size=_env_int(
+                "HISTORY_RETENTION_BATCH_SIZE", cls.batch_size
+            ),
+        )
+
+
+# DOC: Production launcher settings (app.server). connection_budget caps the
+# database connections of all workers together, 0 leaves the pools as set
+@dataclass(frozen=True)
+class ServerSettings:
+    host: str = "127.0.0.1"
+    port: int = 8000
+    workers: int = 1
+    # DOC: uvicorn choices: auto picks uvloop / httptools when installed
+    loop: str = "auto"
+    http: str = "auto"
+    backlog: int = 2048
+    connection_budget: int = 0
+    # DOC: Seconds in-flight requests get to finish on shutdown
+    graceful_timeout: int = 30
+
+    @classmethod
+    def from_env(cls) -> "ServerSettings":
+        return cls(
+            host=os.getenv("SERVER_HOST", cls.host),
+            port=_env_int("SERVER_PORT", cls.port),
+            workers=_env_int("SERVER_WORKERS", os.cpu_count() or 1),
+            loop=os.getenv("SERVER_LOOP", cls.loop),
+            http=os.getenv("SERVER_HTTP", cls.http),
+            backlog=_env_int("SERVER_BACKLOG", cls.backlog),
+            connection_budget=_env_int(
+                "DB_CONNECTION_BUDGET", cls.connection_budget
+            ),
+            graceful_timeout=_env_int(
+                "SERVER_GRACEFUL_TIMEOUT", cls.graceful_timeout
+            ),
+        )
+
+
+# DOC: Pool size and overflow of each worker so that `workers` pools stay
+# within `budget` connections. The configured sizes are kept when they fit
+def worker_pool_limits(
+    budget: int, workers: int, pool_size: int, max_overflow: int
+) -> tuple:
+    if budget <= 0:
+        return pool_size, max_overflow
+    per_worker = budget // workers
+    if per_worker < 1:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET={budget} is too small for {workers} workers"
+        )
+    pool_size = min(pool_size, per_worker)
+    return pool_size, min(max_overflow, per_worker - pool_size)
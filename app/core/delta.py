@@ -0,0 +1,40 @@
+import json
+from difflib import SequenceMatcher
+from typing import List, Tuple, Union
+
+# DOC: A delta rebuilds an old text from the newer one as a list of ops:
+# [start, length] copies a slice of the newer text, a string is inserted
+# as is
+Op = Union[List[int], str]
+
+
+def make_delta(new: str, old: str) -> List[Op]:
+    ops: List[Op] = []
+    matcher = SequenceMatcher(None, new, old, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2 - i1])
+        elif j2 > j1:
+            ops.append(old[j1:j2])
+    return ops
+
+
+def apply_delta(new: str, ops: List[Op]) -> str:
+    return "".join(
+        op if isinstance(op, str) else new[op[0]:op[0] + op[1]]
+        for op in ops
+    )
+
+
+# DOC: Reverse delta of a (title, content) pair, serialized compactly
+def encode_delta(new: Tuple[str, str], old: Tuple[str, str]) -> str:
+    return json.dumps(
+        [make_delta(new[0], old[0]), make_delta(new[1], old[1])],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+
+
+def decode_delta(new: Tuple[str, str], delta: str) -> Tuple[str, str]:
+    title_ops, content_ops = json.loads(delta)
+    return apply_delta(new[0], title_ops), apply_delta(new[1], content_ops)
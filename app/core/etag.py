@@ -0,0 +1,74 @@
+import hashlib
+import re
+from typing import Iterable, List, Optional
+
+from fastapi import Response
+
+_NOTE_ETAG = re.compile(r'^"n(\d+)\.v(\d+)\.[0-9a-f]+"$')
+
+
+def _digest(parts: Iterable) -> str:
+    return hashlib.blake2b(
+        repr(tuple(parts)).encode(), digest_size=8
+    ).hexdigest()
+
+
+# DOC: Strong ETag of a note: id and version, plus a digest of what can
+# change without a version bump (category name/color, history count)
+def note_etag(
+    note_id: int,
+    version: int,
+    history_count: int,
+    category: Optional[tuple],
+) -> str:
+    digest = _digest((history_count, category))
+    return f'"n{note_id}.v{version}.{digest}"'
+
+
+# DOC: Strong ETag of a category
+def category_etag(category_id: int, name: str, color: str) -> str:
+    return f'"c{category_id}.{_digest((name, color))}"'
+
+
+# DOC: Aggregate ETag of a list response built from its items' ETags
+def list_etag(item_etags: Iterable[str], *extra) -> str:
+    return f'"l.{_digest((*item_etags, *extra))}"'
+
+
+# DOC: Version encoded in a note ETag, or None for foreign tags
+def note_version(etag: str) -> Optional[int]:
+    match = _NOTE_ETAG.match(etag.strip())
+    return int(match.group(2)) if match else None
+
+
+def _tags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+# DOC: If-None-Match uses the weak comparison (W/ prefixes are ignored)
+def matches_if_none_match(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in _tags(header)]
+    return "*" in tags or etag in tags
+
+
+# DOC: If-Match uses the strong comparison
+def matches_if_match(header: str, etag: Optional[str]) -> bool:
+    if etag is None:
+        return False
+    tags = _tags(header)
+    return "*" in tags or etag in tags
+
+
+# DOC: Per-user resources may only be cached privately and must be
+# revalidated before reuse
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -0,0 +1,253 @@
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+# DOC: Cumulative histogram in the Prometheus sense
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# DOC: SQL statements and time spent in the database by the current request
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _labels(**labels: str) -> str:
+    body = ",".join(
+        f'{key}="{str(value).replace(chr(34), chr(39))}"'
+        for key, value in labels.items()
+    )
+    return "{" + body + "}"
+
+
+# DOC: In-process metrics store rendered in Prometheus text format
+class MetricsRegistry:
+    def __init__(self):
+        self.in_flight = 0
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], float] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        duration: float,
+        stats: RequestStats,
+    ) -> None:
+        key = (method, route)
+        if key not in self.latency:
+            self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.queries[key] = Histogram(QUERY_BUCKETS)
+            self.db_time[key] = 0.0
+        self.latency[key].observe(duration)
+        self.queries[key].observe(stats.queries)
+        self.db_time[key] += stats.db_time
+        status_key = (method, route, status)
+        self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    # DOC: Register a callback returning extra gauges, e.g. pool usage
+    def add_collector(self, collector: Callable[[], Dict[str, float]]):
+        self.collectors.append(collector)
+
+    def _render_histogram(self, lines, name, help_text, histograms):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, route), histogram in sorted(histograms.items()):
+            cumulative = 0
+            bounds = [*histogram.buckets, "+Inf"]
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                labels = _labels(method=method, route=route, le=bound)
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _labels(method=method, route=route)
+            lines.append(f"{name}_sum{labels} {histogram.sum}")
+            lines.append(f"{name}_count{labels} {histogram.count}")
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Responses by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(self.responses.items()):
+            labels = _labels(method=method, route=route, status=status)
+            lines.append(f"http_requests_total{labels} {count}")
+        self._render_histogram(
+            lines,
+            "http_request_duration_seconds",
+            "Request latency by route.",
+            self.latency,
+        )
+        self._render_histogram(
+            lines,
+            "db_queries_per_request",
+            "SQL statements issued per request by route.",
+            self.queries,
+        )
+        lines.append(
+            "# HELP db_query_seconds_total Time spent in SQL by route."
+        )
+        lines.append("# TYPE db_query_seconds_total counter")
+        for (method, route), seconds in sorted(self.db_time.items()):
+            labels = _labels(method=method, route=route)
+            lines.append(f"db_query_seconds_total{labels} {seconds}")
+        for collector in self.collectors:
+            for name, value in collector().items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# DOC: The start time lives on the execution context of the statement, so
+# a statement that fails leaves nothing behind on the connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _record_statement(context) -> None:
+    started = getattr(context, "_metrics_start", None)
+    if started is None:
+        return
+    del context._metrics_start
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    _record_statement(context)
+
+
+# DOC: Failed statements count too: they reached the database
+def _handle_error(exception_context):
+    _record_statement(exception_context.execution_context)
+
+
+# DOC: Count statements and DB time of each request on the given engine
+def instrument_engine(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(
+        sync_engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# DOC: Route template of a request, e.g. /api/notes/{note_id}. Routes of an
+# included router may only know their own path, so the router prefix is
+# recovered from the raw path
+def route_template(scope) -> str:
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    try:
+        rendered = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return path_format
+    path = scope["path"]
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + path_format
+    return path_format
+
+
+# DOC: Pure ASGI middleware recording latency, status, in-flight requests and
+# DB usage per route template (not per raw path, to bound label cardinality).
+# With a query_budget, requests issuing more statements log a warning.
+class MetricsMiddleware:
+    def __init__(
+        self,
+        app,
+        metrics: MetricsRegistry = registry,
+        query_budget: Optional[int] = None,
+    ):
+        self.app = app
+        self.metrics = metrics
+        self.query_budget = query_budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            self.metrics.in_flight -= 1
+            _request_stats.reset(token)
+            route = route_template(scope)
+            self.metrics.observe_request(
+                scope["method"], route, status_code, duration, stats
+            )
+            if self.query_budget and stats.queries > self.query_budget:
+                logger.warning(
+                    "%s %s issued %d SQL statements (budget %d)",
+                    scope["method"],
+                    route,
+                    stats.queries,
+                    self.query_budget,
+                )
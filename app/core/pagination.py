@@ -0,0 +1,49 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Tuple, Union
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+# DOC: Opaque cursor holding the sort key of the last row of a page
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+# DOC: Inverse of encode_cursor, rejecting tampered or malformed cursors.
+# types holds the expected type of each value, so a cursor of the wrong
+# shape is a 400 here instead of a database error in the query
+def decode_cursor(
+        cursor: str,
+        *types: Union[type, Tuple[type, ...]]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        values = [_decode_value(v) for v in values]
+        for value, expected in zip(values, types):
+            # DOC: JSON true and false decode to bool, a subclass of int
+            if isinstance(value, bool) or not isinstance(value, expected):
+                raise ValueError(cursor)
+        return values
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="invalidCursor")
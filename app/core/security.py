@@ -1,4 +1,9 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 import os
@@ -6,55 +11,307 @@ from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
+from app.db.database import get_db, replica_router
 from sqlalchemy.future import select
+from sqlalchemy import event, inspect
 from app.models import User
+from app.core.cache import TTLCache, cache_backend
+from app.core.workers import BoundedExecutor, PoolSaturated
 
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+LOGIN_TOKEN_EXPIRE_MINUTES = 60
+# DOC: "database" resolves the user of every token from the users table
+# (through user_cache); "stateless" trusts the signed claims of the token
+AUTH_MODE = os.getenv("AUTH_MODE", "database")
+if AUTH_MODE not in ("database", "stateless"):
+    raise ValueError(f"Unsupported AUTH_MODE: {AUTH_MODE}")
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+# DOC: Shared store of token revocations (redis://...). memory://, the
+# default, keeps them per process
+TOKEN_DENYLIST_URL = os.getenv("TOKEN_DENYLIST_URL", "memory://")
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# DOC: bcrypt is CPU bound, so it runs in a bounded pool instead of the loop
+password_pool = BoundedExecutor(
+    kind=PASSWORD_HASH_EXECUTOR,
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+    name="bcrypt",
+)
+
+# DOC: Authenticated users keyed by token subject, so repeated requests with
+# the same token skip the users-table lookup until the entry expires
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+
+# DOC: Revocation of issued tokens. Tokens carry their issue time (iat);
+# revoking a user records when, which rejects every token issued before.
+# An entry lives ttl seconds after the last revocation, by which time every
+# token it rejects has expired, so only users revoked within a token
+# lifetime are held. Entries are kept in memory, per process; with a shared
+# backend (TOKEN_DENYLIST_URL) they are also published there, so every
+# worker and restarted process sees them
+class TokenDenylist:
+    def __init__(self, ttl: float, backend=None):
+        self.ttl = ttl
+        self.backend = backend
+        self._revoked_at: Dict[int, float] = {}
+
+    def revoke(self, user_id: int) -> float:
+        now = time.time()
+        for key in [
+            k for k, v in self._revoked_at.items() if v + self.ttl <= now
+        ]:
+            del self._revoked_at[key]
+        self._revoked_at[user_id] = now
+        return now
+
+    def is_revoked(self, user_id: int, issued_at: Optional[float]) -> bool:
+        revoked_at = self._revoked_at.get(user_id)
+        if revoked_at is None or revoked_at + self.ttl <= time.time():
+            return False
+        return issued_at is None or issued_at < revoked_at
+
+    async def publish(self, user_id: int, revoked_at: float) -> None:
+        if self.backend is not None:
+            await self.backend.set(str(user_id), repr(revoked_at).encode())
+
+    async def revoke_shared(self, user_id: int) -> float:
+        revoked_at = self.revoke(user_id)
+        await self.publish(user_id, revoked_at)
+        return revoked_at
+
+    # DOC: One backend read per token when shared. A revocation found there
+    # is kept locally for the rest of its lifetime
+    async def is_revoked_shared(
+            self, user_id: int, issued_at: Optional[float]) -> bool:
+        if self.is_revoked(user_id, issued_at):
+            return True
+        if self.backend is None:
+            return False
+        value = await self.backend.get(str(user_id))
+        if value is None:
+            return False
+        revoked_at = float(value)
+        if revoked_at + self.ttl > time.time():
+            self._revoked_at[user_id] = max(
+                revoked_at, self._revoked_at.get(user_id, 0)
+            )
+        return self.is_revoked(user_id, issued_at)
+
+    def clear(self) -> None:
+        self._revoked_at.clear()
+
+    def stats(self) -> dict:
+        return {"users": len(self._revoked_at)}
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+
+def _denylist_backend(url: Optional[str], ttl: float):
+    if not url or url.startswith("memory://"):
+        return None
+    return cache_backend(url, maxsize=0, ttl=ttl, prefix="revoked:")
+
+
+token_denylist = TokenDenylist(
+    ttl=LOGIN_TOKEN_EXPIRE_MINUTES * 60,
+    backend=_denylist_backend(
+        TOKEN_DENYLIST_URL, LOGIN_TOKEN_EXPIRE_MINUTES * 60
+    ),
+)
+# DOC: Revocations published from sync ORM events, kept until written
+_pending_publications = set()
+
+
+# DOC: Authenticated identity handed to the routes. Built from the token
+# claims in stateless mode, or from the users row otherwise
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    full_name: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, full_name=user.full_name)
+
+
+# DOC: Claims of a login token: the email stays in sub, the rest lets the
+# stateless mode rebuild the principal without a query
+def token_claims(user: User) -> dict:
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "name": user.full_name,
+    }
+
+
+# DOC: Drop a user from the authentication cache
+def invalidate_user(email: str) -> None:
+    user_cache.invalidate(email)
+
+
+# DOC: Revoke every token issued so far to a user
+async def revoke_user_tokens(user_id: int) -> None:
+    await token_denylist.revoke_shared(user_id)
+
+
+# DOC: Revoke from sync code (ORM events): locally at once, and in the
+# shared backend from a task on the running loop
+def _revoke_user_tokens_soon(user_id: int) -> None:
+    revoked_at = token_denylist.revoke(user_id)
+    if token_denylist.backend is None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning("No event loop to publish the revocation of %s",
+                       user_id)
+        return
+    task = loop.create_task(token_denylist.publish(user_id, revoked_at))
+    _pending_publications.add(task)
+    task.add_done_callback(_pending_publications.discard)
+
+
+# DOC: Keep the cache consistent when a user row changes in this process.
+# Tokens carry the profile in stateless mode, so they are revoked too
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    history = inspect(target).attrs.email.history
+    for email in (*history.deleted, *history.unchanged, *history.added):
+        invalidate_user(email)
+    _revoke_user_tokens_soon(target.id)
+
+
+def _invalid_token(detail: str = "Invalid token") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail
+    )
+
+
+def _decode_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise _invalid_token()
+
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
 ):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        result = await db.execute(select(User).where(User.email == email))
-        user = result.scalar_one_or_none()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
+    return await _user_from_payload(_decode_token(token), db)
+
+
+# DOC: User of decoded token claims, from user_cache or the users table
+async def _user_from_payload(payload: dict, db: AsyncSession) -> User:
+    email: str = payload.get("sub")
+    if email is None:
+        raise _invalid_token()
+    user = user_cache.get(email)
+    if user is not None:
         return user
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise _invalid_token("User not found")
+    # DOC: Detach the user so it can be shared safely across sessions
+    db.expunge(user)
+    user_cache.set(email, user)
+    return user
+
+
+# DOC: Dependency of the routes. In stateless mode the principal comes
+# from the token claims alone and the database is never queried; the
+# session is only opened if used. Revoked tokens are rejected in both modes
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    payload = _decode_token(token)
+    user_id = payload.get("uid")
+    if user_id is not None and await token_denylist.is_revoked_shared(
+        user_id, payload.get("iat")
+    ):
+        raise _invalid_token("Token revoked")
+    if AUTH_MODE == "database":
+        principal = Principal.from_user(
+            await _user_from_payload(payload, db)
+        )
+    else:
+        email = payload.get("sub")
+        if user_id is None or email is None:
+            raise _invalid_token()
+        principal = Principal(
+            id=user_id, email=email, full_name=payload.get("name", "")
         )
+    # DOC: Writes committed on this session start the read-your-writes
+    # window of the user (app.db.replica)
+    db.info["user_id"] = principal.id
+    return principal
+
+
+# DOC: Session of the read-only routes: the replica when one is configured
+# and the user has not written recently, the primary session otherwise
+async def get_read_db(
+    user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    session = await replica_router.open_session(user.id)
+    if session is None:
+        yield db
+        return
+    async with session:
+        yield session
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify_password_sync(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
+def _hash_password_sync(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# DOC: Run a bcrypt job in the pool, rejecting it fast when saturated
+async def _run_password_job(func, *args):
+    try:
+        return await password_pool.run(func, *args)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="serverBusy",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job(
+        _verify_password_sync, plain_password, hashed_password
+    )
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run_password_job(_hash_password_sync, password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -63,6 +320,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
         expire = datetime.now(timezone.utc) + timedelta(
             minutes=ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    # DOC: Fractional, so a token issued right after a revocation is newer
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
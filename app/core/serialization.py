@@ -0,0 +1,65 @@
+from operator import attrgetter
+from typing import Any, Callable, Optional, Type, Union, get_args, get_origin
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+Dumper = Callable[[Any], Any]
+
+
+# DOC: JSON response encoded with orjson. Bytes are sent as they are, so
+# payloads serialized ahead of time (e.g. cached ones) are not re-encoded
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
+
+
+def _value_dumper(annotation: Any) -> Optional[Dumper]:
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        inner = _value_dumper(args[0]) if len(args) == 1 else None
+        if inner is None:
+            return None
+        return lambda value: None if value is None else inner(value)
+    if origin is list:
+        inner = _value_dumper(get_args(annotation)[0])
+        if inner is None:
+            return list
+        return lambda values: [inner(value) for value in values]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return compile_dumper(annotation)
+    return None
+
+
+# DOC: Compile a response schema into a function turning an ORM object,
+# a model instance or a dict with its fields into plain data for orjson.
+# Fields are read as they are, without the validation of model_validate:
+# meant for read routes whose data comes straight from the database
+def compile_dumper(model: Type[BaseModel]) -> Dumper:
+    names = tuple(model.model_fields)
+    dumpers = [
+        (index, name, dumper)
+        for index, (name, field) in enumerate(model.model_fields.items())
+        for dumper in [_value_dumper(field.annotation)]
+        if dumper is not None
+    ]
+    get_all = attrgetter(*names)
+    if len(names) == 1:
+        def get_all(obj, _get=get_all):
+            return (_get(obj),)
+
+    def dump(obj: Any) -> dict:
+        if isinstance(obj, dict):
+            values = [obj.get(name) for name in names]
+        else:
+            values = list(get_all(obj))
+        for index, name, dumper in dumpers:
+            values[index] = dumper(values[index])
+        return dict(zip(names, values))
+    return dump
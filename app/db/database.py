@@ -1,18 +1,34 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declarative_base
-from dotenv import load_dotenv
-import os
+from app.core.config import DatabaseSettings
+from app.db.replica import ReplicaRouter, track_writes
 
-load_dotenv()
+settings = DatabaseSettings.from_env()
+DATABASE_URL = settings.url
+
+
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+# DOC: SQLite only enforces foreign keys, and their ON DELETE actions, on
+# connections that ask for it
+def enable_foreign_keys(db_engine) -> None:
+    sync_engine = getattr(db_engine, "sync_engine", db_engine)
+    if sync_engine.dialect.name != "sqlite":
+        return
+    if event.contains(sync_engine, "connect", _sqlite_foreign_keys):
+        return
+    event.listen(sync_engine, "connect", _sqlite_foreign_keys)
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    print("Error: Failed to load database URL from .env file")
-DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
 # DOC: Create the asynchronous motor
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, **settings.engine_kwargs())
+enable_foreign_keys(engine)
 
 # DOC: Create asynchronous session
 async_session = sessionmaker(
@@ -21,6 +37,26 @@ async_session = sessionmaker(
     expire_on_commit=False
 )
 
+# DOC: Optional read replica (DATABASE_REPLICA_URL), used by get_read_db
+replica_engine = None
+replica_session = None
+if settings.replica_url:
+    replica_engine = create_async_engine(
+        settings.replica_url, **settings.engine_kwargs()
+    )
+    enable_foreign_keys(replica_engine)
+    replica_session = sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+replica_router = ReplicaRouter(
+    replica_session,
+    read_your_writes_seconds=settings.read_your_writes_seconds,
+    retry_seconds=settings.replica_retry_seconds,
+)
+track_writes(replica_router)
+
 # DOC: Basis for models
 Base = declarative_base()
 
@@ -29,3 +65,14 @@ Base = declarative_base()
 async def get_db():
     async with async_session() as session:
         yield session
+
+
+# DOC: Live connection pool usage of an engine
+def pool_stats(db_engine=engine) -> dict:
+    pool = db_engine.sync_engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
@@ -0,0 +1,106 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Set
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import pool, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.models import Base
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# DOC: Session-level advisory lock held by "migrate" startups on Postgres,
+# so workers booting together upgrade the schema one at a time
+MIGRATION_LOCK_ID = 0x4E4D
+
+
+# DOC: Raised at startup when the database is not at the Alembic head
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+# DOC: alembic.ini of the project, usable from any working directory
+def alembic_config() -> Config:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+# DOC: Revisions the code expects, read once from alembic/versions
+@lru_cache(maxsize=1)
+def head_revisions() -> frozenset:
+    return frozenset(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+# DOC: Revisions stamped in alembic_version, empty for an unmigrated database
+async def current_revisions(db_engine: AsyncEngine) -> Set[str]:
+    async with db_engine.connect() as conn:
+        return await conn.run_sync(
+            lambda sync_conn: set(
+                MigrationContext.configure(sync_conn).get_current_heads()
+            )
+        )
+
+
+# DOC: Fail fast when the database is behind (or ahead of) the code. One
+# read of alembic_version, with no DDL and no catalog scan of the models
+async def check_schema(db_engine: AsyncEngine) -> None:
+    current = await current_revisions(db_engine)
+    heads = set(head_revisions())
+    if current != heads:
+        raise SchemaOutOfDate(
+            f"Database schema is at {sorted(current) or 'no revision'}, "
+            f"the code expects {sorted(heads)}; run `alembic upgrade head`"
+        )
+
+
+def _upgrade(sync_conn) -> None:
+    postgres = sync_conn.dialect.name == "postgresql"
+    if postgres:
+        sync_conn.execute(
+            text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID}
+        )
+        sync_conn.commit()
+    try:
+        config = alembic_config()
+        config.attributes["connection"] = sync_conn
+        command.upgrade(config, "head")
+    finally:
+        if postgres:
+            sync_conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"),
+                {"key": MIGRATION_LOCK_ID},
+            )
+            sync_conn.commit()
+
+
+# DOC: Upgrade the database to the Alembic head. The migrations run on an
+# engine of their own, without the listeners of the application engine
+# (SQLite foreign keys would cascade the table rebuilds of batch mode)
+async def upgrade_schema(db_engine: AsyncEngine) -> None:
+    migration_engine = create_async_engine(
+        db_engine.url, poolclass=pool.NullPool
+    )
+    try:
+        async with migration_engine.connect() as conn:
+            await conn.run_sync(_upgrade)
+    finally:
+        await migration_engine.dispose()
+
+
+# DOC: Startup step of the lifespan for DatabaseSettings.schema_mode
+async def prepare_schema(db_engine: AsyncEngine, mode: str) -> None:
+    if mode == "check":
+        await check_schema(db_engine)
+    elif mode == "migrate":
+        await upgrade_schema(db_engine)
+    elif mode == "create":
+        async with db_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    else:
+        raise ValueError(f"Unsupported DB_SCHEMA_MODE: {mode}")
@@ -0,0 +1,45 @@
+from typing import List, Optional
+
+from sqlalchemy import event
+
+
+# DOC: Raised when a block issues more SQL statements than its budget
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# DOC: Context manager counting the SQL statements executed on an engine,
+# used to pin query budgets in tests and to catch accidental N+1 loads:
+#
+#     with QueryCounter(engine, max_queries=2):
+#         await client.get("/api/notes/")
+class QueryCounter:
+    def __init__(self, engine, max_queries: Optional[int] = None):
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.max_queries = max_queries
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context,
+                    executemany):
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        if exc_type is None and self.max_queries is not None:
+            if self.count > self.max_queries:
+                listing = "\n".join(
+                    f"  {i}. {s}" for i, s in enumerate(self.statements, 1)
+                )
+                raise QueryBudgetExceeded(
+                    f"{self.count} queries executed, budget is "
+                    f"{self.max_queries}:\n{listing}"
+                )
+        return False
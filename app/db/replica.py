@@ -0,0 +1,207 @@
+import logging
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+# DOC: Cookie carrying the end of the read-your-writes window of a client,
+# so it holds on every worker and not only on the one that took the write
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+# DOC: Writes of the current request: the window end sent by the client and
+# whether a session committed a write. Set by ReadYourWritesMiddleware
+_request_writes: ContextVar[Optional[dict]] = ContextVar(
+    "request_writes", default=None
+)
+
+
+# DOC: Users who committed a write in the last `window` seconds. Their reads
+# stay on the primary until the replica has had time to catch up. Kept in
+# memory: it is per process, like the token denylist; the cookie set by
+# ReadYourWritesMiddleware carries the window across workers
+class RecentWriters:
+    def __init__(self, window: float):
+        self.window = window
+        self._deadlines: Dict[int, float] = {}
+
+    def mark(self, user_id: int) -> None:
+        if self.window <= 0:
+            return
+        now = time.monotonic()
+        for key in [k for k, v in self._deadlines.items() if v <= now]:
+            del self._deadlines[key]
+        self._deadlines[user_id] = now + self.window
+
+    def is_recent(self, user_id: int) -> bool:
+        deadline = self._deadlines.get(user_id)
+        return deadline is not None and deadline > time.monotonic()
+
+    def clear(self) -> None:
+        self._deadlines.clear()
+
+    def stats(self) -> dict:
+        return {"users": len(self._deadlines)}
+
+
+# DOC: Picks the session of a read-only request: the replica, unless there
+# is none, the user wrote recently or the replica is unreachable. A failed
+# connection sends every read to the primary for `retry_seconds`
+class ReplicaRouter:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]],
+        read_your_writes_seconds: float = 5.0,
+        retry_seconds: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.recent_writers = RecentWriters(read_your_writes_seconds)
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None
+
+    # DOC: An open replica session, or None to read from the primary
+    async def open_session(self, user_id: int) -> Optional[AsyncSession]:
+        if (
+            not self.enabled
+            or self.recent_writers.is_recent(user_id)
+            or _pinned_to_primary()
+            or self._down_until > time.monotonic()
+        ):
+            self.primary_reads += 1
+            return None
+        session = self.session_factory()
+        try:
+            await session.connection()
+        except (DBAPIError, OSError):
+            await session.close()
+            logger.warning("Replica unreachable, reading from the primary",
+                           exc_info=True)
+            self._down_until = time.monotonic() + self.retry_seconds
+            self.fallbacks += 1
+            self.primary_reads += 1
+            return None
+        # DOC: Lets shared caches skip results that may be stale
+        session.info["replica"] = True
+        self.replica_reads += 1
+        return session
+
+    def stats(self) -> dict:
+        return {
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "recent_writers": self.recent_writers.stats()["users"],
+        }
+
+
+# DOC: Whether the client sent a read-your-writes window still open
+def _pinned_to_primary() -> bool:
+    state = _request_writes.get()
+    return state is not None and state["until"] > time.time()
+
+
+# DOC: Flag a write the session events cannot see, such as a COPY run on
+# the driver connection
+def mark_written(session) -> None:
+    session.info["wrote"] = True
+
+
+# DOC: Sessions of authenticated requests carry their user in info
+# ["user_id"]. Inserts, updates and deletes, through the ORM or as
+# statements, flag the session; its next commit starts the read-your-writes
+# window of the user
+def track_writes(router: ReplicaRouter) -> None:
+    @event.listens_for(Session, "do_orm_execute")
+    def _on_execute(state):
+        if state.is_insert or state.is_update or state.is_delete:
+            mark_written(state.session)
+
+    @event.listens_for(Session, "after_flush")
+    def _on_flush(session, flush_context):
+        mark_written(session)
+
+    @event.listens_for(Session, "after_commit")
+    def _on_commit(session):
+        user_id = session.info.get("user_id")
+        if session.info.pop("wrote", False) and user_id is not None:
+            router.recent_writers.mark(user_id)
+            state = _request_writes.get()
+            if state is not None:
+                state["wrote"] = True
+
+
+def _cookie_until(scope, window: float) -> float:
+    for name, value in scope["headers"]:
+        if name != b"cookie":
+            continue
+        morsel = SimpleCookie(value.decode("latin-1")).get(
+            READ_YOUR_WRITES_COOKIE
+        )
+        if morsel is None:
+            continue
+        try:
+            until = float(morsel.value)
+        except ValueError:
+            return 0.0
+        # DOC: A forged value cannot pin a client beyond one window
+        return min(until, time.time() + window)
+    return 0.0
+
+
+# DOC: ASGI middleware carrying the read-your-writes window in a cookie. A
+# request that commits a write gets a cookie ending the window `window`
+# seconds later; the reads of any worker that receive it use the primary
+class ReadYourWritesMiddleware:
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        window = self.router.recent_writers.window
+        if (
+            scope["type"] != "http"
+            or not self.router.enabled
+            or window <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+        state = {"until": _cookie_until(scope, window), "wrote": False}
+
+        async def _send(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                cookie = SimpleCookie()
+                cookie[READ_YOUR_WRITES_COOKIE] = (
+                    f"{time.time() + window:.3f}"
+                )
+                morsel = cookie[READ_YOUR_WRITES_COOKIE]
+                morsel.update({
+                    "max-age": str(max(1, round(window))),
+                    "path": "/",
+                    "httponly": True,
+                    "samesite": "Lax",
+                })
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", morsel.OutputString().encode("latin-1")),
+                ]
+            await send(message)
+
+        token = _request_writes.set(state)
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _request_writes.reset(token)
@@ -1,20 +1,51 @@
 from fastapi import FastAPI
-from contextlib import asynccontextmanager
-from app.db.database import engine
-from app.models import Base
-from app.routers import auth, notes, categories, notesHistory
+from contextlib import asynccontextmanager, suppress
+from app.db.database import (
+    async_session,
+    engine,
+    pool_stats,
+    replica_engine,
+    replica_router,
+    settings,
+)
+from app.db.migrations import prepare_schema
+from app.db.replica import ReadYourWritesMiddleware
+from app.core.config import RetentionSettings
+from app.services.retention import run_retention_periodically
+from app.core.security import password_pool, token_denylist, user_cache
+from app.services.categories import category_cache
+from app.core.metrics import MetricsMiddleware, instrument_engine, registry
+from app.routers import auth, notes, categories, notesHistory, metrics
+import asyncio
+import os
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # DOC: Start event: Create tables if it does not exist
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # DOC: Start event: check that the schema is at the Alembic head (or
+    # upgrade it, or create the tables) per DB_SCHEMA_MODE
+    await prepare_schema(engine, settings.schema_mode)
+    # DOC: Prune notes_history in the background per the retention policy
+    retention = RetentionSettings.from_env()
+    retention_task = None
+    if retention.interval_seconds > 0:
+        retention_task = asyncio.create_task(
+            run_retention_periodically(async_session, retention)
+        )
     yield
-    # DOC: Shutdown event: Shut down database engine
+    if retention_task is not None:
+        retention_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await retention_task
+    # DOC: Shutdown event: Shut down database engine and hashing pool
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+    password_pool.shutdown()
+    await category_cache.close()
+    await token_denylist.close()
 
 # DOC: FastAPI application instance with lifecycle handler
 app = FastAPI(
@@ -33,6 +64,40 @@ app.add_middleware(
     allow_headers=["*"],  # DOC: Allow all headers
 )
 
+# DOC: Per-route latency, status and query metrics, served at /metrics.
+# DOC: QUERY_BUDGET logs a warning for requests issuing more statements
+app.add_middleware(
+    MetricsMiddleware,
+    query_budget=int(os.getenv("QUERY_BUDGET", "0")) or None,
+)
+# DOC: Carries the read-your-writes window of a client across workers
+app.add_middleware(ReadYourWritesMiddleware, router=replica_router)
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+registry.add_collector(lambda: {
+    f"db_pool_{name}": value
+    for name, value in pool_stats().items()
+    if name != "pool"
+})
+registry.add_collector(lambda: {
+    f"user_cache_{name}": value for name, value in user_cache.stats().items()
+})
+registry.add_collector(lambda: {
+    f"category_cache_{name}": value
+    for name, value in category_cache.stats().items()
+})
+registry.add_collector(lambda: {
+    f"db_{name}": value for name, value in replica_router.stats().items()
+})
+registry.add_collector(lambda: {
+    "token_denylist_users": token_denylist.stats()["users"],
+})
+registry.add_collector(lambda: {
+    "password_pool_pending": password_pool.pending,
+    "password_pool_rejected": password_pool.rejected,
+})
+
 # DOC: Register routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(notes.router, prefix="/api/notes", tags=["Notes"])
@@ -46,7 +111,9 @@ app.include_router(
     prefix="/api/notes-history",
     tags=["NotesHistory"]
 )
+app.include_router(metrics.router, tags=["Metrics"])
 
-# DOC: Starts the server
+# DOC: Starts the development server with auto-reload. Production runs the
+# multi-worker launcher: python -m app.server
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
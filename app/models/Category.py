@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from app.db.database import Base
 from sqlalchemy.orm import relationship
 
@@ -6,6 +6,10 @@ from sqlalchemy.orm import relationship
 # DOC: category model for the database
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        # DOC: Categories of a user, and ownership checks by id
+        Index("ix_categories_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     name = Column(String(20), nullable=False, index=True)
@@ -14,5 +18,11 @@ class Category(Base):
 
     # DOC: Relationship with the users table
     user = relationship("User", back_populates="categories")
-    notes = relationship("Note", back_populates="category")
-    notes_history = relationship("NoteHistory", back_populates="category")
+    # DOC: A category with notes is never deleted; the database sets the
+    # category of older versions to NULL
+    notes = relationship(
+        "Note", back_populates="category", passive_deletes=True
+    )
+    notes_history = relationship(
+        "NoteHistory", back_populates="category", passive_deletes=True
+    )
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import DDL, Index, event, text
 from app.db.database import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
@@ -7,18 +8,56 @@ from sqlalchemy.orm import relationship
 # DOC: Note model for the database
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        # DOC: Keyset pages of a user, newest first
+        Index("ix_notes_user_id_created_id", "user_id", "created", "id"),
+        # DOC: Category deletes check for notes through it
+        Index("ix_notes_category_id", "category_id"),
+        # DOC: Full-text index on Postgres, kept in sync by the database
+        Index(
+            "ix_notes_search",
+            text("to_tsvector('simple', title || ' ' || content)"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     title = Column(String(50), nullable=False)
     content = Column(String(200), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created = Column(DateTime, default=datetime.utcnow, nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    # DOC: A category with notes cannot be deleted
+    category_id = Column(
+        Integer,
+        ForeignKey("categories.id"),
+        nullable=False,
+    )
     version = Column(Integer, nullable=False, default=1)
 
     # DOC: Relations
     owner = relationship("User", back_populates="notes")
     category = relationship("Category", back_populates="notes")
+    # DOC: The database deletes the history, so it is never loaded for it
     history = relationship(
-        "NoteHistory", back_populates="note", cascade="all, delete"
+        "NoteHistory",
+        back_populates="note",
+        cascade="all, delete",
+        passive_deletes=True,
     )
+
+
+# DOC: SQLite has no tsvector, so an FTS5 table (rowid = note id) is created
+# next to notes and kept in sync by app.services.search
+event.listen(
+    Note.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts "
+        "USING fts5(title, content)"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    Note.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS notes_fts").execute_if(dialect="sqlite"),
+)
@@ -1,20 +1,47 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Index, false
 from app.db.database import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
 
 
-# DOC: Note model for the database
+# DOC: Note model for the database. Keyframes store title and content in
+# full; other rows only store a reverse delta against the next revision of
+# the note (the next history row by id, or the note itself). Use
+# app.services.historyStorage to read and write them
 class NoteHistory(Base):
     __tablename__ = "notes_history"
+    __table_args__ = (
+        # DOC: History of a note by id: pages, delta chains, counts and
+        # cascades from notes
+        Index("ix_notes_history_note_id_id", "note_id", "id"),
+        # DOC: Category deletes clear it through this index
+        Index("ix_notes_history_category_id", "category_id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, index=True)
-    title = Column(String(50), nullable=False)
-    content = Column(String(200), nullable=False)
+    title = Column(String(50), nullable=True)
+    content = Column(String(200), nullable=True)
+    delta = Column(Text, nullable=True)
+    # DOC: A full row at a non-keyframe version whose delta was found no
+    # smaller than its text; compaction does not check it again
+    kept_full = Column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
     created = Column(DateTime, default=datetime.utcnow, nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    # DOC: Cleared when the category is deleted; restoring such a version
+    # keeps the current category of the note
+    category_id = Column(
+        Integer,
+        ForeignKey("categories.id", ondelete="SET NULL"),
+        nullable=True,
+    )
     version = Column(Integer, nullable=False, default=1)
-    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    note_id = Column(
+        Integer,
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        nullable=False,
+    )
 
     # DOC: Relations
     note = relationship("Note", back_populates="history")
@@ -1,7 +1,18 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import column_property
 from app.db.database import Base
 from app.models.User import User
 from app.models.Note import Note
 from app.models.Category import Category
 from app.models.NoteHistory import NoteHistory
 
+# DOC: Number of history rows of a note, loaded as a correlated subquery so
+# responses can report it without hydrating the history collection
+Note.history_count = column_property(
+    select(func.count(NoteHistory.id))
+    .where(NoteHistory.note_id == Note.id)
+    .correlate_except(NoteHistory)
+    .scalar_subquery()
+)
+
 __all__ = ["Base", "User", "Note", "Category", "NoteHistory"]
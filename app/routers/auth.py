@@ -5,6 +5,11 @@ from app.services.auth import create_user, get_user_by_email
 from app.schemes.auth import UserCreate, UserResponse
 from app.services.auth import login_user
 from app.schemes.auth import LoginRequest, TokenResponse
+from app.core.security import (
+    Principal,
+    get_current_principal,
+    revoke_user_tokens,
+)
 
 router = APIRouter()
 
@@ -33,6 +38,21 @@ async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     return token_data
 
 
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Logout User",
+    description="Revoke every access token issued to the user"
+)
+async def logout(user: Principal = Depends(get_current_principal)):
+    """
+    Revoke every access token issued to the authenticated user, so a new
+    login is needed on every device. Every worker honours it only with a
+    shared TOKEN_DENYLIST_URL; with memory:// it holds in this process
+    """
+    await revoke_user_tokens(user.id)
+
+
 @router.post(
     "/register",
     response_model=UserResponse,
@@ -1,22 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
 from app.services.categories import (
-    get_categories,
+    get_categories_payload,
     get_category_by_id,
     create_category,
     update_category,
     delete_category,
+    get_category_etag,
+    get_category_etag_of,
 )
 from app.schemes.categories import (
     CategoryCreate,
     CategoryUpdate,
     CategoryResponse,
+    dump_category,
 )
-from app.models import User
-from app.core.security import get_current_user
+from app.core.security import (
+    Principal,
+    get_current_principal,
+    get_read_db,
+)
+from app.core.etag import matches_if_none_match, not_modified, set_etag
+from app.core.serialization import ORJSONResponse
 
 router = APIRouter()
 
@@ -28,14 +36,23 @@ router = APIRouter()
     description="Read all categories from authenticate user"
 )
 async def read_categories(
-    db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Read all categories from authenticate user
+
+    The response carries an `ETag`; send it back in `If-None-Match` to get
+    `304 Not Modified` while the categories are unchanged. Listings are
+    served from a per-user cache that every category write invalidates.
     """
-    categories = await get_categories(db, user_id=user.id)
-    return categories
+    etag, body = await get_categories_payload(db, user_id=user.id)
+    if matches_if_none_match(if_none_match, etag):
+        return not_modified(etag)
+    response = ORJSONResponse(body)
+    set_etag(response, etag)
+    return response
 
 
 @router.get(
@@ -46,19 +63,30 @@ async def read_categories(
 )
 async def read_category(
     category_id: int,
-    db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Read a specific category from authenticate user
     - **category_id**: ID of the category
+
+    The response carries an `ETag` usable in `If-None-Match`.
     """
+    if if_none_match:
+        etag = await get_category_etag(
+            db, category_id=category_id, user_id=user.id
+        )
+        if etag and matches_if_none_match(if_none_match, etag):
+            return not_modified(etag)
     category = await get_category_by_id(
         db, category_id=category_id, user_id=user.id
     )
     if not category:
         raise HTTPException(status_code=404, detail="categoryNotFound")
-    return category
+    response = ORJSONResponse(dump_category(category))
+    set_etag(response, get_category_etag_of(category))
+    return response
 
 
 @router.post(
@@ -70,7 +98,7 @@ async def read_category(
 async def create_new_category(
     category: CategoryCreate,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Create a new category from authenticate user
@@ -90,7 +118,7 @@ async def update_existing_note(
     category_id: int,
     category_update: CategoryUpdate,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Update a specific note from authenticate user
@@ -119,7 +147,7 @@ async def update_existing_note(
 async def delete_existing_category(
     category_id: int,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Delete a specific category from authenticate user
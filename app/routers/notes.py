@@ -1,6 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Optional
 
 from app.db.database import get_db
 from app.services.notes import (
@@ -9,29 +18,122 @@ from app.services.notes import (
     get_note_by_id,
     update_note,
     delete_note,
+    apply_note_batch,
+    get_notes_page_etag,
+    get_notes_page_etag_of,
+    get_note_etag,
+    get_note_etag_of,
+    resolve_update_version,
+    export_notes,
+)
+from app.services.notesHistory import get_note_history
+from app.services.notesImport import import_notes
+from app.services.search import search_notes
+from app.schemes.notes import (
+    NoteCreate,
+    NoteUpdate,
+    NoteResponse,
+    NotePage,
+    NoteBatchRequest,
+    NoteBatchResponse,
+    EXPORT_CHUNK_SIZE,
+    IMPORT_BATCH_SIZE,
+    NoteImportResult,
+    dump_note,
+    dump_note_page,
 )
-from app.schemes.notes import NoteCreate, NoteUpdate, NoteResponse
-from app.models import User
-from app.core.security import get_current_user
+from app.schemes.notesHistory import NoteHistoryPage, dump_note_history_page
+from app.core.security import (
+    Principal,
+    get_current_principal,
+    get_read_db,
+)
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.etag import matches_if_none_match, not_modified, set_etag
+from app.core.serialization import ORJSONResponse
 
 router = APIRouter()
 
 
 @router.get(
     "/",
-    response_model=List[NoteResponse],
+    response_model=NotePage,
     summary="Read Notes",
-    description="Read all notes from authenticate user"
+    description="Read a page of notes from authenticate user"
 )
 async def read_notes(
-    db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
+):
+    """
+    Read a page of notes from authenticate user, newest first
+    - **limit**: Maximum number of notes in the page
+    - **cursor**: `next_cursor` returned by the previous page
+
+    The response carries an `ETag`; send it back in `If-None-Match` to get
+    `304 Not Modified` while the page is unchanged.
+    """
+    if if_none_match:
+        etag = await get_notes_page_etag(
+            db, user_id=user.id, limit=limit, cursor=cursor
+        )
+        if matches_if_none_match(if_none_match, etag):
+            return not_modified(etag)
+    page = await get_notes(db, user_id=user.id, limit=limit, cursor=cursor)
+    response = ORJSONResponse(dump_note_page(page))
+    set_etag(response, get_notes_page_etag_of(page))
+    return response
+
+
+@router.get(
+    "/search",
+    response_model=NotePage,
+    summary="Search Notes",
+    description="Full-text search over the notes of authenticate user"
+)
+async def search_user_notes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
+):
+    """
+    Search the titles and contents of the notes, best match first
+    - **q**: Search text
+    - **limit**: Maximum number of notes in the page
+    - **cursor**: `next_cursor` returned by the previous page
+    """
+    page = await search_notes(
+        db, user_id=user.id, q=q, limit=limit, cursor=cursor
+    )
+    return ORJSONResponse(dump_note_page(page))
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export Notes",
+    description="Stream every note of authenticate user with its history"
+)
+async def export_user_notes(
+    chunk_size: int = Query(EXPORT_CHUNK_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
 ):
     """
-    Read all notes from authenticate user
+    Export every note of authenticate user as NDJSON, one note per line
+    with its category and full history
+    - **chunk_size**: Notes fetched from the database per round trip
     """
-    notes = await get_notes(db, user_id=user.id)
-    return notes
+    return StreamingResponse(
+        export_notes(db, user_id=user.id, chunk_size=chunk_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'},
+    )
 
 
 @router.get(
@@ -42,17 +144,52 @@ async def read_notes(
 )
 async def read_note(
     note_id: int,
-    db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Read a specific note from authenticate user
     - **note_id**: ID of the note
+
+    The response carries an `ETag`; send it back in `If-None-Match` to get
+    `304 Not Modified` while the note is unchanged.
     """
+    if if_none_match:
+        etag = await get_note_etag(db, note_id=note_id, user_id=user.id)
+        if etag and matches_if_none_match(if_none_match, etag):
+            return not_modified(etag)
     note = await get_note_by_id(db, note_id=note_id, user_id=user.id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-    return note
+    response = ORJSONResponse(dump_note(note))
+    set_etag(response, get_note_etag_of(note))
+    return response
+
+
+@router.get(
+    "/{note_id}/history",
+    response_model=NoteHistoryPage,
+    summary="Read Note History",
+    description="Read a page of the history of a note from authenticate user"
+)
+async def read_note_history(
+    note_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    user: Principal = Depends(get_current_principal),
+):
+    """
+    Read a page of the history of a note, newest first
+    - **note_id**: ID of the note
+    - **limit**: Maximum number of history entries in the page
+    - **cursor**: `next_cursor` returned by the previous page
+    """
+    page = await get_note_history(
+        db, note_id=note_id, user_id=user.id, limit=limit, cursor=cursor
+    )
+    return ORJSONResponse(dump_note_history_page(page))
 
 
 @router.post(
@@ -64,7 +201,7 @@ async def read_note(
 async def create_new_note(
     note: NoteCreate,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Create a new note from authenticate user
@@ -74,6 +211,57 @@ async def create_new_note(
     return await create_note(db, note, user_id=user.id)
 
 
+@router.post(
+    "/batch",
+    response_model=NoteBatchResponse,
+    summary="Batch Notes",
+    description="Create, update and delete many notes in one request"
+)
+async def batch_notes(
+    batch: NoteBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_principal),
+):
+    """
+    Apply many note operations in a single transaction
+    - **operations**: List of `create`, `update` or `delete` operations.
+      Each result carries its own status: 404 for unknown notes or
+      categories, 409 for a stale `version`, 400 for a note repeated
+      in the same batch.
+    """
+    return await apply_note_batch(
+        db, operations=batch.operations, user_id=user.id
+    )
+
+
+@router.post(
+    "/import",
+    response_model=NoteImportResult,
+    summary="Import Notes",
+    description="Bulk import notes from a streamed NDJSON body"
+)
+async def import_user_notes(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_principal),
+):
+    """
+    Import notes from an NDJSON body, one note per line
+    - **title**, **content**: Fields of the note
+    - **category_id**: Existing category of the user, or
+    - **category**: `{"name", "color"}`, matched by name and created when
+      missing
+
+    Lines of `GET /api/notes/export` can be imported as they are. Rows are
+    written in transactions of `batch_size`; invalid rows are skipped and
+    reported with their line number.
+    """
+    return await import_notes(
+        db, request.stream(), user_id=user.id, batch_size=batch_size
+    )
+
+
 @router.put(
     "/{note_id}",
     response_model=NoteResponse,
@@ -83,13 +271,25 @@ async def create_new_note(
 async def update_existing_note(
     note_id: int,
     note_update: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Update a specific note from authenticate user
     - **note_id**: ID of the note
+    - **version**: Current version of the note. It may be omitted when the
+      `If-Match` header carries the note `ETag`; a stale `If-Match` fails
+      with 412 and a request with neither fails with 428.
     """
+    note_update = await resolve_update_version(
+        db,
+        note_id=note_id,
+        note_update=note_update,
+        user_id=user.id,
+        if_match=if_match,
+    )
     note = await update_note(
         db, note_id=note_id, note_update=note_update, user_id=user.id
     )
@@ -98,6 +298,7 @@ async def update_existing_note(
             status_code=404,
             detail="Note not found or not authorized"
         )
+    set_etag(response, get_note_etag_of(note))
     return note
 
 
@@ -110,7 +311,7 @@ async def update_existing_note(
 async def delete_existing_note(
     note_id: int,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Delete a specific note from authenticate user
@@ -7,8 +7,7 @@ from app.services.notesHistory import (
 )
 from app.schemes.notesHistory import NoteHistoryResponse
 from app.schemes.notes import NoteResponse
-from app.models import User
-from app.core.security import get_current_user
+from app.core.security import Principal, get_current_principal
 
 router = APIRouter()
 
@@ -22,7 +21,7 @@ router = APIRouter()
 async def restore_note(
     history_id: int,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Restore a note from a specific notes_history entry.
@@ -45,7 +44,7 @@ async def restore_note(
 async def delete_existing_note_history(
     note_history_id: int,
     db: AsyncSession = Depends(get_db),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_principal),
 ):
     """
     Delete a specific note from authenticate user
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from app.core.serialization import compile_dumper
 
 
 class CategoryCreate(BaseModel):
@@ -16,5 +17,7 @@ class CategoryResponse(BaseModel):
     name: str
     color: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+dump_category = compile_dumper(CategoryResponse)
@@ -1,8 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from datetime import datetime
-from typing import List
+from typing import List, Literal, Optional
+from app.core.serialization import compile_dumper
 from app.schemes.categories import CategoryResponse
-from app.schemes.notesHistory import NoteHistoryResponse
 
 
 class NoteCreate(BaseModel):
@@ -15,8 +15,9 @@ class NoteUpdate(BaseModel):
     title: str
     content: str
     category_id: int
-    # DOC: New field for optimistic concurrency control
-    version: int
+    # DOC: New field for optimistic concurrency control. It may be omitted
+    # when the request carries an If-Match header with the note ETag
+    version: Optional[int] = None
 
 
 class NoteResponse(BaseModel):
@@ -25,8 +26,134 @@ class NoteResponse(BaseModel):
     content: str
     created: datetime
     version: int
-    history: List[NoteHistoryResponse]
+    # DOC: History is served by GET /api/notes/{id}/history
+    history_count: int
     category: CategoryResponse
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NotePage(BaseModel):
+    items: List[NoteResponse]
+    # DOC: Opaque cursor for the next page, null on the last page
+    next_cursor: Optional[str] = None
+
+
+# DOC: Serializers of the read routes' fast path (app.core.serialization)
+dump_note = compile_dumper(NoteResponse)
+dump_note_page = compile_dumper(NotePage)
+
+
+# DOC: History row as written by GET /api/notes/export
+class NoteHistoryExport(BaseModel):
+    id: int
+    title: str
+    content: str
+    created: datetime
+    version: int
+    category_id: Optional[int] = None
+
+
+# DOC: One NDJSON line of GET /api/notes/export
+class NoteExport(BaseModel):
+    id: int
+    title: str
+    content: str
+    created: datetime
+    version: int
+    category: CategoryResponse
+    history: List[NoteHistoryExport]
+
+
+dump_note_export = compile_dumper(NoteExport)
+
+
+# DOC: Notes loaded per round trip by GET /api/notes/export
+EXPORT_CHUNK_SIZE = 500
+
+
+# DOC: Upper bound of operations accepted by POST /api/notes/batch
+MAX_BATCH_OPERATIONS = 100
+
+
+class NoteBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    category_id: Optional[int] = None
+    version: Optional[int] = None
+
+    @model_validator(mode="after")
+    def validate_fields(self):
+        required = {
+            "create": ("title", "content", "category_id"),
+            "update": ("id", "title", "content", "category_id", "version"),
+            "delete": ("id",),
+        }[self.op]
+        missing = [name for name in required if getattr(self, name) is None]
+        if missing:
+            raise ValueError(
+                f"Operation {self.op} requires: {', '.join(missing)}"
+            )
+        return self
+
+
+class NoteBatchRequest(BaseModel):
+    operations: List[NoteBatchOperation] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_OPERATIONS
+    )
+
+
+class NoteBatchResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    detail: Optional[str] = None
+    note: Optional[NoteResponse] = None
+
+
+class NoteBatchResponse(BaseModel):
+    results: List[NoteBatchResult]
+
+
+# DOC: Category of an imported note, matched by name and created when missing
+class NoteImportCategory(BaseModel):
+    name: str = Field(..., min_length=1, max_length=20)
+    color: str = Field("gray", max_length=20)
+
+
+# DOC: One NDJSON line of POST /api/notes/import. Lines of an export are
+# accepted as they are (id, version and history are ignored)
+class NoteImport(NoteCreate):
+    title: str = Field(..., max_length=50)
+    content: str = Field(..., max_length=200)
+    category_id: Optional[int] = None
+    category: Optional[NoteImportCategory] = None
+
+    @model_validator(mode="after")
+    def validate_category(self):
+        if self.category_id is None and self.category is None:
+            raise ValueError("A category_id or a category is required")
+        return self
+
+
+# DOC: Bounds of POST /api/notes/import
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_LINE_BYTES = 64 * 1024
+MAX_IMPORT_ERRORS = 100
+
+
+class NoteImportError(BaseModel):
+    line: int
+    detail: str
+    message: Optional[str] = None
+
+
+class NoteImportResult(BaseModel):
+    processed: int
+    imported: int
+    failed: int
+    categories_created: int
+    # DOC: Only the first MAX_IMPORT_ERRORS errors are listed
+    errors: List[NoteImportError]
@@ -1,5 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
+from typing import List, Optional
+from app.core.serialization import compile_dumper
 from app.schemes.categories import CategoryResponse
 
 
@@ -17,7 +19,15 @@ class NoteHistoryResponse(BaseModel):
     created: datetime
     version: int
     note_id: int
-    category: CategoryResponse
+    # DOC: None once the category of that version was deleted
+    category: Optional[CategoryResponse] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NoteHistoryPage(BaseModel):
+    items: List[NoteHistoryResponse]
+    next_cursor: Optional[str] = None
+
+
+dump_note_history_page = compile_dumper(NoteHistoryPage)
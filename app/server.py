@@ -0,0 +1,260 @@
+"""
+Production launcher: N uvicorn workers sharing one listening socket.
+
+    python -m app.server --workers 4 --port 8000 --loop uvloop --http httptools
+
+The supervisor sizes the per-worker resources, imports the application
+once and then forks the workers, which start from the preloaded modules.
+SIGTERM or SIGINT stops the workers gracefully: each one stops accepting
+connections, lets in-flight requests finish for --graceful-timeout
+seconds and runs the lifespan shutdown, which closes its database pools.
+A worker that dies is replaced; one that fails during startup (e.g. a
+schema that is not at the Alembic head) stops the whole server. Only one
+worker runs the history retention job.
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+from contextlib import suppress
+from dataclasses import replace
+from typing import Optional
+
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
+
+from app.core.config import (
+    DatabaseSettings,
+    ServerSettings,
+    worker_pool_limits,
+)
+
+logger = logging.getLogger("app.server")
+
+
+# DOC: Per-worker settings, exported before the application is imported so
+# every worker builds its engines with them. Each pool gets its share of
+# DB_CONNECTION_BUDGET, and the bcrypt threads are spread across workers
+# unless PASSWORD_HASH_WORKERS is set
+def tune_worker_env(server: ServerSettings) -> dict:
+    database = DatabaseSettings.from_env()
+    pool_size, max_overflow = worker_pool_limits(
+        server.connection_budget,
+        server.workers,
+        database.pool_size,
+        database.max_overflow,
+    )
+    tuned = {
+        "DB_POOL_SIZE": str(pool_size),
+        "DB_MAX_OVERFLOW": str(max_overflow),
+    }
+    if "PASSWORD_HASH_WORKERS" not in os.environ:
+        tuned["PASSWORD_HASH_WORKERS"] = str(
+            max(1, (os.cpu_count() or 1) // server.workers)
+        )
+    if server.workers > 1:
+        # DOC: A memory:// cache is per worker, so a write in one worker
+        # would leave the others serving stale listings (and 304s)
+        if _is_memory_url(os.getenv("CATEGORY_CACHE_URL")):
+            logger.warning(
+                "CATEGORY_CACHE_URL is memory:// with %s workers: the "
+                "category cache is disabled, use redis:// to share it",
+                server.workers,
+            )
+            tuned["CATEGORY_CACHE_TTL_SECONDS"] = "0"
+        if _is_memory_url(os.getenv("TOKEN_DENYLIST_URL")):
+            logger.warning(
+                "TOKEN_DENYLIST_URL is memory:// with %s workers: a logout "
+                "only revokes tokens in the worker that served it",
+                server.workers,
+            )
+    os.environ.update(tuned)
+    return tuned
+
+
+def _is_memory_url(url: Optional[str]) -> bool:
+    return not url or url.startswith("memory://")
+
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, server: ServerSettings):
+        self.config = config
+        self.server = server
+        self.workers = set()
+        # DOC: The worker running the history retention job
+        self.retention_pid = None
+        self.should_exit = False
+        self.failed = False
+
+    def _handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def _spawn(self, sock, retention: bool = False) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            if retention:
+                self.retention_pid = pid
+            return
+        # DOC: Worker process. uvicorn installs its own signal handlers
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # DOC: Read by the lifespan, which starts after the fork
+            if not retention:
+                os.environ["HISTORY_RETENTION_INTERVAL_SECONDS"] = "0"
+            from app.db.database import engine, replica_engine
+
+            # DOC: Never reuse connections opened before the fork
+            for db_engine in (engine, replica_engine):
+                if db_engine is not None:
+                    db_engine.sync_engine.dispose(close=False)
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[sock])
+            code = 0 if server.started else STARTUP_FAILURE
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            logger.exception("Worker %s crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _reap(self, sock) -> None:
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            if pid not in self.workers:
+                continue
+            self.workers.discard(pid)
+            if self.should_exit:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            # DOC: The worker never served (lifespan startup or bind failed):
+            # a replacement would fail the same way
+            if code == STARTUP_FAILURE:
+                logger.error(
+                    "Worker %s failed to start (exit %s), stopping", pid, code
+                )
+                self.failed = True
+                self.should_exit = True
+                return
+            logger.warning("Worker %s exited (%s), restarting", pid, code)
+            self._spawn(sock, retention=pid == self.retention_pid)
+
+    def _stop(self) -> None:
+        for pid in self.workers:
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.server.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.workers.discard(pid)
+            else:
+                time.sleep(0.05)
+        for pid in self.workers:
+            logger.warning("Worker %s did not stop in time, killing", pid)
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def run(self) -> int:
+        sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGINT, self._handle_exit)
+        logger.info(
+            "Starting %s workers on %s:%s",
+            self.server.workers, self.config.host, self.config.port,
+        )
+        try:
+            for i in range(self.server.workers):
+                self._spawn(sock, retention=i == 0)
+            while not self.should_exit:
+                self._reap(sock)
+                time.sleep(0.2)
+        finally:
+            self._stop()
+            sock.close()
+        return 1 if self.failed else 0
+
+
+def build_config(server: ServerSettings) -> uvicorn.Config:
+    # DOC: Preload: the workers inherit the imported application
+    from app.main import app
+
+    config = uvicorn.Config(
+        app,
+        host=server.host,
+        port=server.port,
+        loop=server.loop,
+        http=server.http,
+        backlog=server.backlog,
+        lifespan="on",
+        access_log=False,
+        timeout_graceful_shutdown=server.graceful_timeout,
+    )
+    # DOC: Fail in the supervisor on a missing uvloop or httptools
+    config.get_loop_factory()
+    config.load()
+    return config
+
+
+def main():
+    defaults = ServerSettings.from_env()
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--host", default=defaults.host)
+    parser.add_argument("--port", type=int, default=defaults.port)
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument(
+        "--loop", default=defaults.loop, choices=("auto", "asyncio", "uvloop")
+    )
+    parser.add_argument(
+        "--http", default=defaults.http, choices=("auto", "h11", "httptools")
+    )
+    parser.add_argument("--backlog", type=int, default=defaults.backlog)
+    parser.add_argument(
+        "--connection-budget", type=int, default=defaults.connection_budget,
+        help="database connections shared by all workers (0: no limit)",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=defaults.graceful_timeout
+    )
+    args = parser.parse_args()
+    server = replace(
+        defaults,
+        host=args.host,
+        port=args.port,
+        workers=max(1, args.workers),
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        connection_budget=args.connection_budget,
+        graceful_timeout=args.graceful_timeout,
+    )
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter("%(levelname)s: [server] %(message)s")
+    )
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    tuned = tune_worker_env(server)
+    logger.info("Per-worker settings: %s", tuned)
+    config = build_config(server)
+    if not hasattr(os, "fork"):
+        # DOC: No fork (Windows): one process, the application preloaded
+        uvicorn.Server(config).run()
+        return
+    sys.exit(Supervisor(config, server).run())
+
+
+if __name__ == "__main__":
+    main()
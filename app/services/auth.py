@@ -2,15 +2,18 @@ from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import User
 from app.schemes.auth import UserCreate
-from passlib.context import CryptContext
 from datetime import datetime
-from app.core.security import verify_password, create_access_token
+from app.core.security import (
+    verify_password,
+    get_password_hash,
+    create_access_token,
+    token_claims,
+    LOGIN_TOKEN_EXPIRE_MINUTES,
+)
 from datetime import timedelta
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from fastapi import HTTPException
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 # DOC: Service to authenticate user
 async def authenticate_user(db: AsyncSession, email: str, password: str):
@@ -18,7 +21,7 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
     user = result.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.password):
+    if not await verify_password(password, user.password):
         return None
     return user
 
@@ -29,9 +32,9 @@ async def login_user(db: AsyncSession, email: str, password: str):
         user = await authenticate_user(db, email, password)
         if not user:
             raise HTTPException(status_code=401, detail="invalidCredentials")
-        access_token_expires = timedelta(minutes=60)
+        access_token_expires = timedelta(minutes=LOGIN_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data=token_claims(user), expires_delta=access_token_expires
         )
         return {
             "access_token": access_token,
@@ -52,7 +55,7 @@ async def get_user_by_email(db: AsyncSession, email: str):
 # DOC: Service to create user
 async def create_user(db: AsyncSession, user: UserCreate):
     try:
-        hashed_password = pwd_context.hash(user.password)
+        hashed_password = await get_password_hash(user.password)
         db_user = User(
             document=user.document,
             full_name=user.full_name,
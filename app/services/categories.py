@@ -1,9 +1,71 @@
+import os
+import uuid
+from typing import Optional, Tuple
+import orjson
+from sqlalchemy import delete, exists
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import Category
+from app.models import Category, Note
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from app.schemes.categories import CategoryCreate, CategoryUpdate
+from app.schemes.categories import (
+    CategoryCreate,
+    CategoryUpdate,
+    CategoryResponse,
+    dump_category,
+)
 from fastapi import HTTPException
+from app.core.cache import cache_backend
+from app.core.etag import category_etag, list_etag
+
+CATEGORY_CACHE_URL = os.getenv("CATEGORY_CACHE_URL", "memory://")
+CATEGORY_CACHE_TTL_SECONDS = float(
+    os.getenv("CATEGORY_CACHE_TTL_SECONDS", "300")
+)
+CATEGORY_CACHE_MAX_SIZE = int(os.getenv("CATEGORY_CACHE_MAX_SIZE", "1024"))
+
+# DOC: Serialized category listings, stored as ETag and JSON body separated
+# by a newline. Each user has a generation token; listings are keyed by it
+# and writes below replace it, so a listing read before a write and stored
+# after it lands under a key nobody reads
+category_cache = cache_backend(
+    CATEGORY_CACHE_URL,
+    maxsize=CATEGORY_CACHE_MAX_SIZE,
+    ttl=CATEGORY_CACHE_TTL_SECONDS,
+    prefix="categories:",
+)
+
+
+def _generation_key(user_id: int) -> str:
+    return f"{user_id}:generation"
+
+
+# DOC: Key of the current listing of a user. A missing generation is only
+# started by a primary read, which can fill the cache
+async def _listing_key(user_id: int, start: bool) -> Optional[str]:
+    generation = await category_cache.get(_generation_key(user_id))
+    if generation is None:
+        if not start:
+            return None
+        generation = uuid.uuid4().hex.encode()
+        await category_cache.set(_generation_key(user_id), generation)
+    return f"{user_id}:{generation.decode()}"
+
+
+# DOC: Plain columns behind a category ETag, selected without hydrating
+_ETAG_COLUMNS = select(Category.id, Category.name, Category.color)
+
+
+def _row_etag(row) -> str:
+    return category_etag(row.id, row.name, row.color)
+
+
+# DOC: Aggregate ETag of the categories returned by get_categories
+def get_categories_etag_of(categories) -> str:
+    return list_etag(_row_etag(category) for category in categories)
+
+
+def get_category_etag_of(category: Category) -> str:
+    return _row_etag(category)
 
 
 # DOC: Service to get all categories from user
@@ -14,6 +76,46 @@ async def get_categories(db: AsyncSession, user_id: int):
     return result.scalars().all()
 
 
+# DOC: Service to get the ETag and serialized JSON of the categories of a
+# user, served from the category cache when possible
+async def get_categories_payload(
+        db: AsyncSession, user_id: int) -> Tuple[str, bytes]:
+    # DOC: A lagging replica could cache a listing older than the last
+    # invalidation, so only primary reads fill the cache
+    primary = not db.info.get("replica")
+    key = await _listing_key(user_id, start=primary)
+    if key is not None:
+        entry = await category_cache.get(key)
+        if entry is not None:
+            etag, body = entry.split(b"\n", 1)
+            return etag.decode(), body
+    categories = await get_categories(db, user_id)
+    etag = get_categories_etag_of(categories)
+    body = orjson.dumps([dump_category(category) for category in categories])
+    if primary and key is not None:
+        await category_cache.set(key, etag.encode() + b"\n" + body)
+    return etag, body
+
+
+# DOC: Retire the cached category listing of a user after a write
+async def invalidate_categories(user_id: int) -> None:
+    await category_cache.set(
+        _generation_key(user_id), uuid.uuid4().hex.encode()
+    )
+
+
+# DOC: Service to get the ETag of a category, None if it does not exist
+async def get_category_etag(db: AsyncSession, category_id: int, user_id: int):
+    result = await db.execute(
+        _ETAG_COLUMNS.where(
+            Category.id == category_id,
+            Category.user_id == user_id
+        )
+    )
+    row = result.one_or_none()
+    return _row_etag(row) if row else None
+
+
 # DOC: Service to get category by id
 async def get_category_by_id(db: AsyncSession, category_id: int, user_id: int):
     result = await db.execute(
@@ -37,6 +139,7 @@ async def create_category(
         )
         db.add(db_category)
         await db.commit()
+        await invalidate_categories(user_id)
         await db.refresh(db_category)
         return db_category
     except IntegrityError:
@@ -72,6 +175,7 @@ async def update_category(
         db_category.color = category_update.color
 
         await db.commit()
+        await invalidate_categories(user_id)
         await db.refresh(db_category)
         return db_category
 
@@ -92,24 +196,38 @@ async def delete_category(
         category_id: int,
         user_id: int):
     try:
-        # DOC: Obtain the category corresponding to the authenticated user
+        # DOC: One statement, which deletes nothing while the category has
+        # notes: deleting them is left to the user. Older versions of
+        # other notes lose the category (SET NULL)
         result = await db.execute(
-            select(Category).where(
+            delete(Category)
+            .where(
                 Category.id == category_id,
-                Category.user_id == user_id
+                Category.user_id == user_id,
+                ~exists().where(Note.category_id == Category.id),
             )
+            .returning(Category.id, Category.name, Category.color)
+            .execution_options(synchronize_session=False)
         )
-        db_category = result.scalar_one_or_none()
+        row = result.one_or_none()
 
-        # DOC: Verify if the category exists
-        if not db_category:
-            raise HTTPException(status_code=404, detail="categoryNotFound")
+        # DOC: Verify if the category exists, only on the failure path
+        if not row:
+            await db.rollback()
+            if await get_category_etag(db, category_id, user_id) is None:
+                raise HTTPException(
+                    status_code=404, detail="categoryNotFound"
+                )
+            raise HTTPException(status_code=409, detail="categoryNotEmpty")
 
-        # DOC: Delete category
-        await db.delete(db_category)
         await db.commit()
-        return db_category
+        await invalidate_categories(user_id)
+        return CategoryResponse(id=row.id, name=row.name, color=row.color)
 
+    except IntegrityError:
+        # DOC: A note was filed under the category meanwhile
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="categoryNotEmpty")
     except SQLAlchemyError:
         # DOC: If a database error occurs, the transaction is rolled back
         await db.rollback()
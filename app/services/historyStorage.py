@@ -0,0 +1,233 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.delta import decode_delta, encode_delta
+from app.models import Note, NoteHistory
+
+# DOC: Every HISTORY_KEYFRAME_INTERVAL-th version is archived in full, which
+# bounds the deltas applied to rebuild any revision. 1 disables deltas
+HISTORY_KEYFRAME_INTERVAL = int(os.getenv("HISTORY_KEYFRAME_INTERVAL", "10"))
+# DOC: First key of the Postgres advisory locks taken per note history
+HISTORY_LOCK_CLASS = 0x4E48
+
+Text = Tuple[str, str]
+
+
+# DOC: Values of the history row archiving the current text of a note that
+# is about to be replaced by new_text
+def history_values(
+        note_id: int,
+        version: int,
+        category_id: int,
+        old_text: Text,
+        new_text: Text,
+        created: datetime,
+        keyframe_interval: Optional[int] = None) -> dict:
+    if keyframe_interval is None:
+        keyframe_interval = HISTORY_KEYFRAME_INTERVAL
+    values = {
+        "note_id": note_id,
+        "version": version,
+        "category_id": category_id,
+        "created": created,
+        "title": old_text[0],
+        "content": old_text[1],
+        "delta": None,
+        "kept_full": False,
+    }
+    if keyframe_interval > 1 and version % keyframe_interval:
+        delta = encode_delta(new_text, old_text)
+        # DOC: Keep the full text when the delta would not be smaller
+        if len(delta) < len(old_text[0]) + len(old_text[1]):
+            values.update(title=None, content=None, delta=delta)
+        else:
+            values["kept_full"] = True
+    return values
+
+
+# DOC: Rebuild the text of history rows walking from the newest revision
+# back. rows holds every row from the oldest wanted one up to the first
+# keyframe after it, in any order; top is the text of the note, needed only
+# when no keyframe follows
+def rebuild_texts(top: Optional[Text], rows: Iterable) -> Dict[int, Text]:
+    texts = {}
+    current = top
+    for row in sorted(rows, key=lambda row: row.id, reverse=True):
+        if row.delta is None:
+            current = (row.title, row.content)
+        else:
+            current = decode_delta(current, row.delta)
+        texts[row.id] = current
+    return texts
+
+
+def _fill(rows: Iterable[NoteHistory], texts: Dict[int, Text]) -> None:
+    for row in rows:
+        title, content = texts[row.id]
+        set_committed_value(row, "title", title)
+        set_committed_value(row, "content", content)
+
+
+# DOC: Fill title and content of loaded history rows of a note that carry
+# their full history (e.g. Note.history), without further queries
+def materialize_loaded(note: Note, rows: List[NoteHistory]) -> None:
+    _fill(rows, rebuild_texts((note.title, note.content), rows))
+
+
+# DOC: Fill title and content of history rows of one note. Loads the rows
+# between them and the next keyframe (plus the note when no keyframe
+# follows) as plain columns: at most two queries
+async def materialize(db: AsyncSession, rows: List[NoteHistory]) -> None:
+    deltas = [row for row in rows if row.delta is not None]
+    if not deltas:
+        return
+    note_id = deltas[0].note_id
+    low = min(row.id for row in deltas)
+    high = max(row.id for row in deltas)
+    keyframe = (
+        select(func.min(NoteHistory.id))
+        .where(
+            NoteHistory.note_id == note_id,
+            NoteHistory.id >= high,
+            NoteHistory.delta.is_(None),
+        )
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            NoteHistory.id,
+            NoteHistory.title,
+            NoteHistory.content,
+            NoteHistory.delta,
+        )
+        .where(
+            NoteHistory.note_id == note_id,
+            NoteHistory.id >= low,
+            or_(keyframe.is_(None), NoteHistory.id <= keyframe),
+        )
+    )
+    chain = result.all()
+    top = None
+    if max(chain, key=lambda row: row.id).delta is not None:
+        result = await db.execute(
+            select(Note.title, Note.content).where(Note.id == note_id)
+        )
+        top = tuple(result.one())
+    _fill(deltas, rebuild_texts(top, chain))
+
+
+# DOC: Store history rows of one note in full, before the revision their
+# delta is based on is deleted or rewritten
+async def make_keyframes(db: AsyncSession, rows: List[NoteHistory]) -> None:
+    rows = [row for row in rows if row.delta is not None]
+    if not rows:
+        return
+    await materialize(db, rows)
+    await db.execute(
+        update(NoteHistory),
+        [
+            {
+                "id": row.id,
+                "title": row.title,
+                "content": row.content,
+                "delta": None,
+            }
+            for row in rows
+        ],
+    )
+    for row in rows:
+        set_committed_value(row, "delta", None)
+
+
+# DOC: Rows whose delta is based on the given row (the previous row of the
+# note) or on the note itself (its newest row, when row is None)
+async def dependents(
+        db: AsyncSession,
+        note_id: int,
+        row: Optional[NoteHistory] = None) -> List[NoteHistory]:
+    query = select(NoteHistory).where(NoteHistory.note_id == note_id)
+    if row is None:
+        query = query.order_by(NoteHistory.id.desc())
+    else:
+        query = query.where(NoteHistory.id < row.id).order_by(
+            NoteHistory.id.desc()
+        )
+    result = await db.execute(query.limit(1))
+    return list(result.scalars().all())
+
+
+# DOC: Serialize changes to the delta chain of one note until the end of
+# the transaction. An advisory lock on Postgres, so the hot notes row is
+# never locked; SQLite already serializes writers
+async def lock_history(db: AsyncSession, note_id: int) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(
+            select(func.pg_advisory_xact_lock(HISTORY_LOCK_CLASS, note_id))
+        )
+
+
+# DOC: Rewrite full rows at non-keyframe versions as deltas: rows stored in
+# full before a delete, or archived in full by older releases. Rows whose
+# delta would not be smaller are flagged kept_full instead, so they are
+# checked once. The caller holds lock_history. Returns the rows rewritten
+async def compress_history(
+        db: AsyncSession,
+        note_id: int,
+        keyframe_interval: Optional[int] = None) -> int:
+    if keyframe_interval is None:
+        keyframe_interval = HISTORY_KEYFRAME_INTERVAL
+    if keyframe_interval <= 1:
+        return 0
+    # DOC: One statement, so the note text and its rows come from the same
+    # snapshot. Read apart, an update committed in between would leave the
+    # newest rows encoded against a text that is no longer the note's
+    result = await db.execute(
+        select(
+            NoteHistory.id,
+            NoteHistory.version,
+            NoteHistory.title,
+            NoteHistory.content,
+            NoteHistory.delta,
+            NoteHistory.kept_full,
+            Note.title.label("note_title"),
+            Note.content.label("note_content"),
+        )
+        .join(Note, Note.id == NoteHistory.note_id)
+        .where(NoteHistory.note_id == note_id)
+        .order_by(NoteHistory.id.desc())
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+    top = (rows[0].note_title, rows[0].note_content)
+    texts = rebuild_texts(top, rows)
+    updates = []
+    kept_full = []
+    newer = top
+    for row in rows:
+        text = texts[row.id]
+        if (
+            row.delta is None
+            and not row.kept_full
+            and row.version % keyframe_interval
+        ):
+            delta = encode_delta(newer, text)
+            if len(delta) < len(text[0]) + len(text[1]):
+                updates.append({
+                    "id": row.id,
+                    "title": None,
+                    "content": None,
+                    "delta": delta,
+                })
+            else:
+                kept_full.append({"id": row.id, "kept_full": True})
+        newer = text
+    if updates or kept_full:
+        await db.execute(update(NoteHistory), updates + kept_full)
+    return len(updates)
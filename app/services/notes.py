@@ -1,125 +1,536 @@
 from sqlalchemy.future import select
+from sqlalchemy import DateTime, Integer, String, delete, exists, func
+from sqlalchemy import insert, literal, literal_column, tuple_, update
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import Note, NoteHistory
-from app.schemes.notes import NoteCreate, NoteUpdate
+from app.models import Category, Note, NoteHistory
+from app.schemes.notes import (
+    NoteCreate,
+    NoteUpdate,
+    NoteResponse,
+    NoteBatchOperation,
+    dump_note_export,
+)
+from app.schemes.categories import CategoryResponse
 from datetime import datetime
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload, subqueryload
+from operator import itemgetter
+import orjson
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, selectinload
+from typing import AsyncIterator, List, Optional
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.etag import (
+    note_etag,
+    list_etag,
+    note_version,
+    matches_if_match,
+)
+from app.services.historyStorage import history_values, materialize_loaded
+from app.services.search import (
+    index_notes,
+    unindex_note,
+    unindex_notes,
+)
 
 
-# DOC: Service to get all notes from user
-async def get_notes(db: AsyncSession, user_id: int):
-    result = await db.execute(
-        select(Note)
-        .options(
-            subqueryload(Note.history).joinedload(NoteHistory.category),
-            joinedload(Note.category)
+# DOC: Keyset pagination over (created, id) keeps deep pages as cheap as the
+# first one, unlike OFFSET which scans every skipped row
+def _notes_page_query(query, user_id: int, limit: int, cursor: Optional[str]):
+    query = (
+        query.where(Note.user_id == user_id)
+        .order_by(Note.created.desc(), Note.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created, note_id = decode_cursor(cursor, datetime, int)
+        query = query.where(
+            tuple_(Note.created, Note.id) < tuple_(created, note_id)
         )
-        .where(Note.user_id == user_id)
+    return query
+
+
+def _split_page(rows, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created, rows[-1].id)
+    return rows, next_cursor
+
+
+# DOC: Plain columns behind a note ETag, selected without hydrating notes
+_ETAG_COLUMNS = select(
+    Note.id,
+    Note.created,
+    Note.version,
+    Note.history_count,
+    Note.category_id,
+    Category.name,
+    Category.color,
+).join(Category, Category.id == Note.category_id)
+
+
+def _row_etag(row) -> str:
+    return note_etag(
+        row.id,
+        row.version,
+        row.history_count,
+        (row.category_id, row.name, row.color),
+    )
+
+
+# DOC: ETag of a loaded note, equal to the one computed from plain columns
+def get_note_etag_of(note: Note) -> str:
+    category = note.category
+    return note_etag(
+        note.id,
+        note.version,
+        note.history_count,
+        (category.id, category.name, category.color),
+    )
+
+
+# DOC: Aggregate ETag of a page returned by get_notes
+def get_notes_page_etag_of(page: dict) -> str:
+    return list_etag(
+        (get_note_etag_of(note) for note in page["items"]),
+        page["next_cursor"],
+    )
+
+
+# DOC: Service to get a page of notes from user, newest first
+async def get_notes(
+        db: AsyncSession,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None):
+    query = _notes_page_query(
+        select(Note).options(joinedload(Note.category)),
+        user_id, limit, cursor,
+    )
+    result = await db.execute(query)
+    notes, next_cursor = _split_page(result.scalars().all(), limit)
+    return {"items": notes, "next_cursor": next_cursor}
+
+
+# DOC: Service to get the ETag of a page of notes with a cheap query, so
+# conditional requests can be answered without loading the notes
+async def get_notes_page_etag(
+        db: AsyncSession,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None):
+    result = await db.execute(
+        _notes_page_query(_ETAG_COLUMNS, user_id, limit, cursor)
+    )
+    rows, next_cursor = _split_page(result.all(), limit)
+    return list_etag((_row_etag(row) for row in rows), next_cursor)
+
+
+# DOC: Service to get the ETag of a note, None if it does not exist
+async def get_note_etag(db: AsyncSession, note_id: int, user_id: int):
+    result = await db.execute(
+        _ETAG_COLUMNS.where(Note.id == note_id, Note.user_id == user_id)
+    )
+    row = result.one_or_none()
+    return _row_etag(row) if row else None
+
+
+# DOC: Resolve the expected version of an update from the If-Match header
+# or the body. A stale If-Match fails with 412 before anything is loaded;
+# the version check in update_note still guards against later races
+async def resolve_update_version(
+        db: AsyncSession,
+        note_id: int,
+        note_update: NoteUpdate,
+        user_id: int,
+        if_match: Optional[str] = None):
+    if if_match:
+        etag = await get_note_etag(db, note_id, user_id)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="noteDoesNotExist")
+        if not matches_if_match(if_match, etag):
+            raise HTTPException(status_code=412, detail="preconditionFailed")
+        if note_update.version is None:
+            note_update.version = note_version(etag)
+    if note_update.version is None:
+        raise HTTPException(status_code=428, detail="versionRequired")
+    return note_update
+
+
+# DOC: Columns of a NoteResponse, usable in RETURNING of notes statements.
+# SQLite renders RETURNING columns unqualified, so the correlated columns
+# are spelled out to keep them bound to the outer notes row
+_OUTER_ID = literal_column(f"{Note.__tablename__}.id")
+_OUTER_CATEGORY_ID = literal_column(f"{Note.__tablename__}.category_id")
+_CATEGORY_COLUMNS = (
+    Note.category_id,
+    select(Category.name)
+    .where(Category.id == _OUTER_CATEGORY_ID)
+    .scalar_subquery()
+    .label("category_name"),
+    select(Category.color)
+    .where(Category.id == _OUTER_CATEGORY_ID)
+    .scalar_subquery()
+    .label("category_color"),
+)
+_RESPONSE_COLUMNS = (
+    Note.id,
+    Note.title,
+    Note.content,
+    Note.created,
+    Note.version,
+    select(func.count(NoteHistory.id))
+    .where(NoteHistory.note_id == _OUTER_ID)
+    .scalar_subquery()
+    .label("history_count"),
+    *_CATEGORY_COLUMNS,
+)
+# DOC: For notes without history: new ones, or deleted ones whose history
+# the database removed along with them
+_NO_HISTORY_COLUMNS = (
+    Note.id,
+    Note.title,
+    Note.content,
+    Note.created,
+    Note.version,
+    literal_column("0").label("history_count"),
+    *_CATEGORY_COLUMNS,
+)
+
+
+def _response_from_row(row) -> NoteResponse:
+    return NoteResponse(
+        id=row.id,
+        title=row.title,
+        content=row.content,
+        created=row.created,
+        version=row.version,
+        history_count=row.history_count,
+        category=CategoryResponse(
+            id=row.category_id,
+            name=row.category_name,
+            color=row.category_color,
+        ),
     )
-    return result.scalars().all()
 
 
 # DOC: Service to get note by id
 async def get_note_by_id(db: AsyncSession, note_id: int, user_id: int):
     result = await db.execute(
-        select(Note).where(Note.id == note_id, Note.user_id == user_id)
+        select(Note)
+        .options(joinedload(Note.category))
+        .where(Note.id == note_id, Note.user_id == user_id)
     )
     return result.scalar_one_or_none()
 
 
-# DOC: Service to create note with user authenticated
-async def create_note(db: AsyncSession, note: NoteCreate, user_id: int):
-    db_note = Note(
-        title=note.title,
-        content=note.content,
-        category_id=note.category_id,
-        user_id=user_id,
-        created=datetime.now(),
-    )
-    db.add(db_note)
-    await db.commit()
-    await db.refresh(db_note)
+# DOC: Reload a note with its category and history count after a write
+async def reload_note(db: AsyncSession, note_id: int):
     result = await db.execute(
         select(Note)
-        .options(
-            subqueryload(Note.history),
-            joinedload(Note.category)
-        )
-        .where(Note.id == db_note.id)
+        .options(joinedload(Note.category))
+        .where(Note.id == note_id)
+        .execution_options(populate_existing=True)
     )
-    db_note = result.scalar_one_or_none()
-    return db_note
+    return result.scalar_one_or_none()
 
 
-# DOC: Service to update note with user authenticated
-async def update_note(
+# DOC: Service to export every note of a user with its history as NDJSON.
+# Notes come from a server-side cursor in chunks of chunk_size; each chunk
+# loads its history with one extra query and is expunged once written, so
+# memory use does not grow with the number of notes
+async def export_notes(
         db: AsyncSession,
-        note_id: int,
-        note_update: NoteUpdate,
-        user_id: int):
-    # DOC: Obtain the note corresponding to the authenticated user
-    result = await db.execute(
+        user_id: int,
+        chunk_size: int) -> AsyncIterator[bytes]:
+    result = await db.stream_scalars(
         select(Note)
         .options(
-            subqueryload(Note.history).subqueryload(NoteHistory.category),
-            joinedload(Note.category)
+            joinedload(Note.category),
+            selectinload(Note.history),
         )
-        .where(Note.id == note_id, Note.user_id == user_id)
+        .where(Note.user_id == user_id)
+        .order_by(Note.id)
+        .execution_options(yield_per=chunk_size)
     )
-    db_note = result.scalar_one_or_none()
+    async for notes in result.partitions():
+        lines = []
+        for note in notes:
+            materialize_loaded(note, note.history)
+            line = dump_note_export(note)
+            line["history"].sort(key=itemgetter("version"))
+            lines.append(orjson.dumps(line) + b"\n")
+            # DOC: Cascades to the history rows; categories stay cached
+            db.expunge(note)
+        yield b"".join(lines)
 
-    if not db_note:
-        raise HTTPException(status_code=404, detail="noteDoesNotExist")
 
-    if note_update.version != db_note.version:
-        raise HTTPException(
-            status_code=409,
-            detail="updateError"
+# DOC: Service to create note with user authenticated. The row is inserted
+# from a select over the user's categories, so an unknown or foreign
+# category inserts nothing, and RETURNING carries the whole response
+async def create_note(db: AsyncSession, note: NoteCreate, user_id: int):
+    result = await db.execute(
+        insert(Note)
+        .from_select(
+            ["title", "content", "category_id", "user_id", "created"],
+            select(
+                literal(note.title, String),
+                literal(note.content, String),
+                Category.id,
+                literal(user_id, Integer),
+                literal(datetime.now(), DateTime),
+            ).where(
+                Category.id == note.category_id,
+                Category.user_id == user_id,
+            ),
         )
-
-    # DOC: Create a new note history
-    note_history = NoteHistory(
-        note_id=db_note.id,
-        title=db_note.title,
-        content=db_note.content,
-        version=db_note.version,
-        category_id=db_note.category_id,
-        created=datetime.now()
+        .returning(*_NO_HISTORY_COLUMNS)
     )
-    db.add(note_history)
+    row = result.one_or_none()
+    if row is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="categoryNotFound")
+    await index_notes(db, [{
+        "id": row.id, "title": row.title, "content": row.content,
+    }])
+    await db.commit()
+    return _response_from_row(row)
 
-    # DOC: Performing the update
-    db_note.title = note_update.title
-    db_note.content = note_update.content
-    db_note.category_id = note_update.category_id
-    db_note.version += 1
 
+# DOC: Service to update note with user authenticated
+async def update_note(
+        db: AsyncSession,
+        note_id: int,
+        note_update: NoteUpdate,
+        user_id: int):
+    current = (
+        Note.id == note_id,
+        Note.user_id == user_id,
+        Note.version == note_update.version,
+    )
     try:
+        # DOC: Lock the row so the delta below is taken against the text
+        # this update replaces, as the batch path does
+        result = await db.execute(
+            select(
+                Note.title, Note.content, Note.category_id, Note.version
+            )
+            .where(*current)
+            .with_for_update()
+        )
+        old = result.one_or_none()
+        row = None
+        if old is not None:
+            # DOC: Archived as a delta against the new text, so the history
+            # needs no later compaction
+            await db.execute(insert(NoteHistory), [history_values(
+                note_id=note_id,
+                version=old.version,
+                category_id=old.category_id,
+                old_text=(old.title, old.content),
+                new_text=(note_update.title, note_update.content),
+                created=datetime.now(),
+            )])
+            # DOC: Still conditional on the version: SQLite does not lock
+            # on read, so a writer that got there first leaves no row
+            result = await db.execute(
+                update(Note)
+                .where(
+                    *current,
+                    exists().where(
+                        Category.id == note_update.category_id,
+                        Category.user_id == user_id,
+                    ),
+                )
+                .values(
+                    title=note_update.title,
+                    content=note_update.content,
+                    category_id=note_update.category_id,
+                    version=Note.version + 1,
+                )
+                .returning(*_RESPONSE_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.one_or_none()
+        if row is None:
+            await db.rollback()
+            raise await _update_error(db, note_id, note_update, user_id)
+        await index_notes(db, [{
+            "id": row.id, "title": row.title, "content": row.content,
+        }])
         await db.commit()
-        await db.refresh(db_note, ["history", "category"])
-    except IntegrityError:
+    except SQLAlchemyError:
         await db.rollback()
         raise HTTPException(status_code=500, detail="updateErrorNote")
+    return _response_from_row(row)
 
-    return db_note
 
+# DOC: Tell apart why a conditional update matched no row. Only runs on
+# the failure path
+async def _update_error(
+        db: AsyncSession,
+        note_id: int,
+        note_update: NoteUpdate,
+        user_id: int) -> HTTPException:
+    result = await db.execute(
+        select(Note.version).where(Note.id == note_id, Note.user_id == user_id)
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        return HTTPException(status_code=404, detail="noteDoesNotExist")
+    if version != note_update.version:
+        return HTTPException(status_code=409, detail="updateError")
+    return HTTPException(status_code=404, detail="categoryNotFound")
 
-# DOC: Service to delete note with user authenticated
+
+# DOC: Service to delete note with user authenticated. One statement: the
+# history goes with ON DELETE CASCADE, whatever its size
 async def delete_note(db: AsyncSession, note_id: int, user_id: int):
     result = await db.execute(
-        select(Note)
-        .options(
-            subqueryload(Note.history),
-            joinedload(Note.category)
-        )
+        delete(Note)
         .where(Note.id == note_id, Note.user_id == user_id)
+        .returning(*_NO_HISTORY_COLUMNS)
+        .execution_options(synchronize_session=False)
     )
-    db_note = result.scalar_one_or_none()
+    row = result.one_or_none()
+    if row is None:
+        return None
+    await unindex_note(db, row.id)
+    await db.commit()
+    return _response_from_row(row)
+
+
+# DOC: Service to apply many create/update/delete operations in one
+# transaction. Notes and categories are validated with one query each,
+# then writes go out as multi-row statements. Operations that fail
+# validation are reported per item and skipped; the rest are committed.
+async def apply_note_batch(
+        db: AsyncSession,
+        operations: List[NoteBatchOperation],
+        user_id: int):
+    note_ids = {op.id for op in operations if op.op != "create"}
+    category_ids = {op.category_id for op in operations if op.op != "delete"}
 
-    if db_note:
-        await db.delete(db_note)
+    notes = {}
+    if note_ids:
+        # DOC: Lock the rows so the version checks hold until commit
+        result = await db.execute(
+            select(Note)
+            .options(joinedload(Note.category))
+            .where(Note.id.in_(note_ids), Note.user_id == user_id)
+            .with_for_update(of=Note)
+        )
+        notes = {note.id: note for note in result.scalars().all()}
+
+    owned_categories = set()
+    if category_ids:
+        result = await db.execute(
+            select(Category.id).where(
+                Category.id.in_(category_ids),
+                Category.user_id == user_id
+            )
+        )
+        owned_categories = set(result.scalars().all())
+
+    now = datetime.now()
+    results = []
+    creates, updates, histories, deletes = [], [], [], []
+    seen = set()
+    for index, op in enumerate(operations):
+        item = {"index": index, "op": op.op, "status": 200}
+        results.append(item)
+
+        if op.op != "create":
+            db_note = notes.get(op.id)
+            if op.id in seen:
+                item.update(status=400, detail="duplicateOperation")
+                continue
+            seen.add(op.id)
+            if db_note is None:
+                item.update(status=404, detail="noteDoesNotExist")
+                continue
+        if op.op != "delete" and op.category_id not in owned_categories:
+            item.update(status=404, detail="categoryNotFound")
+            continue
+
+        if op.op == "create":
+            creates.append((item, {
+                "title": op.title,
+                "content": op.content,
+                "category_id": op.category_id,
+                "user_id": user_id,
+                "created": now,
+                "version": 1,
+            }))
+        elif op.op == "update":
+            if op.version != db_note.version:
+                item.update(status=409, detail="updateError")
+                continue
+            histories.append(history_values(
+                note_id=db_note.id,
+                version=db_note.version,
+                category_id=db_note.category_id,
+                old_text=(db_note.title, db_note.content),
+                new_text=(op.title, op.content),
+                created=now,
+            ))
+            updates.append((item, {
+                "id": db_note.id,
+                "title": op.title,
+                "content": op.content,
+                "category_id": op.category_id,
+                "version": db_note.version + 1,
+            }))
+        else:
+            # DOC: Serialize before the row disappears
+            item["note"] = NoteResponse.model_validate(
+                db_note, from_attributes=True
+            )
+            deletes.append(db_note.id)
+
+    try:
+        if creates:
+            result = await db.execute(
+                insert(Note).returning(
+                    Note.id, sort_by_parameter_order=True
+                ),
+                [values for _, values in creates],
+            )
+            for (item, values), note_id in zip(creates, result.scalars()):
+                item["note_id"] = values["id"] = note_id
+        if histories:
+            await db.execute(insert(NoteHistory), histories)
+        if updates:
+            await db.execute(
+                update(Note), [values for _, values in updates]
+            )
+            for item, values in updates:
+                item["note_id"] = values["id"]
+        if deletes:
+            await db.execute(
+                delete(Note)
+                .where(Note.id.in_(deletes))
+                .execution_options(synchronize_session=False)
+            )
+        await index_notes(
+            db, [values for _, values in creates + updates]
+        )
+        await unindex_notes(db, deletes)
         await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="databaseError")
 
-    return db_note
+    # DOC: One query returns every created or updated note for the response
+    written = [item for item, _ in creates + updates]
+    if written:
+        result = await db.execute(
+            select(Note)
+            .options(joinedload(Note.category))
+            .where(Note.id.in_([item["note_id"] for item in written]))
+            .execution_options(populate_existing=True)
+        )
+        loaded = {note.id: note for note in result.scalars().all()}
+        for item in written:
+            item["note"] = loaded[item.pop("note_id")]
+    return {"results": results}
@@ -4,7 +4,60 @@ from app.models import NoteHistory
 from app.models import Note
 from fastapi import HTTPException
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy.orm import joinedload, subqueryload
+from sqlalchemy.orm import joinedload
+from sqlalchemy import tuple_
+from typing import Optional
+from datetime import datetime
+from app.core.pagination import encode_cursor, decode_cursor
+from app.services.notes import reload_note
+from app.services.search import index_note
+from app.services.historyStorage import (
+    dependents,
+    lock_history,
+    make_keyframes,
+    materialize,
+)
+
+
+# DOC: Service to get a page of the history of a note, newest first
+async def get_note_history(
+        db: AsyncSession,
+        note_id: int,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None):
+    query = (
+        select(NoteHistory)
+        .join(Note, Note.id == NoteHistory.note_id)
+        .options(joinedload(NoteHistory.category))
+        .where(NoteHistory.note_id == note_id, Note.user_id == user_id)
+        .order_by(NoteHistory.created.desc(), NoteHistory.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created, history_id = decode_cursor(cursor, datetime, int)
+        query = query.where(
+            tuple_(NoteHistory.created, NoteHistory.id)
+            < tuple_(created, history_id)
+        )
+    result = await db.execute(query)
+    rows = result.scalars().all()
+
+    # DOC: An empty page needs one more query to tell "no history" apart
+    # from a note that does not exist or belongs to another user
+    if not rows:
+        result = await db.execute(
+            select(Note.id).where(Note.id == note_id, Note.user_id == user_id)
+        )
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="noteDoesNotExist")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created, rows[-1].id)
+    await materialize(db, rows)
+    return {"items": rows, "next_cursor": next_cursor}
 
 
 # DOC: Service to restore note from history
@@ -26,12 +79,7 @@ async def restore_note_from_history(db: AsyncSession, history_id: int):
 
         # DOC: Search for the note associated with the note history
         result = await db.execute(
-            select(Note)
-            .options(
-                subqueryload(Note.history).joinedload(NoteHistory.category),
-                joinedload(Note.category)
-            )
-            .where(Note.id == note_history.note_id)
+            select(Note).where(Note.id == note_history.note_id)
         )
         note = result.scalar_one_or_none()
 
@@ -41,18 +89,32 @@ async def restore_note_from_history(db: AsyncSession, history_id: int):
                 detail="associatedNoteNotFound"
             )
 
+        # DOC: The previous row is based on this one and the newest row on
+        # the note, so both are stored in full before either changes
+        await lock_history(db, note.id)
+        previous = await dependents(db, note.id, note_history)
+        newest = [
+            row for row in await dependents(db, note.id)
+            if row.id != note_history.id
+        ]
+        await materialize(db, [note_history])
+        await make_keyframes(db, previous + newest)
+
         # DOC: Restore the note with the data from the note history
         note.title = note_history.title
         note.content = note_history.content
-        note.category_id = note_history.category_id
-        note.version = note_history.version
+        if note_history.category_id is not None:
+            note.category_id = note_history.category_id
+        # DOC: A restore is a new version. Going back to the restored one
+        # would reuse its ETag and let a stale If-Match or version through
+        note.version = Note.version + 1
 
         # DOC: Delete the note history entry
         await db.delete(note_history)
+        await index_note(db, note)
 
         await db.commit()
-        await db.refresh(note)
-        return note
+        return await reload_note(db, note.id)
 
     except IntegrityError:
         await db.rollback()
@@ -92,6 +154,12 @@ async def delete_note_history(
                 detail="noteHistoryNotFound"
             )
 
+        # DOC: The previous row is based on this one, store it in full
+        await lock_history(db, db_note_history.note_id)
+        await materialize(db, [db_note_history])
+        await make_keyframes(
+            db, await dependents(db, db_note_history.note_id, db_note_history)
+        )
         await db.delete(db_note_history)
         await db.commit()
         return db_note_history
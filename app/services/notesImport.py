@@ -0,0 +1,229 @@
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.replica import mark_written
+from app.models import Category, Note
+from app.schemes.notes import (
+    IMPORT_BATCH_SIZE,
+    MAX_IMPORT_ERRORS,
+    MAX_IMPORT_LINE_BYTES,
+    NoteImport,
+)
+from app.services.categories import invalidate_categories
+from app.services.search import index_notes
+
+logger = logging.getLogger(__name__)
+
+_NOTE_COLUMNS = ("title", "content", "category_id", "user_id", "created",
+                 "version")
+
+
+# DOC: Split a byte stream into numbered lines without buffering more than
+# one line. Oversized lines are skipped and yielded as None
+async def _lines(
+        chunks: AsyncIterable[bytes],
+        max_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    number = 0
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line, buffer = buffer[:end], buffer[end + 1:]
+            number += 1
+            if skipping:
+                skipping = False
+                yield number, None
+            elif len(line) > max_bytes:
+                yield number, None
+            elif line.strip():
+                yield number, line
+        if len(buffer) > max_bytes:
+            buffer = b""
+            skipping = True
+    if skipping or buffer.strip():
+        number += 1
+        yield number, None if skipping else buffer
+
+
+class _Import:
+    def __init__(self, db: AsyncSession, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.categories = {}
+        self.owned = set()
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.categories_created = 0
+        self.errors: List[dict] = []
+
+    def error(self, line: int, detail: str, message: str = None) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append(
+                {"line": line, "detail": detail, "message": message}
+            )
+
+    async def load_categories(self) -> None:
+        result = await self.db.execute(
+            select(Category.id, Category.name)
+            .where(Category.user_id == self.user_id)
+        )
+        for category_id, name in result.all():
+            self.categories.setdefault(name, category_id)
+            self.owned.add(category_id)
+
+    # DOC: Create the categories referenced by name that the user lacks,
+    # with one multi-row INSERT
+    async def create_categories(self, rows: List[Tuple[int, NoteImport]]):
+        missing = {}
+        for _, row in rows:
+            if row.category_id is None and row.category.name not in (
+                self.categories
+            ):
+                missing.setdefault(row.category.name, row.category.color)
+        if not missing:
+            return
+        result = await self.db.execute(
+            insert(Category).returning(
+                Category.id, Category.name, sort_by_parameter_order=True
+            ),
+            [
+                {"name": name, "color": color, "user_id": self.user_id}
+                for name, color in missing.items()
+            ],
+        )
+        for category_id, name in result.all():
+            self.categories[name] = category_id
+            self.owned.add(category_id)
+        self.categories_created += len(missing)
+
+    # DOC: COPY on asyncpg, where no search index has to be maintained, and
+    # a multi-row INSERT ... RETURNING elsewhere
+    async def insert_notes(self, values: List[dict]) -> None:
+        connection = await self.db.connection()
+        if connection.dialect.driver == "asyncpg":
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                Note.__tablename__,
+                records=[
+                    tuple(row[name] for name in _NOTE_COLUMNS)
+                    for row in values
+                ],
+                columns=_NOTE_COLUMNS,
+            )
+            # DOC: COPY bypasses the session, so flag the write for the
+            # read-your-writes window by hand
+            mark_written(self.db)
+            return
+        result = await self.db.execute(
+            insert(Note).returning(Note.id, sort_by_parameter_order=True),
+            values,
+        )
+        for row, note_id in zip(values, result.scalars()):
+            row["id"] = note_id
+        await index_notes(self.db, values)
+
+    # DOC: Write one batch in its own transaction, so a failing batch only
+    # loses its own rows
+    async def flush(self, rows: List[Tuple[int, NoteImport]]) -> None:
+        if not rows:
+            return
+        created_before = self.categories_created
+        pending = [line for line, _ in rows]
+        try:
+            await self.create_categories(rows)
+            now = datetime.now()
+            values = []
+            for line, row in rows:
+                if row.category_id is not None:
+                    category_id = row.category_id
+                    if category_id not in self.owned:
+                        pending.remove(line)
+                        self.error(line, "categoryNotFound")
+                        continue
+                else:
+                    category_id = self.categories[row.category.name]
+                values.append({
+                    "title": row.title,
+                    "content": row.content,
+                    "category_id": category_id,
+                    "user_id": self.user_id,
+                    "created": now,
+                    "version": 1,
+                })
+            if values:
+                await self.insert_notes(values)
+            await self.db.commit()
+            self.imported += len(values)
+        except SQLAlchemyError as exc:
+            await self.db.rollback()
+            logger.warning("Import batch failed: %s", exc)
+            # DOC: Forget categories created by the rolled back transaction
+            self.categories_created = created_before
+            self.categories.clear()
+            self.owned.clear()
+            await self.load_categories()
+            for line in pending:
+                self.error(line, "databaseError")
+        if self.categories_created != created_before:
+            await invalidate_categories(self.user_id)
+        logger.info(
+            "Import for user %s: %d lines processed, %d imported, %d failed",
+            self.user_id, self.processed, self.imported, self.failed,
+        )
+
+
+# DOC: Service to import notes from an NDJSON byte stream. Lines are
+# validated one at a time and written in batches of batch_size, so memory
+# use depends on the batch size and not on the size of the upload
+async def import_notes(
+        db: AsyncSession,
+        chunks: AsyncIterable[bytes],
+        user_id: int,
+        batch_size: int = IMPORT_BATCH_SIZE):
+    state = _Import(db, user_id)
+    await state.load_categories()
+    batch: List[Tuple[int, NoteImport]] = []
+    async for line, raw in _lines(chunks, MAX_IMPORT_LINE_BYTES):
+        state.processed += 1
+        if raw is None:
+            state.error(line, "lineTooLong")
+            continue
+        try:
+            row = NoteImport.model_validate(json.loads(raw))
+        except ValidationError as exc:
+            state.error(line, "invalidRow", "; ".join(
+                f"{'.'.join(map(str, error['loc'])) or 'row'}: "
+                f"{error['msg']}"
+                for error in exc.errors()
+            ))
+            continue
+        except ValueError:
+            # DOC: Covers json.JSONDecodeError and undecodable bytes
+            state.error(line, "invalidJson")
+            continue
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            await state.flush(batch)
+            batch = []
+    await state.flush(batch)
+    return {
+        "processed": state.processed,
+        "imported": state.imported,
+        "failed": state.failed,
+        "categories_created": state.categories_created,
+        "errors": state.errors,
+    }
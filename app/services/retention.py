@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, case, delete, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import RetentionSettings
+from app.models import NoteHistory
+from app.services import historyStorage
+from app.services.historyStorage import (
+    compress_history,
+    lock_history,
+    make_keyframes,
+)
+
+logger = logging.getLogger(__name__)
+
+# DOC: Candidate notes fetched per query
+NOTES_PER_PAGE = 200
+
+
+# DOC: Ids of the history rows the policy drops. rows are the (id, created)
+# of one note's history, newest first
+def expired_rows(
+        rows: List,
+        policy: RetentionSettings,
+        now: datetime) -> List[int]:
+    cutoff = None
+    if policy.keep_days:
+        cutoff = now - timedelta(days=policy.keep_days)
+    days = set()
+    expired = []
+    for position, row in enumerate(rows):
+        day = row.created.date()
+        if position < policy.keep_last:
+            days.add(day)
+        elif day not in days and (cutoff is None or row.created >= cutoff):
+            days.add(day)
+        else:
+            expired.append(row.id)
+    return expired
+
+
+# DOC: Apply the policy to one note. Kept rows whose delta is based on an
+# expired row are stored in full first; expired rows then go oldest first in
+# transactions of batch_size, so every committed state stays readable. Full
+# rows left at non-keyframe versions are finally rewritten as deltas
+async def compact_note(
+        db: AsyncSession,
+        note_id: int,
+        policy: RetentionSettings,
+        now: datetime,
+        dry_run: bool = False) -> dict:
+    result = await db.execute(
+        select(NoteHistory.id, NoteHistory.created, NoteHistory.delta)
+        .where(NoteHistory.note_id == note_id)
+        .order_by(NoteHistory.id.desc())
+    )
+    rows = result.all()
+    expired = set(expired_rows(rows, policy, now))
+    rebased = [
+        row.id for newer, row in zip(rows, rows[1:])
+        if newer.id in expired and row.id not in expired
+        and row.delta is not None
+    ]
+    report = {
+        "deleted": len(expired),
+        "keyframes": len(rebased),
+        "compressed": 0,
+    }
+    if dry_run:
+        return report
+
+    if rebased:
+        await lock_history(db, note_id)
+        result = await db.execute(
+            select(NoteHistory).where(NoteHistory.id.in_(rebased))
+        )
+        await make_keyframes(db, list(result.scalars().all()))
+        await db.commit()
+
+    ordered = sorted(expired)
+    for start in range(0, len(ordered), policy.batch_size):
+        await lock_history(db, note_id)
+        await db.execute(
+            delete(NoteHistory)
+            .where(NoteHistory.id.in_(
+                ordered[start:start + policy.batch_size]
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        # DOC: Let request handlers run between batches
+        await asyncio.sleep(0)
+
+    await lock_history(db, note_id)
+    report["compressed"] = await compress_history(db, note_id)
+    await db.commit()
+    return report
+
+
+# DOC: Notes with more than keep_last history rows, or with full rows at
+# non-keyframe versions that compaction has not checked yet
+def _candidates(policy: RetentionSettings, last_note_id: int):
+    interval = historyStorage.HISTORY_KEYFRAME_INTERVAL
+    conditions = [func.count(NoteHistory.id) > policy.keep_last]
+    if interval > 1:
+        uncompressed = and_(
+            NoteHistory.delta.is_(None),
+            NoteHistory.kept_full.is_(False),
+            NoteHistory.version % interval != 0,
+        )
+        conditions.append(func.sum(case((uncompressed, 1), else_=0)) > 0)
+    return (
+        select(NoteHistory.note_id)
+        .where(NoteHistory.note_id > last_note_id)
+        .group_by(NoteHistory.note_id)
+        .having(or_(*conditions))
+        .order_by(NoteHistory.note_id)
+        .limit(NOTES_PER_PAGE)
+    )
+
+
+# DOC: Service to apply the retention policy to every note with more than
+# keep_last history rows, and to compress the history archived in full.
+# Returns the notes visited, the rows reclaimed and the rows compressed
+async def apply_retention(
+        session_factory: Callable[[], AsyncSession],
+        policy: RetentionSettings,
+        dry_run: bool = False,
+        now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now()
+    report = {"notes": 0, "deleted": 0, "keyframes": 0, "compressed": 0}
+    last_note_id = 0
+    async with session_factory() as db:
+        while True:
+            result = await db.execute(_candidates(policy, last_note_id))
+            note_ids = result.scalars().all()
+            # DOC: End the read transaction before writing
+            await db.commit()
+            if not note_ids:
+                break
+            for note_id in note_ids:
+                counts = await compact_note(
+                    db, note_id, policy, now, dry_run=dry_run
+                )
+                report["notes"] += 1
+                report["deleted"] += counts["deleted"]
+                report["keyframes"] += counts["keyframes"]
+                report["compressed"] += counts["compressed"]
+            last_note_id = note_ids[-1]
+    logger.info(
+        "History retention%s: %d rows reclaimed and %d compressed "
+        "from %d notes",
+        " (dry run)" if dry_run else "",
+        report["deleted"],
+        report["compressed"],
+        report["notes"],
+    )
+    return report
+
+
+# DOC: Background job started by the application lifespan
+async def run_retention_periodically(
+        session_factory: Callable[[], AsyncSession],
+        policy: RetentionSettings) -> None:
+    while True:
+        await asyncio.sleep(policy.interval_seconds)
+        try:
+            await apply_retention(session_factory, policy)
+        except Exception:
+            logger.exception("History retention failed")
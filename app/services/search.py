@@ -0,0 +1,130 @@
+import re
+from typing import List, Optional
+
+from sqlalchemy import Double, Float, Integer, cast, func, literal_column
+from sqlalchemy import text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
+
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models import Note
+
+TS_CONFIG = literal_column("'simple'")
+# DOC: Must match the expression of the ix_notes_search index
+SEARCH_VECTOR = func.to_tsvector(
+    TS_CONFIG,
+    Note.title.op("||")(literal_column("' '")).op("||")(Note.content),
+)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+# DOC: Turn free text into an FTS5 query of quoted terms, so user input can
+# never be parsed as FTS5 operators
+def _fts5_query(q: str) -> str:
+    return " ".join(f'"{word}"' for word in _WORD.findall(q))
+
+
+# DOC: Add or refresh a note in the search index (no-op on Postgres, whose
+# expression index is maintained by the database itself)
+async def index_note(db: AsyncSession, note: Note):
+    if _dialect(db) != "sqlite":
+        return
+    await db.execute(
+        text(
+            "INSERT OR REPLACE INTO notes_fts (rowid, title, content) "
+            "VALUES (:id, :title, :content)"
+        ),
+        {"id": note.id, "title": note.title, "content": note.content},
+    )
+
+
+# DOC: Add or refresh many notes at once, rows being id/title/content dicts
+async def index_notes(db: AsyncSession, rows: List[dict]):
+    if _dialect(db) != "sqlite" or not rows:
+        return
+    await db.execute(
+        text(
+            "INSERT OR REPLACE INTO notes_fts (rowid, title, content) "
+            "VALUES (:id, :title, :content)"
+        ),
+        rows,
+    )
+
+
+# DOC: Remove a note from the search index
+async def unindex_note(db: AsyncSession, note_id: int):
+    await unindex_notes(db, [note_id])
+
+
+# DOC: Remove many notes from the search index
+async def unindex_notes(db: AsyncSession, note_ids: List[int]):
+    if _dialect(db) != "sqlite" or not note_ids:
+        return
+    await db.execute(
+        text("DELETE FROM notes_fts WHERE rowid = :id"),
+        [{"id": note_id} for note_id in note_ids],
+    )
+
+
+def _hits(db: AsyncSession, q: str):
+    if _dialect(db) == "sqlite":
+        # DOC: bm25() is lower-is-better, negate it to rank descending
+        return (
+            text(
+                "SELECT rowid AS note_id, -bm25(notes_fts) AS score "
+                "FROM notes_fts WHERE notes_fts MATCH :q"
+            )
+            .bindparams(q=_fts5_query(q))
+            .columns(note_id=Integer, score=Float)
+            .subquery("hits")
+        )
+    query = func.websearch_to_tsquery(TS_CONFIG, q)
+    return (
+        select(
+            Note.id.label("note_id"),
+            # DOC: float8 so the score survives the cursor round trip exactly
+            cast(func.ts_rank(SEARCH_VECTOR, query), Double).label("score"),
+        )
+        .where(SEARCH_VECTOR.op("@@")(query))
+        .subquery("hits")
+    )
+
+
+# DOC: Service to search the notes of a user, best match first
+async def search_notes(
+        db: AsyncSession,
+        user_id: int,
+        q: str,
+        limit: int,
+        cursor: Optional[str] = None):
+    if _dialect(db) == "sqlite" and not _fts5_query(q):
+        return {"items": [], "next_cursor": None}
+
+    hits = _hits(db, q)
+    query = (
+        select(Note, hits.c.score)
+        .join(hits, hits.c.note_id == Note.id)
+        .options(joinedload(Note.category))
+        .where(Note.user_id == user_id)
+        .order_by(hits.c.score.desc(), Note.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        score, note_id = decode_cursor(cursor, (float, int), int)
+        query = query.where(
+            tuple_(hits.c.score, Note.id) < tuple_(score, note_id)
+        )
+    result = await db.execute(query)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_note, last_score = rows[-1]
+        next_cursor = encode_cursor(last_score, last_note.id)
+    return {"items": [note for note, _ in rows], "next_cursor": next_cursor}
@@ -1,9 +1,14 @@
+import uuid
 import pytest
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.models import Base
 from app.main import app
-from app.db.database import get_db
+from app.db.database import enable_foreign_keys, get_db
+from app.core.metrics import instrument_engine
+from app.core.security import user_cache
+from app.services.categories import category_cache
+from app.db.queries import QueryCounter
 from httpx import AsyncClient
 from httpx._transports.asgi import ASGITransport
 
@@ -17,6 +22,8 @@ async def test_engine():
     Configura el motor de base de datos en memoria para pruebas.
     """
     engine = create_async_engine(DATABASE_URL, echo=False)
+    enable_foreign_keys(engine)
+    instrument_engine(engine)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)  # Crea las tablas
     try:
@@ -68,3 +75,43 @@ async def async_client():
             yield client
         finally:
             await client.aclose()  # Asegura que se cierre el cliente
+
+
+# Fixture para registrar un usuario único y obtener sus cabeceras de auth
+@pytest.fixture
+async def auth_headers(async_client):
+    """
+    Registra un usuario nuevo, inicia sesión y devuelve la cabecera Bearer.
+    """
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    await async_client.post(
+        "/api/auth/register",
+        json={
+            "document": str(uuid.uuid4().int)[:12],
+            "full_name": "Test User",
+            "email": email,
+            "password": "password123",
+            "password_confirmation": "password123",
+        },
+    )
+    login_response = await async_client.post(
+        "/api/auth/login",
+        json={"email": email, "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+# Fixture para limitar las consultas SQL de un bloque
+@pytest.fixture
+def assert_max_queries(test_engine):
+    """
+    Devuelve un context manager que falla si el bloque ejecuta más
+    sentencias SQL que el presupuesto indicado. Vacía las cachés de usuarios
+    y categorías para que el conteo no dependa del orden de las pruebas.
+    """
+    def _assert_max_queries(max_queries):
+        user_cache.clear()
+        category_cache.clear()
+        return QueryCounter(test_engine, max_queries=max_queries)
+    return _assert_max_queries
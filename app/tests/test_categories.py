@@ -0,0 +1,148 @@
+import pytest
+from app.core.cache import MemoryBackend, cache_backend
+from app.db.queries import QueryCounter
+from app.services import categories
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_round_trip():
+    backend = cache_backend("memory://", maxsize=2, ttl=60)
+    assert isinstance(backend, MemoryBackend)
+    await backend.set("a", b"1")
+    assert await backend.get("a") == b"1"
+    await backend.delete("a")
+    assert await backend.get("a") is None
+    with pytest.raises(ValueError):
+        cache_backend("ftp://cache", maxsize=2, ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_category_listing_is_cached_and_invalidated(
+    async_client, auth_headers, assert_max_queries, test_engine
+):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=auth_headers,
+        json={"name": "Work", "color": "blue"},
+    )
+    category_id = response.json()["id"]
+
+    with assert_max_queries(2):
+        first = await async_client.get(
+            "/api/categories/", headers=auth_headers
+        )
+    # DOC: The user and the listing are both cached now
+    with QueryCounter(test_engine, max_queries=0):
+        second = await async_client.get(
+            "/api/categories/", headers=auth_headers
+        )
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert first.json() == [{"id": category_id, "name": "Work",
+                             "color": "blue"}]
+
+    await async_client.put(
+        f"/api/categories/{category_id}",
+        headers=auth_headers,
+        json={"name": "Home", "color": "blue"},
+    )
+    response = await async_client.get("/api/categories/", headers=auth_headers)
+    assert response.json()[0]["name"] == "Home"
+
+    await async_client.delete(
+        f"/api/categories/{category_id}", headers=auth_headers
+    )
+    response = await async_client.get("/api/categories/", headers=auth_headers)
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_listing_read_before_an_invalidation_is_not_cached(
+    async_client, auth_headers, assert_max_queries, test_engine, monkeypatch
+):
+    await async_client.post(
+        "/api/categories/",
+        headers=auth_headers,
+        json={"name": "Work", "color": "blue"},
+    )
+    get_categories = categories.get_categories
+
+    async def _racing_write(db, user_id):
+        listing = await get_categories(db, user_id)
+        # DOC: A write commits and invalidates while the read is in flight
+        await categories.invalidate_categories(user_id)
+        return listing
+
+    monkeypatch.setattr(categories, "get_categories", _racing_write)
+    with assert_max_queries(2):
+        await async_client.get("/api/categories/", headers=auth_headers)
+    monkeypatch.setattr(categories, "get_categories", get_categories)
+
+    # DOC: The listing read before the invalidation was not served
+    with QueryCounter(test_engine) as counter:
+        await async_client.get("/api/categories/", headers=auth_headers)
+    assert counter.count == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_category_requires_it_to_be_empty(
+    async_client, auth_headers
+):
+    category_ids = []
+    for name in ("Work", "Home"):
+        response = await async_client.post(
+            "/api/categories/",
+            headers=auth_headers,
+            json={"name": name, "color": "blue"},
+        )
+        category_ids.append(response.json()["id"])
+    work, home = category_ids
+    notes = []
+    for category_id in category_ids:
+        response = await async_client.post(
+            "/api/notes/",
+            headers=auth_headers,
+            json={"title": "cascade", "content": "c",
+                  "category_id": category_id},
+        )
+        notes.append(response.json()["id"])
+    # DOC: The Home note was filed under Work in its first version
+    await async_client.put(
+        f"/api/notes/{notes[1]}",
+        headers=auth_headers,
+        json={"title": "cascade", "content": "c", "category_id": work,
+              "version": 1},
+    )
+    await async_client.put(
+        f"/api/notes/{notes[1]}",
+        headers=auth_headers,
+        json={"title": "cascade", "content": "d", "category_id": home,
+              "version": 2},
+    )
+
+    response = await async_client.delete(
+        f"/api/categories/{work}", headers=auth_headers
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"] == "categoryNotEmpty"
+    response = await async_client.get(
+        f"/api/notes/{notes[0]}", headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    await async_client.delete(f"/api/notes/{notes[0]}", headers=auth_headers)
+    response = await async_client.delete(
+        f"/api/categories/{work}", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["name"] == "Work"
+    response = await async_client.get(
+        f"/api/notes/{notes[1]}/history", headers=auth_headers
+    )
+    assert [h["category"] for h in response.json()["items"]] == [
+        None, {"id": home, "name": "Home", "color": "blue"}
+    ]
+    response = await async_client.delete(
+        f"/api/categories/{work}", headers=auth_headers
+    )
+    assert response.status_code == 404
@@ -0,0 +1,272 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.delta import decode_delta, encode_delta
+from app.db.database import enable_foreign_keys, get_db
+from app.main import app
+from app.models import Base
+from app.services.historyStorage import compress_history
+
+BASE = (
+    "Meeting notes: discuss the roadmap for the next quarter, review the "
+    "open incidents, agree on the release date and assign owners. "
+)
+
+
+def _revision(i: int) -> tuple:
+    return f"Roadmap {i}", BASE + f"Revision {i}."
+
+
+def test_delta_round_trip():
+    new = ("Roadmap 2", BASE + "Revision 2.")
+    old = ("Roadmap 1", BASE + "Revision 1.")
+    delta = encode_delta(new, old)
+    assert decode_delta(new, delta) == old
+    assert len(delta) < len(old[0]) + len(old[1])
+    assert decode_delta(("", ""), encode_delta(("", ""), old)) == old
+
+
+async def _note_with_revisions(async_client, headers, revisions):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=headers,
+        json={"name": "Work", "color": "blue"},
+    )
+    category_id = response.json()["id"]
+    title, content = _revision(1)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=headers,
+        json={"title": title, "content": content,
+              "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+    for version in range(1, revisions):
+        title, content = _revision(version + 1)
+        response = await async_client.put(
+            f"/api/notes/{note_id}",
+            headers=headers,
+            json={"title": title, "content": content,
+                  "category_id": category_id, "version": version},
+        )
+        assert response.status_code == 200
+    return note_id
+
+
+async def _history(async_client, headers, note_id):
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history",
+        headers=headers,
+        params={"limit": 100},
+    )
+    return response.json()["items"]
+
+
+async def _keyframes(test_engine, note_id):
+    async with test_engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                "SELECT version, delta IS NULL FROM notes_history "
+                "WHERE note_id = :id ORDER BY id"
+            ),
+            {"id": note_id},
+        )
+        return [version for version, full in result.all() if full]
+
+
+async def _compress(test_engine, note_id):
+    async with AsyncSession(test_engine) as db:
+        compressed = await compress_history(db, note_id)
+        await db.commit()
+    return compressed
+
+
+@pytest.mark.asyncio
+async def test_history_is_stored_as_deltas(
+    async_client, auth_headers, test_engine
+):
+    note_id = await _note_with_revisions(async_client, auth_headers, 13)
+
+    # DOC: Updates archive deltas and a full row every tenth version, so
+    # there is nothing left to compact
+    assert await _keyframes(test_engine, note_id) == [10]
+    assert await _compress(test_engine, note_id) == 0
+
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(version) for version in range(12, 0, -1)
+    ]
+
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history",
+        headers=auth_headers,
+        params={"limit": 3},
+    )
+    page = response.json()
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history",
+        headers=auth_headers,
+        params={"limit": 3, "cursor": page["next_cursor"]},
+    )
+    assert [h["title"] for h in response.json()["items"]] == [
+        "Roadmap 9", "Roadmap 8", "Roadmap 7"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_delete_and_restore_keep_history_readable(
+    async_client, auth_headers, test_engine
+):
+    note_id = await _note_with_revisions(async_client, auth_headers, 6)
+    await _compress(test_engine, note_id)
+    history = await _history(async_client, auth_headers, note_id)
+    by_version = {h["version"]: h for h in history}
+
+    response = await async_client.delete(
+        f"/api/notes-history/{by_version[3]['id']}", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == _revision(3)[1]
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(version) for version in (5, 4, 2, 1)
+    ]
+
+    response = await async_client.put(
+        f"/api/notes-history/restore/{by_version[4]['id']}",
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert (response.json()["title"], response.json()["content"]) == (
+        _revision(4)
+    )
+    assert response.json()["version"] == 7
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(version) for version in (5, 2, 1)
+    ]
+
+    # DOC: New revisions stack on top of the restored text
+    title, content = _revision(7)
+    response = await async_client.put(
+        f"/api/notes/{note_id}",
+        headers=auth_headers,
+        json={"title": title, "content": content,
+              "category_id": response.json()["category"]["id"],
+              "version": 7},
+    )
+    assert response.status_code == 200
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(version) for version in (4, 5, 2, 1)
+    ]
+
+
+async def _history_rows(test_engine, note_id):
+    async with test_engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT count(*) FROM notes_history WHERE note_id = :id"),
+            {"id": note_id},
+        )
+        return result.scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_delete_note_cascades_history_in_one_statement(
+    async_client, auth_headers, test_engine, assert_max_queries
+):
+    note_id = await _note_with_revisions(async_client, auth_headers, 12)
+    assert await _history_rows(test_engine, note_id) == 11
+
+    # One statement resolves the user, one unindexes the note (SQLite)
+    with assert_max_queries(3):
+        response = await async_client.delete(
+            f"/api/notes/{note_id}", headers=auth_headers
+        )
+    assert response.status_code == 200
+    assert response.json()["title"] == _revision(12)[0]
+    assert response.json()["history_count"] == 0
+    assert await _history_rows(test_engine, note_id) == 0
+    response = await async_client.delete(
+        f"/api/notes/{note_id}", headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+# DOC: A SQLite file in WAL mode, so a second connection can commit while
+# the compaction is reading
+@pytest.fixture
+async def file_engine(tmp_path):
+    path = tmp_path / "history.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    enable_foreign_keys(engine)
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def _get_file_db():
+        async with session_factory() as session:
+            yield session
+    app.dependency_overrides[get_db] = _get_file_db
+    try:
+        yield engine, path
+    finally:
+        await engine.dispose()
+
+
+# DOC: An update archiving the full row, as older releases did, committed
+# by another connection
+def _update_behind(path, note_id, revision):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO notes_history (note_id, title, content, version, "
+            "category_id, created) SELECT id, title, content, version, "
+            "category_id, ? FROM notes WHERE id = ?",
+            (str(datetime.now()), note_id),
+        )
+        conn.execute(
+            "UPDATE notes SET title = ?, content = ?, version = version + 1 "
+            "WHERE id = ?",
+            (*revision, note_id),
+        )
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_compaction_ignores_an_update_committed_while_reading(
+    file_engine, async_client, auth_headers
+):
+    engine, path = file_engine
+    note_id = await _note_with_revisions(async_client, auth_headers, 1)
+    _update_behind(path, note_id, _revision(2))
+    updated = []
+
+    # DOC: Version 3 is committed right after the compaction's first read
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _interleave(conn, cursor, statement, parameters, context, many):
+        if not updated and statement.lstrip().startswith("SELECT"):
+            updated.append(True)
+            _update_behind(path, note_id, _revision(3))
+
+    async with AsyncSession(engine) as db:
+        await compress_history(db, note_id)
+        await db.commit()
+    event.remove(engine.sync_engine, "after_cursor_execute", _interleave)
+
+    assert updated
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(2), _revision(1)
+    ]
+    assert await _compress(engine, note_id) == 1
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(2), _revision(1)
+    ]
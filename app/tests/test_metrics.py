@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app.core.metrics import RequestStats, _request_stats
+
+
+def _sample(body: str, prefix: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found")
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_route_latency_and_queries(
+    async_client, auth_headers
+):
+    await async_client.get("/api/notes/", headers=auth_headers)
+    await async_client.get("/api/notes/", headers=auth_headers)
+    await async_client.get("/api/notes/12345", headers=auth_headers)
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+
+    route = 'method="GET",route="/api/notes/"'
+    assert _sample(
+        body, f"http_request_duration_seconds_count{{{route}}}"
+    ) >= 2
+    assert _sample(body, f"db_queries_per_request_count{{{route}}}") >= 2
+    assert _sample(body, f"db_queries_per_request_sum{{{route}}}") >= 2
+    assert _sample(
+        body,
+        'http_requests_total{method="GET",route="/api/notes/{note_id}",'
+        'status="404"}',
+    ) >= 1
+    assert _sample(body, "http_requests_in_flight") == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_statements_are_counted_and_leave_no_state(
+    test_engine,
+):
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        async with test_engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(DBAPIError):
+                    await conn.exec_driver_sql("SELECT * FROM missing")
+            await conn.exec_driver_sql("SELECT 1")
+            assert not conn.info.get("query_start")
+    finally:
+        _request_stats.reset(token)
+    assert stats.queries == 4
+    assert stats.db_time > 0
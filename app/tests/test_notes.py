@@ -1,5 +1,10 @@
+import json
+from datetime import datetime
+
 import pytest
 
+from app.core.pagination import encode_cursor
+
 
 @pytest.mark.asyncio
 async def test_create_note_success(async_client):
@@ -27,3 +32,544 @@ async def test_create_note_success(async_client):
     data = response.json()
     assert data["title"] == "Test Note"
     assert data["content"] == "This is a test note"
+
+
+async def _create_category(async_client, headers):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=headers,
+        json={"name": "Work", "color": "blue"},
+    )
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_read_notes_keyset_pagination(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    for i in range(5):
+        await async_client.post(
+            "/api/notes/",
+            headers=auth_headers,
+            json={
+                "title": f"Note {i}",
+                "content": "content",
+                "category_id": category_id,
+            },
+        )
+
+    titles = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await async_client.get(
+            "/api/notes/", headers=auth_headers, params=params
+        )
+        assert response.status_code == 200
+        data = response.json()
+        titles.extend(note["title"] for note in data["items"])
+        pages += 1
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert titles == [f"Note {i}" for i in reversed(range(5))]
+
+
+@pytest.mark.asyncio
+async def test_read_notes_rejects_invalid_cursor(async_client, auth_headers):
+    response = await async_client.get(
+        "/api/notes/", headers=auth_headers, params={"cursor": "not-valid"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "invalidCursor"
+
+
+@pytest.mark.asyncio
+async def test_cursors_with_values_of_the_wrong_type_are_rejected(
+    async_client, auth_headers
+):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=auth_headers,
+        json={"name": "Work", "color": "blue"},
+    )
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "t", "content": "c",
+              "category_id": response.json()["id"]},
+    )
+    note_id = response.json()["id"]
+    for path, cursor in [
+        ("/api/notes/", encode_cursor("a", "b")),
+        ("/api/notes/", encode_cursor(datetime.now(), True)),
+        (f"/api/notes/{note_id}/history", encode_cursor(1, 2)),
+        ("/api/notes/search", encode_cursor(datetime.now(), 1)),
+    ]:
+        response = await async_client.get(
+            path, headers=auth_headers, params={"q": "c", "cursor": cursor}
+        )
+        assert response.status_code == 400, path
+        assert response.json()["detail"] == "invalidCursor"
+
+
+@pytest.mark.asyncio
+async def test_note_history_is_paginated_separately(
+    async_client, auth_headers
+):
+    category_id = await _create_category(async_client, auth_headers)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "v1", "content": "c", "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+    for version in range(1, 4):
+        response = await async_client.put(
+            f"/api/notes/{note_id}",
+            headers=auth_headers,
+            json={
+                "title": f"v{version + 1}",
+                "content": "c",
+                "category_id": category_id,
+                "version": version,
+            },
+        )
+        assert response.status_code == 200
+    assert response.json()["history_count"] == 3
+    assert "history" not in response.json()
+
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history",
+        headers=auth_headers,
+        params={"limit": 2},
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert [h["title"] for h in page["items"]] == ["v3", "v2"]
+
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history",
+        headers=auth_headers,
+        params={"limit": 2, "cursor": page["next_cursor"]},
+    )
+    page = response.json()
+    assert [h["title"] for h in page["items"]] == ["v1"]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_note_history_of_unknown_note(async_client, auth_headers):
+    response = await async_client.get(
+        "/api/notes/999999/history", headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_batch_operations_report_per_item_status(
+    async_client, auth_headers
+):
+    category_id = await _create_category(async_client, auth_headers)
+    created = []
+    for title in ("keep", "drop"):
+        response = await async_client.post(
+            "/api/notes/",
+            headers=auth_headers,
+            json={"title": title, "content": "c", "category_id": category_id},
+        )
+        created.append(response.json())
+    keep, drop = created
+
+    response = await async_client.post(
+        "/api/notes/batch",
+        headers=auth_headers,
+        json={"operations": [
+            {"op": "create", "title": "new", "content": "c",
+             "category_id": category_id},
+            {"op": "update", "id": keep["id"], "title": "kept",
+             "content": "c", "category_id": category_id, "version": 1},
+            {"op": "update", "id": drop["id"], "title": "stale",
+             "content": "c", "category_id": category_id, "version": 7},
+            {"op": "delete", "id": drop["id"]},
+            {"op": "delete", "id": 999999},
+            {"op": "create", "title": "x", "content": "c",
+             "category_id": 999999},
+        ]},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [200, 200, 409, 400, 404, 404]
+    assert results[0]["note"]["title"] == "new"
+    assert results[1]["note"]["version"] == 2
+    assert results[1]["note"]["history_count"] == 1
+
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    titles = sorted(note["title"] for note in response.json()["items"])
+    assert titles == ["drop", "kept", "new"]
+
+
+@pytest.mark.asyncio
+async def test_batch_deletes_notes_with_history(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "a", "content": "c", "category_id": category_id},
+    )
+    note = response.json()
+    await async_client.put(
+        f"/api/notes/{note['id']}",
+        headers=auth_headers,
+        json={"title": "b", "content": "c", "category_id": category_id,
+              "version": 1},
+    )
+
+    response = await async_client.post(
+        "/api/notes/batch",
+        headers=auth_headers,
+        json={"operations": [{"op": "delete", "id": note["id"]}]},
+    )
+    result = response.json()["results"][0]
+    assert result["status"] == 200
+    assert result["note"]["title"] == "b"
+
+    response = await async_client.get(
+        f"/api/notes/{note['id']}", headers=auth_headers
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_returns_304_until_note_changes(
+    async_client, auth_headers
+):
+    category_id = await _create_category(async_client, auth_headers)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "a", "content": "c", "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+
+    response = await async_client.get(
+        f"/api/notes/{note_id}", headers=auth_headers
+    )
+    etag = response.headers["ETag"]
+    list_etag = (
+        await async_client.get("/api/notes/", headers=auth_headers)
+    ).headers["ETag"]
+
+    response = await async_client.get(
+        f"/api/notes/{note_id}",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    response = await async_client.get(
+        "/api/notes/", headers={**auth_headers, "If-None-Match": list_etag}
+    )
+    assert response.status_code == 304
+
+    # DOC: Renaming the category changes the note without a version bump
+    await async_client.put(
+        f"/api/categories/{category_id}",
+        headers=auth_headers,
+        json={"name": "Home", "color": "blue"},
+    )
+    response = await async_client.get(
+        f"/api/notes/{note_id}",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    response = await async_client.get(
+        "/api/notes/", headers={**auth_headers, "If-None-Match": list_etag}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_update_with_if_match(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "a", "content": "c", "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+    etag = (
+        await async_client.get(f"/api/notes/{note_id}", headers=auth_headers)
+    ).headers["ETag"]
+    body = {"title": "b", "content": "c", "category_id": category_id}
+
+    response = await async_client.put(
+        f"/api/notes/{note_id}", headers=auth_headers, json=body
+    )
+    assert response.status_code == 428
+
+    response = await async_client.put(
+        f"/api/notes/{note_id}",
+        headers={**auth_headers, "If-Match": etag},
+        json=body,
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.headers["ETag"] != etag
+
+    response = await async_client.put(
+        f"/api/notes/{note_id}",
+        headers={**auth_headers, "If-Match": etag},
+        json=body,
+    )
+    assert response.status_code == 412
+
+
+@pytest.mark.asyncio
+async def test_restore_never_reuses_an_etag(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "v1", "content": "c", "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+    body = {"content": "c", "category_id": category_id}
+    response = await async_client.put(
+        f"/api/notes/{note_id}",
+        headers=auth_headers,
+        json={**body, "title": "AAA", "version": 1},
+    )
+    etag = response.headers["ETag"]
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history", headers=auth_headers
+    )
+    response = await async_client.put(
+        f"/api/notes-history/restore/{response.json()['items'][0]['id']}",
+        headers=auth_headers,
+    )
+    assert response.json()["version"] == 3
+
+    # DOC: Same history count as the "AAA" state, different text
+    response = await async_client.put(
+        f"/api/notes/{note_id}",
+        headers=auth_headers,
+        json={**body, "title": "BBB", "version": 3},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    response = await async_client.get(
+        f"/api/notes/{note_id}",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == "BBB"
+
+
+async def _other_user_headers(async_client):
+    await async_client.post(
+        "/api/auth/register",
+        json={
+            "document": "87654321",
+            "full_name": "Other User",
+            "email": "other-owner@example.com",
+            "password": "password123",
+            "password_confirmation": "password123",
+        },
+    )
+    response = await async_client.post(
+        "/api/auth/login",
+        json={"email": "other-owner@example.com", "password": "password123"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.mark.asyncio
+async def test_create_note_requires_own_category(
+    async_client, auth_headers
+):
+    other_headers = await _other_user_headers(async_client)
+    other_category = await _create_category(async_client, other_headers)
+    for category_id in (other_category, 10 ** 6):
+        response = await async_client.post(
+            "/api/notes/",
+            headers=auth_headers,
+            json={"title": "a", "content": "c", "category_id": category_id},
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"] == "categoryNotFound"
+
+    response = await async_client.post(
+        "/api/notes/",
+        headers=other_headers,
+        json={"title": "a", "content": "c", "category_id": other_category},
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert response.json()["history_count"] == 0
+    assert response.json()["category"]["name"] == "Work"
+
+
+@pytest.mark.asyncio
+async def test_update_is_conditional_on_version_and_category(
+    async_client, auth_headers
+):
+    category_id = await _create_category(async_client, auth_headers)
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "a", "content": "c", "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+    body = {"title": "b", "content": "c", "category_id": category_id}
+
+    response = await async_client.put(
+        f"/api/notes/{note_id}", headers=auth_headers,
+        json={**body, "version": 1},
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.json()["history_count"] == 1
+    assert response.json()["category"]["id"] == category_id
+
+    response = await async_client.put(
+        f"/api/notes/{note_id}", headers=auth_headers,
+        json={**body, "version": 1},
+    )
+    assert response.status_code == 409
+    response = await async_client.put(
+        f"/api/notes/{note_id}", headers=auth_headers,
+        json={**body, "version": 2, "category_id": 10 ** 6},
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "categoryNotFound"
+    response = await async_client.get(
+        f"/api/notes/{note_id}/history", headers=auth_headers
+    )
+    assert len(response.json()["items"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_categories(async_client, auth_headers):
+    await _create_category(async_client, auth_headers)
+    etag = (
+        await async_client.get("/api/categories/", headers=auth_headers)
+    ).headers["ETag"]
+    response = await async_client.get(
+        "/api/categories/", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    await _create_category(async_client, auth_headers)
+    response = await async_client.get(
+        "/api/categories/", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_export_streams_notes_with_history(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    note_ids = []
+    for i in range(5):
+        response = await async_client.post(
+            "/api/notes/",
+            headers=auth_headers,
+            json={"title": f"Note {i}", "content": "c",
+                  "category_id": category_id},
+        )
+        note_ids.append(response.json()["id"])
+    for version in (1, 2):
+        await async_client.put(
+            f"/api/notes/{note_ids[0]}",
+            headers=auth_headers,
+            json={"title": f"Edit {version}", "content": "c",
+                  "category_id": category_id, "version": version},
+        )
+
+    response = await async_client.get(
+        "/api/notes/export",
+        headers=auth_headers,
+        params={"chunk_size": 2},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == note_ids
+    assert lines[0]["title"] == "Edit 2"
+    assert lines[0]["category"]["name"] == "Work"
+    assert [h["title"] for h in lines[0]["history"]] == ["Note 0", "Edit 1"]
+    assert lines[1]["history"] == []
+
+
+@pytest.mark.asyncio
+async def test_import_notes_from_ndjson(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    rows = [
+        {"title": "a", "content": "c", "category_id": category_id},
+        {"title": "b", "content": "c", "category": {"name": "Ideas"}},
+        {"title": "c", "content": "c",
+         "category": {"name": "Ideas", "color": "red"}},
+        {"title": "d", "content": "c", "category": {"name": "Work"}},
+        {"title": "e", "content": "c"},
+        {"title": "f", "content": "c", "category_id": 999999},
+    ]
+    lines = [json.dumps(row) for row in rows]
+    lines.insert(2, "not json")
+    lines.insert(3, "")
+
+    response = await async_client.post(
+        "/api/notes/import",
+        headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        params={"batch_size": 2},
+        content="\n".join(lines).encode(),
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["processed"] == 7
+    assert result["imported"] == 4
+    assert result["failed"] == 3
+    assert result["categories_created"] == 1
+    assert [(e["line"], e["detail"]) for e in result["errors"]] == [
+        (3, "invalidJson"), (7, "invalidRow"), (8, "categoryNotFound"),
+    ]
+
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    notes = {note["title"]: note for note in response.json()["items"]}
+    assert set(notes) == {"a", "b", "c", "d"}
+    assert notes["b"]["category"]["id"] == notes["c"]["category"]["id"]
+    assert notes["d"]["category"]["id"] == category_id
+    response = await async_client.get(
+        "/api/categories/", headers=auth_headers
+    )
+    assert {c["name"] for c in response.json()} == {"Work", "Ideas"}
+
+
+@pytest.mark.asyncio
+async def test_export_can_be_imported(async_client, auth_headers):
+    category_id = await _create_category(async_client, auth_headers)
+    for i in range(3):
+        await async_client.post(
+            "/api/notes/",
+            headers=auth_headers,
+            json={"title": f"Note {i}", "content": "c",
+                  "category_id": category_id},
+        )
+    export = await async_client.get(
+        "/api/notes/export", headers=auth_headers
+    )
+
+    response = await async_client.post(
+        "/api/notes/import", headers=auth_headers, content=export.content
+    )
+    assert response.json()["imported"] == 3
+    assert response.json()["categories_created"] == 0
+    response = await async_client.get(
+        "/api/notes/search", headers=auth_headers, params={"q": "Note"}
+    )
+    assert len(response.json()["items"]) == 6
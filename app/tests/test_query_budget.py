@@ -0,0 +1,127 @@
+import logging
+
+import pytest
+
+from app.core.metrics import (
+    MetricsMiddleware,
+    MetricsRegistry,
+    current_request_stats,
+)
+from app.db.queries import QueryBudgetExceeded
+
+
+async def _seed(async_client, headers, notes, edits):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=headers,
+        json={"name": "Budget", "color": "gray"},
+    )
+    category_id = response.json()["id"]
+    note_ids = []
+    for i in range(notes):
+        response = await async_client.post(
+            "/api/notes/",
+            headers=headers,
+            json={"title": f"n{i}", "content": "budget",
+                  "category_id": category_id},
+        )
+        note_id = response.json()["id"]
+        note_ids.append(note_id)
+        for version in range(1, edits + 1):
+            await async_client.put(
+                f"/api/notes/{note_id}",
+                headers=headers,
+                json={"title": f"n{i}", "content": f"budget {version}",
+                      "category_id": category_id, "version": version},
+            )
+    return category_id, note_ids
+
+
+@pytest.mark.asyncio
+async def test_read_routes_stay_within_query_budget(
+    async_client, auth_headers, assert_max_queries
+):
+    _, note_ids = await _seed(async_client, auth_headers, notes=8, edits=3)
+
+    # One statement resolves the user, one serves the route
+    for url in (
+        "/api/notes/",
+        f"/api/notes/{note_ids[0]}",
+        f"/api/notes/{note_ids[0]}/history",
+        "/api/notes/search?q=budget",
+        "/api/categories/",
+    ):
+        with assert_max_queries(2):
+            response = await async_client.get(url, headers=auth_headers)
+        assert response.status_code == 200, url
+
+
+@pytest.mark.asyncio
+async def test_write_routes_stay_within_query_budget(
+    async_client, auth_headers, assert_max_queries
+):
+    category_id, _ = await _seed(async_client, auth_headers, notes=0, edits=0)
+
+    # One statement resolves the user, one writes the search index (SQLite)
+    body = {"title": "n", "content": "budget", "category_id": category_id}
+    with assert_max_queries(3):
+        response = await async_client.post(
+            "/api/notes/", headers=auth_headers, json=body
+        )
+    assert response.status_code == 200
+    assert response.json()["history_count"] == 0
+    assert response.json()["category"]["id"] == category_id
+
+    # The current version is read, archived as a delta and the note updated
+    # in three more
+    with assert_max_queries(5):
+        response = await async_client.put(
+            f"/api/notes/{response.json()['id']}",
+            headers=auth_headers,
+            json={**body, "content": "budget 1", "version": 1},
+        )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_note_list_queries_do_not_grow_with_notes(
+    async_client, auth_headers, assert_max_queries
+):
+    await _seed(async_client, auth_headers, notes=1, edits=0)
+    with assert_max_queries(None) as small:
+        await async_client.get("/api/notes/", headers=auth_headers)
+
+    await _seed(async_client, auth_headers, notes=10, edits=2)
+    with assert_max_queries(None) as large:
+        await async_client.get("/api/notes/", headers=auth_headers)
+
+    assert large.count == small.count
+
+
+@pytest.mark.asyncio
+async def test_query_counter_fails_over_budget(
+    async_client, auth_headers, assert_max_queries
+):
+    with pytest.raises(QueryBudgetExceeded):
+        with assert_max_queries(0):
+            await async_client.get("/api/notes/", headers=auth_headers)
+
+
+@pytest.mark.asyncio
+async def test_middleware_warns_when_request_exceeds_budget(caplog):
+    async def app(scope, receive, send):
+        current_request_stats().queries += 3
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = MetricsMiddleware(
+        app, metrics=MetricsRegistry(), query_budget=2
+    )
+    scope = {"type": "http", "method": "GET", "path": "/x"}
+    with caplog.at_level(logging.WARNING, logger="app.core.metrics"):
+        await middleware(scope, None, send)
+    assert "issued 3 SQL statements (budget 2)" in caplog.text
@@ -0,0 +1,153 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import enable_foreign_keys, get_db, replica_router
+from app.db.replica import READ_YOUR_WRITES_COOKIE
+from app.main import app
+from app.models import Base
+from app.services.categories import category_cache
+
+
+async def _file_engine(path, create=True):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    enable_foreign_keys(engine)
+    if create:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+def _session_factory(engine):
+    return sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+
+# DOC: Two SQLite files stand in for a primary and a replica that never
+# catches up, so the route that served a read shows in its result
+@pytest.fixture
+async def primary_and_replica(tmp_path, monkeypatch):
+    primary = await _file_engine(tmp_path / "primary.db")
+    replica = await _file_engine(tmp_path / "replica.db")
+    primary_session = _session_factory(primary)
+
+    async def _get_primary_db():
+        async with primary_session() as session:
+            yield session
+    app.dependency_overrides[get_db] = _get_primary_db
+    monkeypatch.setattr(
+        replica_router, "session_factory", _session_factory(replica)
+    )
+    monkeypatch.setattr(replica_router, "_down_until", 0.0)
+    replica_router.recent_writers.clear()
+    try:
+        yield primary, replica
+    finally:
+        replica_router.recent_writers.clear()
+        await primary.dispose()
+        await replica.dispose()
+
+
+async def _create_note(async_client, headers):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=headers,
+        json={"name": "Replica", "color": "red"},
+    )
+    response = await async_client.post(
+        "/api/notes/",
+        headers=headers,
+        json={"title": "Primary", "content": "Only on the primary",
+              "category_id": response.json()["id"]},
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_reads_use_the_replica_outside_the_read_your_writes_window(
+    primary_and_replica, async_client, auth_headers
+):
+    await _create_note(async_client, auth_headers)
+    before = replica_router.stats()
+
+    # Right after writing, the user reads its own note from the primary
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    assert len(response.json()["items"]) == 1
+
+    # Once the window is over, reads go to the (lagging) replica
+    replica_router.recent_writers.clear()
+    async_client.cookies.clear()
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    assert response.json()["items"] == []
+    response = await async_client.get(
+        "/api/categories/", headers=auth_headers
+    )
+    assert response.status_code == 200
+
+    stats = replica_router.stats()
+    assert stats["primary_reads"] - before["primary_reads"] == 1
+    assert stats["replica_reads"] - before["replica_reads"] == 2
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_falls_back_to_the_primary(
+    primary_and_replica, async_client, auth_headers, tmp_path, monkeypatch
+):
+    missing = await _file_engine(
+        tmp_path / "missing" / "replica.db", create=False
+    )
+    monkeypatch.setattr(
+        replica_router, "session_factory", _session_factory(missing)
+    )
+    await _create_note(async_client, auth_headers)
+    replica_router.recent_writers.clear()
+    async_client.cookies.clear()
+    before = replica_router.stats()
+
+    for _ in range(2):
+        response = await async_client.get(
+            "/api/notes/", headers=auth_headers
+        )
+        assert len(response.json()["items"]) == 1
+
+    # The second read does not retry the replica within retry_seconds
+    stats = replica_router.stats()
+    assert stats["fallbacks"] - before["fallbacks"] == 1
+    assert stats["primary_reads"] - before["primary_reads"] == 2
+    await missing.dispose()
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_cookie_holds_across_workers(
+    primary_and_replica, async_client, auth_headers
+):
+    await _create_note(async_client, auth_headers)
+    assert READ_YOUR_WRITES_COOKIE in async_client.cookies
+
+    # DOC: Another worker never saw the write; the cookie routes the read
+    replica_router.recent_writers.clear()
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    assert len(response.json()["items"]) == 1
+
+    # DOC: Reads do not extend the window
+    response = await async_client.get(
+        "/api/categories/", headers=auth_headers
+    )
+    assert "set-cookie" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_do_not_fill_the_category_cache(
+    primary_and_replica, async_client, auth_headers
+):
+    await _create_note(async_client, auth_headers)
+    replica_router.recent_writers.clear()
+    async_client.cookies.clear()
+    category_cache.clear()
+
+    response = await async_client.get(
+        "/api/categories/", headers=auth_headers
+    )
+    assert response.json() == []
+    assert category_cache.stats()["size"] == 0
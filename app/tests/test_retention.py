@@ -0,0 +1,136 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import RetentionSettings
+from app.services.retention import (
+    _candidates,
+    apply_retention,
+    compact_note,
+    expired_rows,
+)
+from app.tests.test_history import (
+    _compress,
+    _history,
+    _note_with_revisions,
+    _revision,
+)
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def test_expired_rows_keeps_last_versions_and_one_per_day():
+    created = [
+        NOW,
+        NOW - timedelta(hours=1),
+        NOW - timedelta(hours=2),
+        NOW - timedelta(days=1),
+        NOW - timedelta(days=1, hours=1),
+        NOW - timedelta(days=3),
+        NOW - timedelta(days=40),
+    ]
+    rows = [
+        SimpleNamespace(id=len(created) - i, created=value)
+        for i, value in enumerate(created)
+    ]
+    policy = RetentionSettings(keep_last=2, keep_days=30)
+    # DOC: Same day as the kept rows, second of its day, older than 30 days
+    assert expired_rows(rows, policy, NOW) == [5, 3, 1]
+    policy = RetentionSettings(keep_last=2, keep_days=0)
+    assert expired_rows(rows, policy, NOW) == [5, 3]
+
+
+def test_retention_job_is_opt_in(monkeypatch):
+    monkeypatch.delenv("HISTORY_RETENTION_INTERVAL_SECONDS", raising=False)
+    assert RetentionSettings.from_env().interval_seconds == 0
+    monkeypatch.setenv("HISTORY_RETENTION_INTERVAL_SECONDS", "3600")
+    assert RetentionSettings.from_env().interval_seconds == 3600
+
+
+@pytest.mark.asyncio
+async def test_retention_deletes_in_batches_and_keeps_history_readable(
+    async_client, auth_headers, test_engine
+):
+    note_id = await _note_with_revisions(async_client, auth_headers, 9)
+    await _compress(test_engine, note_id)
+    # DOC: Versions 1-4 were written one per day, 5-8 today
+    async with test_engine.begin() as conn:
+        for version in range(1, 5):
+            await conn.execute(
+                text(
+                    "UPDATE notes_history SET created = :created "
+                    "WHERE note_id = :id AND version = :version"
+                ),
+                {
+                    "created": NOW - timedelta(days=5 - version),
+                    "id": note_id,
+                    "version": version,
+                },
+            )
+        await conn.execute(
+            text(
+                "UPDATE notes_history SET created = :created "
+                "WHERE note_id = :id AND version >= 5"
+            ),
+            {"created": NOW, "id": note_id},
+        )
+
+    session_factory = sessionmaker(
+        bind=test_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    policy = RetentionSettings(keep_last=2, keep_days=3, batch_size=1)
+    async with session_factory() as db:
+        counts = await compact_note(db, note_id, policy, NOW, dry_run=True)
+    assert counts == {"deleted": 3, "keyframes": 1, "compressed": 0}
+    assert len(await _history(async_client, auth_headers, note_id)) == 8
+
+    # DOC: Other tests' notes share the database, so counts are lower bounds
+    report = await apply_retention(session_factory, policy, now=NOW)
+    assert report["deleted"] >= 3
+    history = await _history(async_client, auth_headers, note_id)
+    assert [(h["title"], h["content"]) for h in history] == [
+        _revision(version) for version in (8, 7, 4, 3, 2)
+    ]
+
+
+async def _candidate_ids(test_engine, policy):
+    async with test_engine.connect() as conn:
+        result = await conn.execute(_candidates(policy, 0))
+        return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_incompressible_rows_are_checked_once(
+    async_client, auth_headers, test_engine
+):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=auth_headers,
+        json={"name": "Random", "color": "red"},
+    )
+    category_id = response.json()["id"]
+    response = await async_client.post(
+        "/api/notes/",
+        headers=auth_headers,
+        json={"title": "Key", "content": uuid.uuid4().hex,
+              "category_id": category_id},
+    )
+    note_id = response.json()["id"]
+    # DOC: Unrelated texts: the delta is not smaller than the old text
+    response = await async_client.put(
+        f"/api/notes/{note_id}",
+        headers=auth_headers,
+        json={"title": "Key", "content": uuid.uuid4().hex,
+              "category_id": category_id, "version": 1},
+    )
+    assert response.status_code == 200
+
+    policy = RetentionSettings(keep_last=50)
+    await _compress(test_engine, note_id)
+    assert note_id not in await _candidate_ids(test_engine, policy)
+    assert len(await _history(async_client, auth_headers, note_id)) == 1
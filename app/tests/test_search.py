@@ -0,0 +1,116 @@
+import pytest
+
+
+async def _create_note(async_client, headers, category_id, title, content):
+    response = await async_client.post(
+        "/api/notes/",
+        headers=headers,
+        json={"title": title, "content": content, "category_id": category_id},
+    )
+    return response.json()
+
+
+async def _search(async_client, headers, q, **params):
+    response = await async_client.get(
+        "/api/notes/search", headers=headers, params={"q": q, **params}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+async def _search_ids(async_client, headers, q):
+    page = await _search(async_client, headers, q)
+    return [note["id"] for note in page["items"]]
+
+
+@pytest.fixture
+async def category_id(async_client, auth_headers):
+    response = await async_client.post(
+        "/api/categories/",
+        headers=auth_headers,
+        json={"name": "Search", "color": "green"},
+    )
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_paginates(
+    async_client, auth_headers, category_id
+):
+    await _create_note(
+        async_client, auth_headers, category_id, "Groceries", "milk"
+    )
+    best = await _create_note(
+        async_client, auth_headers, category_id,
+        "Banana bread", "banana banana banana",
+    )
+    other = await _create_note(
+        async_client, auth_headers, category_id, "Shopping", "one banana"
+    )
+
+    page = await _search(async_client, auth_headers, "banana", limit=1)
+    assert [n["id"] for n in page["items"]] == [best["id"]]
+
+    page = await _search(
+        async_client, auth_headers, "banana",
+        limit=1, cursor=page["next_cursor"],
+    )
+    assert [n["id"] for n in page["items"]] == [other["id"]]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_search_index_follows_updates_and_deletes(
+    async_client, auth_headers, category_id
+):
+    note = await _create_note(
+        async_client, auth_headers, category_id, "Trip", "pack passport"
+    )
+    await async_client.put(
+        f"/api/notes/{note['id']}",
+        headers=auth_headers,
+        json={
+            "title": "Trip",
+            "content": "pack tickets",
+            "category_id": category_id,
+            "version": 1,
+        },
+    )
+    assert await _search_ids(async_client, auth_headers, "passport") == []
+    assert await _search_ids(async_client, auth_headers, "tickets") == [
+        note["id"]
+    ]
+
+    await async_client.delete(
+        f"/api/notes/{note['id']}", headers=auth_headers
+    )
+    assert await _search_ids(async_client, auth_headers, "tickets") == []
+
+
+@pytest.mark.asyncio
+async def test_search_is_scoped_to_user_and_tolerates_syntax(
+    async_client, auth_headers, category_id
+):
+    await _create_note(
+        async_client, auth_headers, category_id, "Private", "secretword"
+    )
+    other_user = await async_client.post(
+        "/api/auth/register",
+        json={
+            "document": "11223344",
+            "full_name": "Other User",
+            "email": "other-search@example.com",
+            "password": "password123",
+            "password_confirmation": "password123",
+        },
+    )
+    assert other_user.status_code == 200
+    login = await async_client.post(
+        "/api/auth/login",
+        json={"email": "other-search@example.com", "password": "password123"},
+    )
+    other_headers = {
+        "Authorization": f"Bearer {login.json()['access_token']}"
+    }
+    assert await _search_ids(async_client, other_headers, "secretword") == []
+    assert await _search_ids(async_client, auth_headers, 'secret" OR *') == []
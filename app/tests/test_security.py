@@ -0,0 +1,216 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from app.core.cache import MemoryBackend, TTLCache
+from app.core import security
+from app.core.security import (
+    create_access_token,
+    password_pool,
+    user_cache,
+)
+from app.core.workers import BoundedExecutor, PoolSaturated
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_current_user_is_served_from_cache(
+    async_client, auth_headers, test_engine
+):
+    user_cache.clear()
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        await async_client.get("/api/notes/", headers=auth_headers)
+        first = len(statements)
+        await async_client.get("/api/notes/", headers=auth_headers)
+        second = len(statements) - first
+    finally:
+        event.remove(
+            test_engine.sync_engine, "before_cursor_execute", _record
+        )
+
+    assert second == first - 1
+    assert not any("FROM users" in s for s in statements[first:])
+
+
+@pytest.mark.asyncio
+async def test_bounded_executor_rejects_when_saturated():
+    pool = BoundedExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        blocked = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda: None)
+        assert pool.stats()["rejected"] == 1
+        release.set()
+        assert await blocked is True
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_register_rejected_fast_when_hash_pool_saturated(
+    async_client, monkeypatch
+):
+    monkeypatch.setattr(password_pool, "max_pending", 0)
+    response = await async_client.post(
+        "/api/auth/register",
+        json={
+            "document": "99887766",
+            "full_name": "Busy User",
+            "email": "busy@example.com",
+            "password": "password123",
+            "password_confirmation": "password123",
+        },
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_stateless_mode_skips_the_users_table(
+    async_client, auth_headers, test_engine, monkeypatch
+):
+    monkeypatch.setattr(security, "AUTH_MODE", "stateless")
+    user_cache.clear()
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        response = await async_client.get(
+            "/api/notes/", headers=auth_headers
+        )
+    finally:
+        event.remove(
+            test_engine.sync_engine, "before_cursor_execute", _record
+        )
+    assert response.status_code == 200
+    assert statements
+    assert not any("FROM users" in s for s in statements)
+
+    # DOC: Tokens without the user id claim cannot be trusted alone
+    token = create_access_token({"sub": "legacy@example.com"})
+    response = await async_client.get(
+        "/api/notes/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("mode", ["database", "stateless"])
+@pytest.mark.asyncio
+async def test_logout_revokes_issued_tokens(
+    async_client, auth_headers, monkeypatch, mode
+):
+    monkeypatch.setattr(security, "AUTH_MODE", mode)
+    response = await async_client.post(
+        "/api/auth/logout", headers=auth_headers
+    )
+    assert response.status_code == 204
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token revoked"
+
+
+def test_token_denylist_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.security.time.time", lambda: now[0])
+    denylist = security.TokenDenylist(ttl=60)
+    assert not denylist.is_revoked(1, 990.0)
+    assert denylist.revoke(1) == 1000.0
+    assert denylist.is_revoked(1, 990.0)
+    assert denylist.is_revoked(1, None)
+    assert not denylist.is_revoked(1, 1000.0)
+    assert not denylist.is_revoked(2, 990.0)
+    # DOC: Every token issued before the revocation has expired by now
+    now[0] += 61
+    assert not denylist.is_revoked(1, 990.0)
+    denylist.revoke(2)
+    assert denylist.stats() == {"users": 1}
+
+
+def test_token_denylist_revokes_tokens_issued_after_an_expired_entry(
+    monkeypatch,
+):
+    now = [0.0]
+    monkeypatch.setattr("app.core.security.time.time", lambda: now[0])
+    denylist = security.TokenDenylist(ttl=3600)
+    denylist.revoke(1)
+    now[0] = 3000.0
+    issued_at = now[0]
+    assert not denylist.is_revoked(1, issued_at)
+    # DOC: The first entry has expired; the second revocation must still
+    # reject the token issued in between
+    now[0] = 4000.0
+    denylist.revoke(1)
+    assert denylist.is_revoked(1, issued_at)
+
+
+@pytest.mark.asyncio
+async def test_token_denylist_is_shared_through_its_backend():
+    # DOC: One backend object stands in for Redis shared by two workers
+    backend = MemoryBackend(maxsize=16, ttl=60)
+    worker, other = (
+        security.TokenDenylist(ttl=60, backend=backend) for _ in range(2)
+    )
+    issued_at = security.time.time() - 1
+    await worker.revoke_shared(1)
+    assert await other.is_revoked_shared(1, issued_at)
+    assert not await other.is_revoked_shared(1, issued_at + 60)
+    assert not await other.is_revoked_shared(2, issued_at)
+    # DOC: A process started after the revocation sees it too
+    restarted = security.TokenDenylist(ttl=60, backend=backend)
+    assert await restarted.is_revoked_shared(1, issued_at)
+
+
+@pytest.mark.asyncio
+async def test_database_mode_decodes_the_token_once(
+    async_client, auth_headers, monkeypatch
+):
+    monkeypatch.setattr(security, "AUTH_MODE", "database")
+    user_cache.clear()
+    calls = []
+    decode = security._decode_token
+
+    def _counting_decode(token):
+        calls.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(security, "_decode_token", _counting_decode)
+    response = await async_client.get("/api/notes/", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(calls) == 1
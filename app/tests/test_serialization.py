@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.core.serialization import ORJSONResponse
+from app.models import Category, Note, NoteHistory
+from app.schemes.notes import (
+    NoteExport,
+    NotePage,
+    dump_note_export,
+    dump_note_page,
+)
+from app.schemes.notesHistory import NoteHistoryPage, dump_note_history_page
+
+
+def _note(note_id: int, category: Category) -> Note:
+    note = Note(
+        id=note_id,
+        title=f"Note {note_id}",
+        content="Content",
+        created=datetime(2026, 10, 18, 12, 30, 15, 250),
+        version=3,
+        category_id=category.id,
+        user_id=1,
+    )
+    note.category = category
+    note.history_count = 2
+    note.history = [
+        NoteHistory(
+            id=note_id * 10 + version,
+            title="Old",
+            content=f"Content {version}",
+            created=datetime(2026, 10, 17),
+            version=version,
+            category_id=None if version == 1 else category.id,
+            note_id=note_id,
+        )
+        for version in (1, 2)
+    ]
+    return note
+
+
+def test_dumpers_match_pydantic_serialization():
+    category = Category(id=1, name="Work", color="blue")
+    notes = [_note(note_id, category) for note_id in (1, 2)]
+
+    page = {"items": notes, "next_cursor": "abc"}
+    adapter = TypeAdapter(NotePage)
+    expected = adapter.dump_json(
+        adapter.validate_python(page, from_attributes=True)
+    )
+    assert ORJSONResponse(dump_note_page(page)).body == expected
+
+    for note in notes:
+        line = NoteExport.model_validate(note, from_attributes=True)
+        assert orjson.dumps(dump_note_export(note)) == (
+            line.model_dump_json().encode()
+        )
+
+    history = notes[0].history
+    for row in history:
+        row.category = None if row.category_id is None else category
+    page = {"items": history, "next_cursor": None}
+    adapter = TypeAdapter(NoteHistoryPage)
+    assert orjson.dumps(dump_note_history_page(page)) == adapter.dump_json(
+        adapter.validate_python(page, from_attributes=True)
+    )
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from app import server
+from app.core.config import ServerSettings
+from app.server import Supervisor
+
+
+# DOC: Supervisor whose fork returns fake pids and whose waitpid replays
+# the given (pid, status) pairs, so the bookkeeping runs without processes
+@pytest.fixture
+def supervisor(monkeypatch):
+    pids = iter(range(101, 200))
+    exits = []
+    monkeypatch.setattr(server.os, "fork", lambda: next(pids))
+    monkeypatch.setattr(
+        server.os, "waitpid",
+        lambda pid, options: exits.pop(0) if exits else (0, 0),
+    )
+    supervisor = Supervisor(None, ServerSettings(workers=3))
+    supervisor.exits = exits
+    return supervisor
+
+
+def test_one_worker_runs_retention_and_its_replacement_inherits_it(
+    supervisor,
+):
+    for i in range(3):
+        supervisor._spawn(None, retention=i == 0)
+    assert supervisor.retention_pid == 101
+
+    supervisor.exits[:] = [(102, 1 << 8), (101, 1 << 8)]
+    supervisor._reap(None)
+    assert not supervisor.failed
+    assert sorted(supervisor.workers) == [103, 104, 105]
+    assert supervisor.retention_pid == 105
+
+
+def test_only_a_startup_failure_stops_the_server(supervisor):
+    supervisor._spawn(None, retention=True)
+    supervisor._spawn(None)
+
+    # DOC: A worker dying right after its start is still replaced
+    supervisor.exits[:] = [(101, 1 << 8)]
+    supervisor._reap(None)
+    assert not supervisor.failed
+    assert sorted(supervisor.workers) == [102, 103]
+
+    supervisor.exits[:] = [(102, server.STARTUP_FAILURE << 8)]
+    supervisor._reap(None)
+    assert supervisor.failed
+    assert supervisor.should_exit
+    assert supervisor.workers == {103}
+
+
+def test_memory_category_cache_is_disabled_with_several_workers(
+    monkeypatch,
+):
+    # DOC: tune_worker_env exports its settings; keep them in a copy
+    monkeypatch.setattr(os, "environ", dict(os.environ))
+    monkeypatch.delenv("CATEGORY_CACHE_URL", raising=False)
+    monkeypatch.delenv("CATEGORY_CACHE_TTL_SECONDS", raising=False)
+    tuned = server.tune_worker_env(ServerSettings(workers=1))
+    assert "CATEGORY_CACHE_TTL_SECONDS" not in tuned
+
+    tuned = server.tune_worker_env(ServerSettings(workers=4))
+    assert tuned["CATEGORY_CACHE_TTL_SECONDS"] == "0"
+
+    monkeypatch.setenv("CATEGORY_CACHE_URL", "redis://cache/0")
+    tuned = server.tune_worker_env(ServerSettings(workers=4))
+    assert "CATEGORY_CACHE_TTL_SECONDS" not in tuned
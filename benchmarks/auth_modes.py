@@ -0,0 +1,77 @@
+"""
+Authenticated request throughput on GET /api/notes/ for each AUTH_MODE.
+
+"database" is measured with a cold user cache (cleared before every
+request) and a warm one; "stateless" resolves the principal from the
+token claims and never reads the users table.
+
+    python -m benchmarks.auth_modes --requests 300
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import (
+    QueryCounter,
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+)
+from app.core import security
+
+MODES = (
+    ("database_uncached", "database", False),
+    ("database_cached", "database", True),
+    ("stateless", "stateless", True),
+)
+
+
+async def run(requests: int, notes: int) -> dict:
+    report = {}
+    default = security.AUTH_MODE
+    async with bench_client() as (client, engine):
+        headers = await register_user(client)
+        await seed_notes(client, headers, notes)
+        try:
+            for label, mode, cached in MODES:
+                security.AUTH_MODE = mode
+                security.user_cache.clear()
+                samples, statuses = [], {}
+                with QueryCounter(engine) as counter:
+                    start = time.perf_counter()
+                    for _ in range(requests):
+                        if not cached:
+                            security.user_cache.clear()
+                        t0 = time.perf_counter()
+                        response = await client.get(
+                            "/api/notes/", headers=headers
+                        )
+                        samples.append(time.perf_counter() - t0)
+                        status = str(response.status_code)
+                        statuses[status] = statuses.get(status, 0) + 1
+                    elapsed = time.perf_counter() - start
+                report[label] = {
+                    **summarize(samples, elapsed),
+                    "statuses": statuses,
+                    "queries_per_request": round(counter.count / requests, 2),
+                    "user_queries": sum(
+                        "FROM users" in s for s in counter.statements
+                    ),
+                }
+        finally:
+            security.AUTH_MODE = default
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--notes", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.notes)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Cold start of the application for each DB_SCHEMA_MODE.
+
+- import_ms: time to import app.main in a fresh interpreter;
+- time_to_ready_ms: from spawning --workers uvicorn processes together
+  until each one answers GET /metrics, i.e. past the lifespan startup;
+- first_request_ms / second_request_ms: GET /api/notes/ on each worker
+  right after it is ready, then again warm;
+- schema_step_ms: the schema step of the lifespan alone, in process, on
+  a database that is already up to date (the cost paid on every restart).
+
+"create" runs create_all on an empty SQLite file from every worker at
+once; "check" starts on a database already upgraded with Alembic and only
+reads its revision. Requests use stateless tokens, so no user needs to be
+seeded before the workers come up.
+
+    python -m benchmarks.cold_start --workers 4 --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import benchmarks.common  # noqa: F401
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.security import create_access_token
+from app.db.migrations import prepare_schema, upgrade_schema
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def _env(database_url: str, mode: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "DB_SCHEMA_MODE": mode,
+        "AUTH_MODE": "stateless",
+        "HISTORY_RETENTION_INTERVAL_SECONDS": "0",
+    }
+
+
+def _import_ms(rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            env=_env("sqlite+aiosqlite:///:memory:", "check"),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return round(statistics.median(samples) * 1000, 1)
+
+
+def _wait_ready(client, url, process, start, timeout):
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            return None
+        try:
+            if client.get(f"{url}/metrics").status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def _timed_get(client, url, headers):
+    t0 = time.perf_counter()
+    response = client.get(f"{url}/api/notes/", headers=headers)
+    return time.perf_counter() - t0, response.status_code
+
+
+def _start_workers(mode, database_url, workers, base_port, timeout):
+    headers = {"Authorization": "Bearer " + create_access_token(
+        {"sub": "cold@example.com", "uid": 1, "name": "Cold"}
+    )}
+    start = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(base_port + i), "--log-level", "warning"],
+            env=_env(database_url, mode),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for i in range(workers)
+    ]
+    ready, first, second, statuses = [], [], [], {}
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            for i, process in enumerate(processes):
+                url = f"http://127.0.0.1:{base_port + i}"
+                elapsed = _wait_ready(client, url, process, start, timeout)
+                if elapsed is None:
+                    statuses["failed_start"] = (
+                        statuses.get("failed_start", 0) + 1
+                    )
+                    continue
+                ready.append(elapsed)
+                for samples in (first, second):
+                    latency, status = _timed_get(client, url, headers)
+                    samples.append(latency)
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    return ready, first, second, statuses
+
+
+def _ms(samples, func):
+    return round(func(samples) * 1000, 1) if samples else None
+
+
+async def _upgraded(database_url: str) -> None:
+    engine = create_async_engine(database_url)
+    try:
+        await upgrade_schema(engine)
+    finally:
+        await engine.dispose()
+
+
+async def _schema_step_ms(mode: str, rounds: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite+aiosqlite:///{Path(tmp) / 'step.db'}"
+        await _upgraded(database_url)
+        engine = create_async_engine(database_url)
+        try:
+            await prepare_schema(engine, mode)
+            samples = []
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                await prepare_schema(engine, mode)
+                samples.append(time.perf_counter() - t0)
+        finally:
+            await engine.dispose()
+    return _ms(samples, statistics.median)
+
+
+def run(workers: int, rounds: int, base_port: int, timeout: float) -> dict:
+    report = {"workers": workers, "import_ms": _import_ms(rounds)}
+    for mode in ("create", "check"):
+        ready, first, second, statuses = [], [], [], {}
+        for _ in range(rounds):
+            with tempfile.TemporaryDirectory() as tmp:
+                database_url = f"sqlite+aiosqlite:///{Path(tmp) / 'cold.db'}"
+                if mode == "check":
+                    asyncio.run(_upgraded(database_url))
+                r, f, s, st = _start_workers(
+                    mode, database_url, workers, base_port, timeout
+                )
+            ready += r
+            first += f
+            second += s
+            for status, count in st.items():
+                statuses[status] = statuses.get(status, 0) + count
+        report[mode] = {
+            "schema_step_ms": asyncio.run(_schema_step_ms(mode, 20)),
+            "time_to_ready_ms": _ms(ready, statistics.median),
+            "time_to_all_ready_ms": _ms(ready, max),
+            "first_request_ms": _ms(first, statistics.median),
+            "second_request_ms": _ms(second, statistics.median),
+            "statuses": statuses,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=8750)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    print(json.dumps(
+        run(args.workers, args.rounds, args.base_port, args.timeout),
+        indent=2,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run the real application against an in-memory SQLite database
+through the ASGI transport, so they need no running server or Postgres.
+"""
+import os
+import statistics
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from httpx import AsyncClient  # noqa: E402
+from httpx._transports.asgi import ASGITransport  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.metrics import instrument_engine  # noqa: E402
+from app.db.database import enable_foreign_keys, get_db  # noqa: E402
+from app.db.queries import QueryCounter  # noqa: E402,F401
+from app.main import app  # noqa: E402
+from app.models import Base  # noqa: E402
+
+BENCH_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+BENCH_PASSWORD = "password123"
+
+
+# DOC: Application wired to a fresh in-memory database
+@asynccontextmanager
+async def bench_client(database_url: str = BENCH_DATABASE_URL, **engine_kw):
+    engine = create_async_engine(database_url, **engine_kw)
+    enable_foreign_keys(engine)
+    instrument_engine(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def _get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _get_db
+    transport = ASGITransport(app=app)
+    try:
+        async with AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            yield client, engine
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await engine.dispose()
+
+
+# DOC: Registers a new user and returns its Authorization header
+async def register_user(client, password: str = BENCH_PASSWORD) -> dict:
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    await client.post(
+        "/api/auth/register",
+        json={
+            "document": str(uuid.uuid4().int)[:12],
+            "full_name": "Bench User",
+            "email": email,
+            "password": password,
+            "password_confirmation": password,
+        },
+    )
+    response = await client.post(
+        "/api/auth/login", json={"email": email, "password": password}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+# DOC: Creates a category and `count` notes for the given user
+async def seed_notes(client, headers: dict, count: int) -> int:
+    response = await client.post(
+        "/api/categories/",
+        headers=headers,
+        json={"name": "bench", "color": "blue"},
+    )
+    category_id = response.json()["id"]
+    for i in range(count):
+        await client.post(
+            "/api/notes/",
+            headers=headers,
+            json={
+                "title": f"Note {i}",
+                "content": "Benchmark content",
+                "category_id": category_id,
+            },
+        )
+    return category_id
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# DOC: Latency summary in milliseconds
+def summarize(samples, elapsed: float) -> dict:
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+# DOC: Sends `n` sequential requests and returns the latency samples
+async def timed_requests(client, method: str, url: str, n: int, **kw):
+    samples = []
+    start = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await client.request(method, url, **kw)
+        samples.append(time.perf_counter() - t0)
+    return samples, time.perf_counter() - start
@@ -0,0 +1,74 @@
+"""
+Compare two benchmark reports written by benchmarks.run.
+
+Prints the relative change of every metric per scenario and exits with
+status 1 when a latency percentile, throughput or query count regresses
+by more than --threshold percent.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# DOC: Metric name and whether a higher value is better
+METRICS = (
+    ("throughput_rps", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("queries_per_request", False),
+)
+
+
+def _change(before: float, after: float) -> float:
+    if not before:
+        return 0.0 if not after else float("inf")
+    return (after - before) / before * 100
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    rows, regressions = [], []
+    for name, before in sorted(baseline["scenarios"].items()):
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            change = _change(before[metric], after[metric])
+            worse = -change if higher_is_better else change
+            # DOC: Query counts are exact, so any increase is a regression
+            limit = 0 if metric == "queries_per_request" else threshold
+            flag = worse > limit
+            rows.append((name, metric, before[metric], after[metric],
+                         change, flag))
+            if flag:
+                regressions.append((name, metric))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{'scenario':<20} {'metric':<20} {'before':>10} {'after':>10}"
+          f" {'change':>9}")
+    for name, metric, before, after, change, flag in rows:
+        marker = "  <-- regression" if flag else ""
+        print(f"{name:<20} {metric:<20} {before:>10} {after:>10}"
+              f" {change:>+8.1f}%{marker}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above "
+              f"{args.threshold}%", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
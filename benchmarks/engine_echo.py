@@ -0,0 +1,59 @@
+"""
+Throughput of GET /api/notes/ with SQL echo on and off.
+
+Echoed statements are written to a discarded stream, so the numbers show
+the cost of formatting and emitting the log records rather than of the
+terminal.
+
+    python -m benchmarks.engine_echo --requests 300
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+
+from benchmarks.common import (
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+    timed_requests,
+)
+
+
+async def _measure(echo: bool, requests: int, notes: int) -> dict:
+    async with bench_client(echo=echo) as (client, engine):
+        headers = await register_user(client)
+        await seed_notes(client, headers, notes)
+        samples, elapsed = await timed_requests(
+            client, "GET", "/api/notes/", requests, headers=headers
+        )
+        return summarize(samples, elapsed)
+
+
+async def run(requests: int, notes: int) -> dict:
+    report = {}
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            for echo in (False, True):
+                label = "echo_on" if echo else "echo_off"
+                report[label] = await _measure(echo, requests, notes)
+    report["speedup"] = round(
+        report["echo_off"]["throughput_rps"]
+        / report["echo_on"]["throughput_rps"],
+        2,
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--notes", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.notes)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
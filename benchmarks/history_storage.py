@@ -0,0 +1,121 @@
+"""
+Storage size and read latency of note history, stored in full
+(keyframe interval 1) and as reverse deltas.
+
+Each note is edited --revisions times, changing a few words per edit the
+way a user would. The report gives the bytes held by notes_history and
+the latency of GET /api/notes/{id}/history pages, which rebuild each
+revision from the deltas.
+
+    python -m benchmarks.history_storage --notes 20 --revisions 30
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from benchmarks.common import (
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+    timed_requests,
+)
+from sqlalchemy import text
+
+from app.services import historyStorage
+
+WORDS = (
+    "review roadmap release incident owner budget quarter customer design "
+    "deadline backlog meeting draft summary metric launch"
+).split()
+
+
+def _edit(content: str, rng: random.Random) -> str:
+    words = content.split()
+    for _ in range(2):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)[:200]
+
+
+async def _measure(interval: int, notes: int, revisions: int,
+                   requests: int) -> dict:
+    historyStorage.HISTORY_KEYFRAME_INTERVAL = interval
+    rng = random.Random(0)
+    async with bench_client() as (client, engine):
+        headers = await register_user(client)
+        category_id = await seed_notes(client, headers, 0)
+        note_ids = []
+        for i in range(notes):
+            content = " ".join(rng.choice(WORDS) for _ in range(28))[:200]
+            response = await client.post(
+                "/api/notes/",
+                headers=headers,
+                json={"title": f"Note {i}", "content": content,
+                      "category_id": category_id},
+            )
+            note_ids.append(response.json()["id"])
+            for version in range(1, revisions + 1):
+                content = _edit(content, rng)
+                await client.put(
+                    f"/api/notes/{note_ids[-1]}",
+                    headers=headers,
+                    json={"title": f"Note {i}", "content": content,
+                          "category_id": category_id, "version": version},
+                )
+
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT COUNT(*), "
+                "SUM(COALESCE(LENGTH(title), 0) + COALESCE(LENGTH(content), 0)"
+                " + COALESCE(LENGTH(delta), 0)), "
+                "SUM(CASE WHEN delta IS NULL THEN 1 ELSE 0 END) "
+                "FROM notes_history"
+            ))
+            rows, size, keyframes = result.one()
+
+        samples, elapsed = await timed_requests(
+            client, "GET", f"/api/notes/{note_ids[0]}/history", requests,
+            headers=headers, params={"limit": revisions},
+        )
+        return {
+            "rows": rows,
+            "keyframes": keyframes,
+            "stored_bytes": size,
+            "bytes_per_row": round(size / rows, 1),
+            "history_page": summarize(samples, elapsed),
+        }
+
+
+async def run(notes: int, revisions: int, interval: int,
+              requests: int) -> dict:
+    default = historyStorage.HISTORY_KEYFRAME_INTERVAL
+    try:
+        full = await _measure(1, notes, revisions, requests)
+        delta = await _measure(interval, notes, revisions, requests)
+    finally:
+        historyStorage.HISTORY_KEYFRAME_INTERVAL = default
+    return {
+        "full": full,
+        f"delta_keyframe_{interval}": delta,
+        "size_ratio": round(delta["stored_bytes"] / full["stored_bytes"], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=20)
+    parser.add_argument("--revisions", type=int, default=30)
+    parser.add_argument(
+        "--interval", type=int,
+        default=historyStorage.HISTORY_KEYFRAME_INTERVAL,
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(
+        args.notes, args.revisions, args.interval, args.requests
+    )), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Latency of GET /api/notes/ while /api/auth/login is flooded.
+
+Runs three scenarios: no flood, a flood with bcrypt in the worker pool, and
+a flood with bcrypt executed inline on the event loop (the old behaviour).
+
+    python -m benchmarks.login_flood --requests 50 --flooders 8
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import (
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+)
+from app.core.security import password_pool
+
+
+async def _inline_run(func, *args):
+    return func(*args)
+
+
+async def _flood(client, stop: asyncio.Event, counts: dict):
+    while not stop.is_set():
+        response = await client.post(
+            "/api/auth/login",
+            json={"email": "flood@example.com", "password": "password123"},
+        )
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def _scenario(client, headers, requests, flooders, inline):
+    original_run = password_pool.run
+    if inline:
+        password_pool.run = _inline_run
+    stop = asyncio.Event()
+    counts = {}
+    tasks = [
+        asyncio.create_task(_flood(client, stop, counts))
+        for _ in range(flooders)
+    ]
+    try:
+        samples = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            await client.get("/api/notes/", headers=headers)
+            samples.append(time.perf_counter() - t0)
+            # DOC: Give the flood a chance to run between reads
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+        password_pool.run = original_run
+    return {**summarize(samples, elapsed), "login_statuses": counts}
+
+
+async def run(requests: int, flooders: int, notes: int) -> dict:
+    async with bench_client() as (client, engine):
+        headers = await register_user(client)
+        await seed_notes(client, headers, notes)
+        await client.post(
+            "/api/auth/register",
+            json={
+                "document": "555000111",
+                "full_name": "Flood User",
+                "email": "flood@example.com",
+                "password": "password123",
+                "password_confirmation": "password123",
+            },
+        )
+        return {
+            "idle": await _scenario(client, headers, requests, 0, False),
+            "flood_pool": await _scenario(
+                client, headers, requests, flooders, False
+            ),
+            "flood_inline": await _scenario(
+                client, headers, requests, flooders, True
+            ),
+            "pool": password_pool.stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--flooders", type=int, default=8)
+    parser.add_argument("--notes", type=int, default=20)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.requests, args.flooders, args.notes))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Latency and SQL statements of DELETE /api/notes/{id} for notes with a long
+history, and of DELETE /api/categories/{id} for a category holding such
+notes.
+
+History rows are inserted directly (--revisions per note), so seeding
+stays fast even for thousands of revisions.
+
+    python -m benchmarks.note_delete --notes 50 --revisions 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from benchmarks.common import (
+    QueryCounter,
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+)
+from sqlalchemy import text
+
+
+async def _seed_history(engine, note_ids: list, category_id: int,
+                        revisions: int) -> None:
+    now = datetime.now()
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO notes_history (note_id, title, content, "
+                "created, version, category_id) VALUES (:note_id, :title, "
+                ":content, :created, :version, :category_id)"
+            ),
+            [
+                {
+                    "note_id": note_id,
+                    "title": f"Note {note_id}",
+                    "content": f"Benchmark content, revision {version}",
+                    "created": now,
+                    "version": version,
+                    "category_id": category_id,
+                }
+                for note_id in note_ids
+                for version in range(1, revisions + 1)
+            ],
+        )
+
+
+async def _notes(client, headers, category_id: int, count: int) -> list:
+    note_ids = []
+    for i in range(count):
+        response = await client.post(
+            "/api/notes/",
+            headers=headers,
+            json={"title": f"Note {i}", "content": "Benchmark content",
+                  "category_id": category_id},
+        )
+        note_ids.append(response.json()["id"])
+    return note_ids
+
+
+async def run(notes: int, revisions: int) -> dict:
+    async with bench_client() as (client, engine):
+        headers = await register_user(client)
+        category_id = await seed_notes(client, headers, 0)
+        note_ids = await _notes(client, headers, category_id, notes)
+        await _seed_history(engine, note_ids, category_id, revisions)
+
+        samples, statuses, queries = [], {}, 0
+        start = time.perf_counter()
+        for note_id in note_ids:
+            with QueryCounter(engine) as counter:
+                t0 = time.perf_counter()
+                response = await client.delete(
+                    f"/api/notes/{note_id}", headers=headers
+                )
+                samples.append(time.perf_counter() - t0)
+            queries += counter.count
+            status = str(response.status_code)
+            statuses[status] = statuses.get(status, 0) + 1
+        note_report = summarize(samples, time.perf_counter() - start)
+        note_report.update(
+            statuses=statuses,
+            queries_per_request=round(queries / len(note_ids), 2),
+        )
+
+        category_id = await seed_notes(client, headers, 0)
+        note_ids = await _notes(client, headers, category_id, notes)
+        await _seed_history(engine, note_ids, category_id, revisions)
+        with QueryCounter(engine) as counter:
+            t0 = time.perf_counter()
+            response = await client.delete(
+                f"/api/categories/{category_id}", headers=headers
+            )
+            elapsed = time.perf_counter() - t0
+        async with engine.connect() as conn:
+            left = (await conn.execute(
+                text("SELECT COUNT(*) FROM notes WHERE category_id = :id"),
+                {"id": category_id},
+            )).scalar_one()
+        return {
+            "revisions_per_note": revisions,
+            "delete_note": note_report,
+            "delete_category": {
+                "notes": notes,
+                "status": response.status_code,
+                "ms": round(elapsed * 1000, 3),
+                "queries": counter.count,
+                "notes_left": left,
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--revisions", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps(
+        asyncio.run(run(args.notes, args.revisions)), indent=2
+    ))
+
+
+if __name__ == "__main__":
+    main()
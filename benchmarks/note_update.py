@@ -0,0 +1,136 @@
+"""
+Round trips and latency of PUT /api/notes/{id}, and its behaviour under
+parallel writers.
+
+The sequential part edits one note per request and reports the SQL
+statements issued per update (the user cache is warm, so they are all
+spent on the update itself). The parallel part sends --writers updates
+of the same note with the same version at once: exactly one must win,
+the others must get 409, and only the winner may leave a history row.
+
+Parallel writers need a database with real concurrency, so a temporary
+SQLite file is used unless --database-url is given.
+
+    python -m benchmarks.note_update --requests 200 --writers 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import (
+    QueryCounter,
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+)
+from sqlalchemy import text
+
+
+async def _notes(client, headers) -> list:
+    response = await client.get(
+        "/api/notes/", headers=headers, params={"limit": 100}
+    )
+    return response.json()["items"]
+
+
+async def _sequential(client, engine, requests: int) -> dict:
+    headers = await register_user(client)
+    category_id = await seed_notes(client, headers, min(requests, 100))
+    notes = await _notes(client, headers)
+    samples = []
+    with QueryCounter(engine) as counter:
+        start = time.perf_counter()
+        for i in range(requests):
+            note = notes[i % len(notes)]
+            t0 = time.perf_counter()
+            response = await client.put(
+                f"/api/notes/{note['id']}",
+                headers=headers,
+                json={"title": "bench", "content": f"edit {i}",
+                      "category_id": category_id,
+                      "version": note["version"]},
+            )
+            samples.append(time.perf_counter() - t0)
+            note["version"] = response.json()["version"]
+        elapsed = time.perf_counter() - start
+    return {
+        **summarize(samples, elapsed),
+        "queries_per_request": round(counter.count / requests, 2),
+    }
+
+
+async def _parallel(client, engine, writers: int, rounds: int) -> dict:
+    headers = await register_user(client)
+    category_id = await seed_notes(client, headers, 1)
+    note = (await _notes(client, headers))[0]
+    statuses = {}
+    for version in range(1, rounds + 1):
+        responses = await asyncio.gather(*(
+            client.put(
+                f"/api/notes/{note['id']}",
+                headers=headers,
+                json={"title": "bench", "content": f"writer {w}",
+                      "category_id": category_id, "version": version},
+            )
+            for w in range(writers)
+        ))
+        for response in responses:
+            statuses[response.status_code] = (
+                statuses.get(response.status_code, 0) + 1
+            )
+    async with engine.connect() as conn:
+        history_rows = (await conn.execute(
+            text("SELECT COUNT(*) FROM notes_history WHERE note_id = :id"),
+            {"id": note["id"]},
+        )).scalar_one()
+    final = (await _notes(client, headers))[0]
+    return {
+        "writers": writers,
+        "rounds": rounds,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "final_version": final["version"],
+        "history_rows": history_rows,
+        # DOC: One winner per round, and one history row per winner
+        "consistent": (
+            statuses.get(200, 0) == rounds
+            and final["version"] == rounds + 1
+            and history_rows == rounds
+        ),
+    }
+
+
+async def run(database_url: str, requests: int, writers: int,
+              rounds: int) -> dict:
+    async with bench_client(database_url) as (client, engine):
+        return {
+            "sequential": await _sequential(client, engine, requests),
+            "parallel": await _parallel(client, engine, writers, rounds),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--database-url")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or (
+            "sqlite+aiosqlite:///" + os.path.join(tmp, "update.db")
+        )
+        report = asyncio.run(
+            run(database_url, args.requests, args.writers, args.rounds)
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
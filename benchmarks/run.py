@@ -0,0 +1,348 @@
+"""
+Benchmark every API route against a seeded database.
+
+By default the app runs in-process through the ASGI transport on the
+database given by --database-url (seed it first with benchmarks.seed).
+With --base-url the same scenarios are sent over HTTP to a running
+server, e.g. a local uvicorn started on the seeded database.
+
+Queries per request come from the server's own /metrics endpoint, so
+they are reported in both modes. Results are written as JSON, and two
+runs can be compared with benchmarks.compare.
+
+    python -m benchmarks.seed --database-url sqlite+aiosqlite:///bench.db
+    python -m benchmarks.run --database-url sqlite+aiosqlite:///bench.db \\
+        --requests 200 --concurrency 8 --output results.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import subprocess
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from benchmarks.common import BENCH_PASSWORD, bench_client, summarize
+from benchmarks.seed import user_email
+from httpx import AsyncClient
+
+
+# DOC: A named request pattern; setup prepares per-scenario state and
+# request builds the i-th request as (method, url, kwargs)
+@dataclass
+class Scenario:
+    name: str
+    request: Callable[[dict, int], tuple]
+    setup: Optional[Callable[["Context"], Awaitable[dict]]] = None
+
+
+@dataclass
+class Context:
+    client: AsyncClient
+    users: list
+    requests: int
+
+    def headers(self, i: int) -> dict:
+        return self.users[i % len(self.users)]["headers"]
+
+    def user(self, i: int) -> dict:
+        return self.users[i % len(self.users)]
+
+
+async def _login(client, index: int) -> dict:
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": user_email(index), "password": BENCH_PASSWORD},
+    )
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    notes = await client.get(
+        "/api/notes/", headers=headers, params={"limit": 100}
+    )
+    categories = await client.get("/api/categories/", headers=headers)
+    return {
+        "index": index,
+        "headers": headers,
+        "notes": notes.json()["items"],
+        "categories": categories.json(),
+    }
+
+
+async def _create_notes(ctx: Context, count: int, edits: int = 0) -> list:
+    created = []
+    for i in range(count):
+        user = ctx.user(i)
+        category_id = user["categories"][0]["id"]
+        response = await ctx.client.post(
+            "/api/notes/",
+            headers=user["headers"],
+            json={"title": "bench", "content": "bench note",
+                  "category_id": category_id},
+        )
+        note = response.json()
+        for version in range(1, edits + 1):
+            response = await ctx.client.put(
+                f"/api/notes/{note['id']}",
+                headers=user["headers"],
+                json={"title": "bench", "content": f"edit {version}",
+                      "category_id": category_id, "version": version},
+            )
+        created.append((user, response.json()))
+    return created
+
+
+async def _setup_notes(ctx: Context) -> dict:
+    return {"notes": await _create_notes(ctx, ctx.requests)}
+
+
+# DOC: Each request edits its own note, so concurrent workers never race
+# on the same version
+def _update_request(state: dict, i: int) -> tuple:
+    user, note = state["notes"][i]
+    return "PUT", f"/api/notes/{note['id']}", {
+        "headers": user["headers"],
+        "json": {"title": "bench", "content": f"update {i}",
+                 "category_id": user["categories"][0]["id"],
+                 "version": note["version"]},
+    }
+
+
+async def _setup_history(ctx: Context) -> dict:
+    notes = await _create_notes(ctx, ctx.requests, edits=1)
+    history = []
+    for user, note in notes:
+        response = await ctx.client.get(
+            f"/api/notes/{note['id']}/history", headers=user["headers"]
+        )
+        history.append((user, response.json()["items"][0]["id"]))
+    return {"history": history}
+
+
+async def _setup_categories(ctx: Context) -> dict:
+    created = []
+    for i in range(ctx.requests):
+        user = ctx.user(i)
+        response = await ctx.client.post(
+            "/api/categories/",
+            headers=user["headers"],
+            json={"name": "bench", "color": "red"},
+        )
+        created.append((user, response.json()["id"]))
+    return {"categories": created}
+
+
+def build_scenarios(ctx: Context) -> list:
+    def note_url(suffix=""):
+        def _request(state, i):
+            user = ctx.user(i)
+            note = user["notes"][i % len(user["notes"])]
+            return "GET", f"/api/notes/{note['id']}{suffix}", {
+                "headers": user["headers"]
+            }
+        return _request
+
+    return [
+        Scenario("auth.login", lambda s, i: ("POST", "/api/auth/login", {
+            "json": {"email": user_email(ctx.user(i)["index"]),
+                     "password": BENCH_PASSWORD},
+        })),
+        Scenario("auth.register", lambda s, i: (
+            "POST", "/api/auth/register", {"json": {
+                "document": str(uuid.uuid4().int)[:12],
+                "full_name": "Bench",
+                "email": f"{uuid.uuid4().hex[:16]}@example.com",
+                "password": BENCH_PASSWORD,
+                "password_confirmation": BENCH_PASSWORD,
+            }})),
+        Scenario("notes.list", lambda s, i: ("GET", "/api/notes/", {
+            "headers": ctx.headers(i)
+        })),
+        Scenario("notes.read", note_url()),
+        Scenario("notes.history", note_url("/history")),
+        Scenario("notes.search", lambda s, i: ("GET", "/api/notes/search", {
+            "headers": ctx.headers(i), "params": {"q": "note"},
+        })),
+        Scenario("notes.export", lambda s, i: ("GET", "/api/notes/export", {
+            "headers": ctx.headers(i)
+        })),
+        Scenario("notes.create", lambda s, i: ("POST", "/api/notes/", {
+            "headers": ctx.headers(i),
+            "json": {"title": "bench", "content": "bench",
+                     "category_id": ctx.user(i)["categories"][0]["id"]},
+        })),
+        Scenario("notes.update", _update_request, _setup_notes),
+        Scenario("notes.delete", lambda s, i: (
+            "DELETE", f"/api/notes/{s['notes'][i][1]['id']}",
+            {"headers": s["notes"][i][0]["headers"]},
+        ), _setup_notes),
+        Scenario("notes.batch", lambda s, i: ("POST", "/api/notes/batch", {
+            "headers": ctx.headers(i),
+            "json": {"operations": [
+                {"op": "create", "title": "batch", "content": "batch",
+                 "category_id": ctx.user(i)["categories"][0]["id"]}
+                for _ in range(10)
+            ]},
+        })),
+        Scenario("notes.import", lambda s, i: ("POST", "/api/notes/import", {
+            "headers": ctx.headers(i),
+            "content": "\n".join(
+                json.dumps({"title": "import", "content": "bench",
+                            "category": {"name": "imported"}})
+                for _ in range(100)
+            ).encode(),
+        })),
+        Scenario("categories.list", lambda s, i: (
+            "GET", "/api/categories/", {"headers": ctx.headers(i)}
+        )),
+        Scenario("categories.read", lambda s, i: (
+            "GET", f"/api/categories/{ctx.user(i)['categories'][0]['id']}",
+            {"headers": ctx.headers(i)},
+        )),
+        Scenario("categories.create", lambda s, i: (
+            "POST", "/api/categories/", {
+                "headers": ctx.headers(i),
+                "json": {"name": "bench", "color": "red"},
+            })),
+        Scenario("categories.update", lambda s, i: (
+            "PUT", f"/api/categories/{s['categories'][i][1]}", {
+                "headers": s["categories"][i][0]["headers"],
+                "json": {"name": "renamed", "color": "red"},
+            }), _setup_categories),
+        Scenario("categories.delete", lambda s, i: (
+            "DELETE", f"/api/categories/{s['categories'][i][1]}",
+            {"headers": s["categories"][i][0]["headers"]},
+        ), _setup_categories),
+        Scenario("history.restore", lambda s, i: (
+            "PUT", f"/api/notes-history/restore/{s['history'][i][1]}",
+            {"headers": s["history"][i][0]["headers"]},
+        ), _setup_history),
+        Scenario("history.delete", lambda s, i: (
+            "DELETE", f"/api/notes-history/{s['history'][i][1]}",
+            {"headers": s["history"][i][0]["headers"]},
+        ), _setup_history),
+    ]
+
+
+async def _total_queries(client) -> float:
+    response = await client.get("/metrics")
+    return sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in response.text.splitlines()
+        if line.startswith("db_queries_per_request_sum")
+    )
+
+
+async def run_scenario(ctx: Context, scenario: Scenario,
+                       concurrency: int) -> dict:
+    state = await scenario.setup(ctx) if scenario.setup else {}
+    counter = itertools.count()
+    samples = []
+    statuses: Dict[int, int] = {}
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= ctx.requests:
+                return
+            method, url, kwargs = scenario.request(state, i)
+            t0 = time.perf_counter()
+            response = await ctx.client.request(method, url, **kwargs)
+            samples.append(time.perf_counter() - t0)
+            statuses[response.status_code] = (
+                statuses.get(response.status_code, 0) + 1
+            )
+
+    queries_before = await _total_queries(ctx.client)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    queries = await _total_queries(ctx.client) - queries_before
+    return {
+        **summarize(samples, elapsed),
+        "queries_per_request": round(queries / max(1, len(samples)), 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+@asynccontextmanager
+async def _client(database_url: str, base_url: Optional[str]):
+    if base_url:
+        async with AsyncClient(base_url=base_url, timeout=60) as client:
+            yield client
+    else:
+        async with bench_client(database_url) as (client, _):
+            yield client
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(database_url: str, base_url: Optional[str], requests: int,
+              concurrency: int, users: int, only: Optional[list]) -> dict:
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "target": base_url or database_url,
+            "requests": requests,
+            "concurrency": concurrency,
+            "users": users,
+        },
+        "scenarios": {},
+    }
+    async with _client(database_url, base_url) as client:
+        logged_in = [await _login(client, i) for i in range(users)]
+        ctx = Context(client=client, users=logged_in, requests=requests)
+        for scenario in build_scenarios(ctx):
+            if only and scenario.name not in only:
+                continue
+            report["scenarios"][scenario.name] = await run_scenario(
+                ctx, scenario, concurrency
+            )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--database-url", default="sqlite+aiosqlite:///bench.db"
+    )
+    parser.add_argument("--base-url", help="benchmark a running server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--users", type=int, default=10,
+        help="seeded users the requests are spread over",
+    )
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+    report = asyncio.run(run(
+        args.database_url, args.base_url, args.requests, args.concurrency,
+        args.users, args.only,
+    ))
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    print(body)
+
+
+if __name__ == "__main__":
+    main()
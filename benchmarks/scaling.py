@@ -0,0 +1,172 @@
+"""
+Throughput of the production launcher (app.server) from 1 to N workers.
+
+A SQLite file is migrated and seeded with --notes notes. Then, for each
+worker count, the launcher is started, GET /api/notes/ is hammered by
+--concurrency clients for --duration seconds, and the launcher is stopped
+with SIGTERM. Requests use stateless tokens, so every request is one page
+query. The load generator runs on the same machine and takes a core of
+its own: on a box with C cores, expect scaling to flatten before C workers.
+
+    python -m benchmarks.scaling --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import benchmarks.common  # noqa: F401
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.security import create_access_token
+from app.db.migrations import upgrade_schema
+from app.models import Category, Note, User
+from benchmarks.common import summarize
+
+
+async def _seed(database_url: str, notes: int) -> dict:
+    engine = create_async_engine(database_url)
+    try:
+        await upgrade_schema(engine)
+        async with AsyncSession(engine) as session:
+            user = User(
+                document="100000000001",
+                full_name="Scaling User",
+                email="scaling@example.com",
+                password="unused",
+            )
+            session.add(user)
+            await session.flush()
+            category = Category(name="bench", color="blue", user_id=user.id)
+            session.add(category)
+            await session.flush()
+            session.add_all(
+                Note(
+                    title=f"Note {i}",
+                    content="Benchmark content",
+                    user_id=user.id,
+                    category_id=category.id,
+                    created=datetime.now(),
+                )
+                for i in range(notes)
+            )
+            claims = {
+                "sub": user.email, "uid": user.id, "name": user.full_name,
+            }
+            await session.commit()
+    finally:
+        await engine.dispose()
+    return {"Authorization": f"Bearer {create_access_token(claims)}"}
+
+
+async def _wait_ready(client, url, process, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if (await client.get(f"{url}/metrics")).status_code == 200:
+                return True
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def _load(url, headers, concurrency, duration):
+    samples, statuses = [], {}
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def _client():
+            while time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                try:
+                    response = await client.get(
+                        f"{url}/api/notes/", headers=headers
+                    )
+                    status = str(response.status_code)
+                except httpx.TransportError:
+                    status = "error"
+                samples.append(time.perf_counter() - t0)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {**summarize(samples, elapsed), "statuses": statuses}
+
+
+async def _measure(workers, env, headers, args) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", str(workers),
+         "--port", str(args.port), "--loop", args.loop,
+         "--http", args.http],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient() as client:
+            if not await _wait_ready(client, url, process, args.timeout):
+                return {"error": "server did not start"}
+        await _load(url, headers, args.concurrency, 1.0)
+        return await _load(url, headers, args.concurrency, args.duration)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+async def run(args) -> dict:
+    report = {"cpu_count": os.cpu_count(), "runs": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite+aiosqlite:///{Path(tmp) / 'scaling.db'}"
+        headers = await _seed(database_url, args.notes)
+        env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "AUTH_MODE": "stateless",
+            "HISTORY_RETENTION_INTERVAL_SECONDS": "0",
+        }
+        for workers in args.workers:
+            report["runs"][str(workers)] = await _measure(
+                workers, env, headers, args
+            )
+    base = report["runs"].get(str(args.workers[0]), {})
+    for run_report in report["runs"].values():
+        if base.get("throughput_rps") and "throughput_rps" in run_report:
+            run_report["speedup"] = round(
+                run_report["throughput_rps"] / base["throughput_rps"], 2
+            )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--loop", default="auto")
+    parser.add_argument("--http", default="auto")
+    parser.add_argument("--port", type=int, default=8760)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
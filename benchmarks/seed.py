@@ -0,0 +1,164 @@
+"""
+Seed a database with realistic volumes for the benchmark suite.
+
+Rows are written with multi-row INSERTs in chunks, and every user shares
+one precomputed bcrypt hash, so seeding is bound by the database and not
+by password hashing. All users have the password "password123" and the
+email user<N>@example.com.
+
+    python -m benchmarks.seed --database-url sqlite+aiosqlite:///bench.db
+    python -m benchmarks.seed --profile realistic   # 10k x 100 x 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import BENCH_PASSWORD
+from passlib.context import CryptContext
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import Base, Category, Note, NoteHistory, User
+
+PROFILES = {
+    "small": {"users": 100, "notes": 20, "revisions": 5},
+    "medium": {"users": 1000, "notes": 50, "revisions": 10},
+    "realistic": {"users": 10000, "notes": 100, "revisions": 20},
+}
+CHUNK = 5000
+CATEGORIES_PER_USER = 3
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@example.com"
+
+
+async def _insert_chunks(conn, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        await conn.execute(insert(table), rows[start:start + CHUNK])
+
+
+async def seed(database_url: str, users: int, notes: int, revisions: int,
+               reset: bool = True) -> dict:
+    engine = create_async_engine(database_url)
+    password = CryptContext(schemes=["bcrypt"]).hash(BENCH_PASSWORD)
+    epoch = datetime(2024, 1, 1)
+    started = time.perf_counter()
+    counts = {"users": 0, "categories": 0, "notes": 0, "history": 0}
+    try:
+        async with engine.begin() as conn:
+            if reset:
+                await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+        # DOC: Users are written in blocks so memory stays bounded
+        block = max(1, CHUNK // max(1, notes * max(1, revisions)))
+        for first in range(0, users, block):
+            last = min(users, first + block)
+            async with engine.begin() as conn:
+                result = await conn.execute(
+                    insert(User.__table__).returning(
+                        User.__table__.c.id, sort_by_parameter_order=True
+                    ),
+                    [
+                        {
+                            "document": str(10_000_000 + i),
+                            "full_name": f"User {i}",
+                            "email": user_email(i),
+                            "password": password,
+                            "created": epoch,
+                        }
+                        for i in range(first, last)
+                    ],
+                )
+                user_ids = list(result.scalars())
+                result = await conn.execute(
+                    insert(Category.__table__).returning(
+                        Category.__table__.c.id,
+                        Category.__table__.c.user_id,
+                        sort_by_parameter_order=True,
+                    ),
+                    [
+                        {"name": f"cat {c}", "color": "blue",
+                         "user_id": user_id}
+                        for user_id in user_ids
+                        for c in range(CATEGORIES_PER_USER)
+                    ],
+                )
+                categories = {}
+                for category_id, user_id in result.all():
+                    categories.setdefault(user_id, []).append(category_id)
+
+                note_rows = []
+                for user_id in user_ids:
+                    for n in range(notes):
+                        note_rows.append({
+                            "title": f"Note {n}",
+                            "content": f"Note {n} of user {user_id}, "
+                                       f"revision {revisions + 1}",
+                            "user_id": user_id,
+                            "created": epoch + timedelta(minutes=n),
+                            "category_id": categories[user_id][
+                                n % CATEGORIES_PER_USER
+                            ],
+                            "version": revisions + 1,
+                        })
+                result = await conn.execute(
+                    insert(Note.__table__).returning(
+                        Note.__table__.c.id, sort_by_parameter_order=True
+                    ),
+                    note_rows,
+                )
+                history_rows = []
+                for note_id, row in zip(result.scalars(), note_rows):
+                    for version in range(1, revisions + 1):
+                        history_rows.append({
+                            "note_id": note_id,
+                            "title": row["title"],
+                            "content": f"{row['title']} revision {version}",
+                            "version": version,
+                            "category_id": row["category_id"],
+                            "created": row["created"]
+                            + timedelta(hours=version),
+                        })
+                await _insert_chunks(conn, NoteHistory.__table__,
+                                     history_rows)
+            counts["users"] += len(user_ids)
+            counts["categories"] += len(user_ids) * CATEGORIES_PER_USER
+            counts["notes"] += len(note_rows)
+            counts["history"] += len(history_rows)
+
+        if engine.dialect.name == "sqlite":
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    "INSERT OR REPLACE INTO notes_fts (rowid, title, content)"
+                    " SELECT id, title, content FROM notes"
+                ))
+    finally:
+        await engine.dispose()
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--database-url", default="sqlite+aiosqlite:///bench.db"
+    )
+    parser.add_argument("--profile", choices=PROFILES, default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--notes", type=int)
+    parser.add_argument("--revisions", type=int)
+    args = parser.parse_args()
+    volumes = dict(PROFILES[args.profile])
+    for key in volumes:
+        if getattr(args, key) is not None:
+            volumes[key] = getattr(args, key)
+    counts = asyncio.run(seed(args.database_url, **volumes))
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == "__main__":
+    main()
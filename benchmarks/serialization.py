@@ -0,0 +1,154 @@
+"""
+CPU time and allocations of serializing --notes notes loaded as ORM
+objects, each with --revisions history rows.
+
+Three paths are compared for a page of NoteResponse and for the export
+lines (NoteExport, with history):
+- response_model: what FastAPI does with a response model, validating
+  the ORM objects into models and dumping them to JSON;
+- jsonable_encoder: the same validation followed by jsonable_encoder and
+  a JSON encoder, as with a custom response class;
+- fast_path: the precompiled dumpers of app.schemes with orjson.
+
+    python -m benchmarks.serialization --notes 10000 --revisions 5
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import benchmarks.common  # noqa: F401
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models import Category, Note, NoteHistory
+from app.schemes.notes import (
+    NoteExport,
+    NotePage,
+    dump_note_export,
+    dump_note_page,
+)
+
+
+def _notes(count: int, revisions: int) -> list:
+    category = Category(id=1, name="Work", color="blue")
+    created = datetime(2026, 10, 18, 12, 0)
+    notes = []
+    for note_id in range(1, count + 1):
+        note = Note(
+            id=note_id,
+            title=f"Note {note_id}",
+            content="Meeting notes: review the roadmap and assign owners. "
+            * 3,
+            created=created,
+            version=revisions + 1,
+            category_id=category.id,
+            user_id=1,
+        )
+        note.category = category
+        note.history_count = revisions
+        note.history = [
+            NoteHistory(
+                id=note_id * 100 + version,
+                title=f"Note {note_id}",
+                content=f"Revision {version} of the meeting notes",
+                created=created - timedelta(days=version),
+                version=version,
+                category_id=category.id,
+                note_id=note_id,
+            )
+            for version in range(1, revisions + 1)
+        ]
+        notes.append(note)
+    return notes
+
+
+def _measure(func, rounds: int) -> dict:
+    func()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.process_time()
+    for _ in range(rounds):
+        size = len(func())
+    return {
+        "cpu_ms": round((time.process_time() - start) / rounds * 1000, 1),
+        "peak_alloc_mb": round(peak / 2 ** 20, 2),
+        "bytes": size,
+    }
+
+
+def run(notes: int, revisions: int, rounds: int) -> dict:
+    rows = _notes(notes, revisions)
+    page = {"items": rows, "next_cursor": None}
+    page_adapter = TypeAdapter(NotePage)
+    export_adapter = TypeAdapter(NoteExport)
+
+    def page_model():
+        return page_adapter.dump_json(
+            page_adapter.validate_python(page, from_attributes=True)
+        )
+
+    def page_encoder():
+        return json.dumps(jsonable_encoder(
+            page_adapter.validate_python(page, from_attributes=True)
+        )).encode()
+
+    def page_fast():
+        return orjson.dumps(dump_note_page(page))
+
+    def export_model():
+        return b"".join(
+            export_adapter.dump_json(
+                export_adapter.validate_python(note, from_attributes=True)
+            ) + b"\n"
+            for note in rows
+        )
+
+    def export_encoder():
+        return b"".join(
+            json.dumps(jsonable_encoder(
+                export_adapter.validate_python(note, from_attributes=True)
+            )).encode() + b"\n"
+            for note in rows
+        )
+
+    def export_fast():
+        return b"".join(
+            orjson.dumps(dump_note_export(note)) + b"\n" for note in rows
+        )
+
+    report = {"notes": notes, "revisions": revisions}
+    for label, paths in (
+        ("page", (page_model, page_encoder, page_fast)),
+        ("export", (export_model, export_encoder, export_fast)),
+    ):
+        model, encoder, fast = (_measure(path, rounds) for path in paths)
+        report[label] = {
+            "response_model": model,
+            "jsonable_encoder": encoder,
+            "fast_path": fast,
+            "cpu_ratio": round(fast["cpu_ms"] / model["cpu_ms"], 3),
+            "alloc_ratio": round(
+                fast["peak_alloc_mb"] / model["peak_alloc_mb"], 3
+            ),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--revisions", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(
+        run(args.notes, args.revisions, args.rounds), indent=2
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Queries per request on GET /api/notes/ with and without the user cache.
+
+    python -m benchmarks.user_cache --requests 200
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import (
+    QueryCounter,
+    bench_client,
+    register_user,
+    seed_notes,
+    summarize,
+)
+from app.core.security import user_cache
+
+
+async def run(requests: int, notes: int) -> dict:
+    report = {}
+    async with bench_client() as (client, engine):
+        headers = await register_user(client)
+        await seed_notes(client, headers, notes)
+
+        for label, cached in (("uncached", False), ("cached", True)):
+            user_cache.clear()
+            samples = []
+            with QueryCounter(engine) as counter:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                for _ in range(requests):
+                    if not cached:
+                        user_cache.clear()
+                    t0 = loop.time()
+                    await client.get("/api/notes/", headers=headers)
+                    samples.append(loop.time() - t0)
+                elapsed = loop.time() - start
+            report[label] = {
+                **summarize(samples, elapsed),
+                "queries_per_request": round(counter.count / requests, 2),
+            }
+        report["cache_stats"] = user_cache.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--notes", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.notes)), indent=2))
+
+
+if __name__ == "__main__":
+    main()